@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地数据目录
+缓存、历史记录等持久化文件统一放在用户数据目录下
+"""
+
+import os
+import sys
+from pathlib import Path
+
+
+APP_NAME = 'OTACredentialTool'
+
+
+def app_data_dir() -> Path:
+    """获取用户数据目录（可用环境变量 OTA_TOOL_HOME 覆盖）"""
+    env_dir = os.environ.get('OTA_TOOL_HOME')
+    if env_dir:
+        base = Path(env_dir)
+    elif sys.platform == 'win32':
+        base = Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local')) / APP_NAME
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library' / 'Application Support' / APP_NAME
+    else:
+        base = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share')) / APP_NAME
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def safe_file_name(name: str) -> str:
+    """账号、门店ID等转换为文件名（字母数字和 -_.@ 以外的字符替换为 _）"""
+    return ''.join(c if c.isalnum() or c in '-_.@' else '_' for c in name)
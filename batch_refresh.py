@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量凭证刷新
+从 CSV/JSON 清单读取账号，按平台限制并发，批量获取凭证并输出到目录
+
+清单字段: platform, account, password, store_id
+  platform 可以是中文名（美团/飞猪/携程）或平台编码（meituan/fliggy/ctrip）
+
+用法:
+  python batch_refresh.py accounts.csv --out credentials --workers 4 --limit meituan=2
+  python batch_refresh.py accounts.csv --async --workers 16   # 单进程、单浏览器并发登录
+"""
+
+import sys
+import csv
+import json
+import time
+import asyncio
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from app_paths import safe_file_name
+from browser_pool import BrowserPool
+from ota_engine import LoginEngine, LoginRejectedError, LoginCancelledError, PLATFORM_NAMES, normalize_platform
+from credential_format import CREDENTIAL_FORMATS
+from credential_history import CredentialHistory
+from credential_store import CredentialStore
+from credential_sink import CredentialSink, push_sink_from_env
+from flight_recorder import FlightRecorder
+from login_metrics import MetricsRecorder, metrics_recorder
+
+
+STATUS_FIELDS = ['platform', 'account', 'store_id', 'status', 'reused', 'duration', 'output', 'error']
+# 批量刷新时每个账号的登录期限（秒）：无人处理验证码，卡住的账号尽快让出浏览器
+BATCH_LOGIN_DEADLINE = 60
+
+
+def load_manifest(path: str) -> List[Dict[str, str]]:
+    """读取账号清单（CSV 或 JSON 数组）"""
+    manifest_path = Path(path)
+    with open(manifest_path, encoding='utf-8-sig') as f:
+        if manifest_path.suffix.lower() == '.json':
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError("JSON 清单应为账号对象的数组")
+        else:
+            rows = list(csv.DictReader(f))
+
+    accounts = []
+    for line_no, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"清单第 {line_no} 条: 应为包含 platform、account、password 的对象")
+        try:
+            name = normalize_platform(str(row.get('platform', '')))
+        except ValueError as e:
+            raise ValueError(f"清单第 {line_no} 条: {e}")
+        account = str(row.get('account', '')).strip()
+        password = str(row.get('password', '')).strip()
+        if not account or not password:
+            raise ValueError(f"清单第 {line_no} 条: 缺少账号或密码")
+        accounts.append({
+            'platform': name,
+            'account': account,
+            'password': password,
+            'store_id': str(row.get('store_id', '') or '').strip(),
+        })
+    return accounts
+
+
+def interleave_platforms(accounts: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """按平台轮转排列账号，避免同一平台排满线程池而阻塞在并发上限上"""
+    by_platform: Dict[str, List[Dict[str, str]]] = {}
+    for account in accounts:
+        by_platform.setdefault(account['platform'], []).append(account)
+    queues = list(by_platform.values())
+    ordered = []
+    while queues:
+        for q in queues:
+            ordered.append(q.pop(0))
+        queues = [q for q in queues if q]
+    return ordered
+
+
+class StatusTable:
+    """逐行写入的账号状态表（status.csv），每个账号完成后立即落盘"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=STATUS_FIELDS)
+        self._writer.writeheader()
+        self._file.flush()
+
+    def write(self, row: Dict[str, str]):
+        with self._lock:
+            self._writer.writerow(row)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchRefresher:
+    """批量刷新凭证：有界线程池 + 按平台的并发上限
+
+    use_async=True 时改用 ota_engine_async，在一个事件循环、一个浏览器上并发登录。
+    reuse=True 时输出目录中已有的凭证会先做会话探测，仍有效则不再重新登录。
+    凭证按 credential_format 输出（pretty / compact / gzip），并按平台裁剪无关 Cookie。
+    history=True 时每次刷新结果同时以增量形式记录到 <out>/history（见 credential_history）。
+    store=True 时同时写入 <out>/credentials.db（见 credential_store），便于按过期时间查询。
+    传入 sink 时每个凭证再交给 sink.put 输出（如批量推送到后端，见 credential_sink）。
+    传入 metrics 时记录每次登录的分阶段耗时（见 login_metrics.MetricsRecorder）。
+    登录失败的现场（截图、请求记录）保存到 <out>/failures，trace=True 时还保存 Playwright 追踪（见 flight_recorder）。
+    每个账号最多登录 deadline 秒；cancel() 取消所有进行中和尚未开始的登录。
+    """
+
+    def __init__(self, out_dir: str, workers: int = 4,
+                 platform_limits: Optional[Dict[str, int]] = None,
+                 headless: bool = False, use_async: bool = False, reuse: bool = True,
+                 credential_format: str = 'compact', history: bool = True, store: bool = True,
+                 sink: Optional[CredentialSink] = None, metrics: Optional[MetricsRecorder] = None,
+                 deadline: float = BATCH_LOGIN_DEADLINE, trace: bool = False):
+        self.out_dir = Path(out_dir)
+        self.workers = workers
+        self.headless = headless
+        self.use_async = use_async
+        self.reuse = reuse
+        self.credential_format = credential_format
+        self.history = CredentialHistory(self.out_dir / 'history') if history else None
+        self.store = CredentialStore(self.out_dir / 'credentials.db') if store else None
+        self.sink = sink
+        self.metrics = metrics
+        self.recorder = FlightRecorder(self.out_dir / 'failures', trace=trace)
+        self.deadline = deadline
+        # 进行中的登录引擎，cancel() 时逐个取消
+        self._engines = set()
+        self._engines_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.platform_limits = platform_limits or {}
+        self._semaphores = {
+            name: threading.Semaphore(self.platform_limits.get(name, workers))
+            for name in PLATFORM_NAMES
+        }
+
+    def run(self, accounts: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """执行批量刷新，返回每个账号的状态"""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._table = StatusTable(self.out_dir / 'status.csv')
+        self._results: List[Dict[str, str]] = []
+        self._total = len(accounts)
+
+        start = time.perf_counter()
+        try:
+            if self.use_async:
+                asyncio.run(self._run_async(accounts))
+            else:
+                self._run_threaded(accounts)
+        finally:
+            self._table.close()
+
+        results = self._results
+        ok = sum(1 for r in results if r['status'] == 'success')
+        print(f"\n完成: 成功 {ok}，失败 {len(results) - ok}，"
+              f"总耗时 {time.perf_counter() - start:.1f}s，状态表: {self._table.path}")
+        return results
+
+    def _run_threaded(self, accounts: List[Dict[str, str]]):
+        """线程池 + 浏览器进程池"""
+        pool = BrowserPool(size=self.workers, headless=self.headless)
+        pool.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.refresh_one, pool, acc)
+                           for acc in interleave_platforms(accounts)]
+                try:
+                    for future in as_completed(futures):
+                        self._record(future.result())
+                except KeyboardInterrupt:
+                    # 取消进行中的登录，线程池在检查间隔内退出
+                    self.cancel()
+                    raise
+        finally:
+            pool.shutdown()
+
+    async def _run_async(self, accounts: List[Dict[str, str]]):
+        """单事件循环 + 单浏览器"""
+        from ota_engine_async import AsyncLoginEngine, AsyncLoginRunner
+
+        async with AsyncLoginRunner(concurrency=self.workers, platform_limits=self.platform_limits,
+                                    headless=self.headless) as runner:
+            async def refresh(account):
+                row = self._new_row(account)
+                start = time.perf_counter()
+                engine = None
+                try:
+                    engine = AsyncLoginEngine(account['platform'], account['account'], account['password'],
+                                              previous_credential=self._previous_credential(row),
+                                              credential_format=self.credential_format,
+                                              metrics=self.metrics, recorder=self.recorder,
+                                              deadline=self.deadline)
+                    self._track(engine)
+                    credential = await runner.run(engine)
+                    row['reused'] = 'yes' if engine.reused else ''
+                    self._save(row, credential)
+                except Exception as e:
+                    self._fail(row, e)
+                finally:
+                    self._untrack(engine)
+                row['duration'] = f"{time.perf_counter() - start:.1f}"
+                self._record(row)
+
+            await asyncio.gather(*(refresh(acc) for acc in accounts))
+
+    def cancel(self):
+        """取消所有进行中和尚未开始的登录（可在任意线程调用）"""
+        self._cancelled.set()
+        with self._engines_lock:
+            engines = list(self._engines)
+        for engine in engines:
+            engine.cancel()
+
+    def _track(self, engine):
+        """登记进行中的引擎（已调用 cancel 时直接取消）"""
+        with self._engines_lock:
+            self._engines.add(engine)
+        if self._cancelled.is_set():
+            engine.cancel()
+
+    def _untrack(self, engine):
+        with self._engines_lock:
+            self._engines.discard(engine)
+
+    def _fail(self, row: Dict[str, str], error: Exception):
+        """按异常类型记录失败状态"""
+        if isinstance(error, LoginRejectedError):
+            # 登录页显示了错误提示（如密码错误），与超时等失败区分，便于排查；调度时同样退避重试
+            row['status'] = 'rejected'
+        elif isinstance(error, LoginCancelledError):
+            row['status'] = 'cancelled'
+        row['error'] = str(error)
+
+    def close(self):
+        """关闭凭证库和输出"""
+        if self.store is not None:
+            self.store.close()
+        if self.sink is not None:
+            self.sink.close()
+        if self.metrics is not None:
+            self.metrics.close()
+
+    def _record(self, row: Dict[str, str]):
+        """写入状态表并打印进度"""
+        self._table.write(row)
+        self._results.append(row)
+        print(f"[{len(self._results)}/{self._total}] {row['platform']} {row['account']}: "
+              f"{row['status']} ({row['duration']}s) {row['error']}")
+
+    def _new_row(self, account: Dict[str, str]) -> Dict[str, str]:
+        """账号状态行（默认失败）"""
+        return {
+            'platform': PLATFORM_NAMES[account['platform']],
+            'account': account['account'],
+            'store_id': account['store_id'],
+            'status': 'failed',
+            'reused': '',
+            'duration': '',
+            'output': '',
+            'error': '',
+        }
+
+    def _previous_credential(self, row: Dict[str, str]) -> Optional[str]:
+        """读取上一次输出的凭证（用于复用会话）"""
+        if not self.reuse:
+            return None
+        try:
+            return self._output_path(row).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def _save(self, row: Dict[str, str], credential: str):
+        """保存凭证文件并标记成功（复用会话得到的凭证只更新凭证库中的验证时间，不更新获取时间）"""
+        output = self._output_path(row)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(credential, encoding='utf-8')
+        row['status'] = 'success'
+        row['output'] = str(output)
+        try:
+            if self.history is not None:
+                self.history.record(row['platform'], row['account'], credential)
+            if self.store is not None:
+                reused = row['reused'] == 'yes'
+                self.store.put(row['platform'], row['account'], credential, store_id=row['store_id'],
+                               reused=reused)
+                if reused:
+                    self.store.mark_verified(row['platform'], row['account'])
+            if self.sink is not None:
+                self.sink.put(row['platform'], row['account'], row['store_id'], credential)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"记录凭证失败: {e}")
+
+    def refresh_one(self, pool: BrowserPool, account: Dict[str, str]) -> Dict[str, str]:
+        """刷新单个账号（受平台并发上限约束）"""
+        platform = account['platform']
+        row = self._new_row(account)
+
+        with self._semaphores[platform]:
+            start = time.perf_counter()
+            engine = None
+            try:
+                engine = LoginEngine(platform, account['account'], account['password'], pool=pool,
+                                     previous_credential=self._previous_credential(row),
+                                     credential_format=self.credential_format, metrics=self.metrics,
+                                     recorder=self.recorder, deadline=self.deadline)
+                self._track(engine)
+                credential = engine.login()
+                row['reused'] = 'yes' if engine.reused else ''
+                self._save(row, credential)
+            except Exception as e:
+                self._fail(row, e)
+            finally:
+                self._untrack(engine)
+            row['duration'] = f"{time.perf_counter() - start:.1f}"
+        return row
+
+    def _output_path(self, row: Dict[str, str]) -> Path:
+        """凭证输出路径: <out>/<平台编码>/<门店ID或账号>.json"""
+        name = row['store_id'] or row['account']
+        return self.out_dir / row['platform'] / f"{safe_file_name(name)}.json"
+
+
+def parse_limits(values: List[str]) -> Dict[str, int]:
+    """解析 --limit meituan=2 形式的平台并发上限"""
+    limits = {}
+    for value in values:
+        code, _, count = value.partition('=')
+        if not count.isdigit() or int(count) < 1:
+            raise ValueError(f"无效的并发上限: {value}")
+        limits[normalize_platform(code)] = int(count)
+    return limits
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py batch 子命令共用）"""
+    parser.add_argument('manifest', help="账号清单（.csv 或 .json）")
+    parser.add_argument('--out', default='credentials', help="凭证输出目录")
+    parser.add_argument('--workers', type=int, default=4, help="总并发数（浏览器数量）")
+    parser.add_argument('--limit', action='append', default=[],
+                        help="平台并发上限，如 meituan=2，可重复")
+    parser.add_argument('--headless', action='store_true', help="无头模式运行浏览器")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="使用异步引擎：单进程、单浏览器并发登录")
+    parser.add_argument('--no-reuse', dest='reuse', action='store_false',
+                        help="不复用输出目录中的旧凭证，全部重新登录")
+    parser.add_argument('--format', dest='credential_format', choices=CREDENTIAL_FORMATS, default='compact',
+                        help="凭证输出格式（默认 compact）")
+    parser.add_argument('--no-history', dest='history', action='store_false',
+                        help="不记录凭证历史")
+    parser.add_argument('--no-db', dest='store', action='store_false',
+                        help="不写入凭证库 credentials.db")
+    parser.add_argument('--push', metavar='URL',
+                        help="推送到账号状态接口（默认读取环境变量 OTA_PUSH_ENDPOINT，未设置时不推送）")
+    parser.add_argument('--metrics-port', type=int, help="在该端口提供 Prometheus /metrics")
+    parser.add_argument('--deadline', type=float, default=BATCH_LOGIN_DEADLINE,
+                        help=f"每个账号的登录期限（秒，默认 {BATCH_LOGIN_DEADLINE}）")
+    parser.add_argument('--trace', action='store_true',
+                        help="登录失败时同时保存 Playwright 追踪（DOM 快照，开销较大）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="批量刷新 OTA 凭证")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        accounts = load_manifest(args.manifest)
+        limits = parse_limits(args.limit)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    refresher = BatchRefresher(args.out, workers=args.workers, platform_limits=limits,
+                               headless=args.headless, use_async=args.use_async,
+                               reuse=args.reuse, credential_format=args.credential_format,
+                               history=args.history, store=args.store,
+                               sink=push_sink_from_env(Path(args.out) / 'outbox', args.push),
+                               metrics=metrics_recorder(Path(args.out) / 'metrics', args.metrics_port),
+                               deadline=args.deadline, trace=args.trace)
+    try:
+        results = refresher.run(accounts)
+    finally:
+        refresher.close()
+    if any(r['status'] != 'success' for r in results):
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
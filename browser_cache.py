@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器缓存
+onedir 打包时浏览器以压缩包形式随程序发布，首次启动解压到用户缓存目录，
+之后的启动直接复用，不再重复解压
+
+缓存目录: <用户数据目录>/browsers/<版本>-<校验和前缀>/
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+from app_paths import app_data_dir
+
+
+BROWSERS_ARCHIVE = 'browsers.zip'
+BROWSERS_MANIFEST = 'browsers.json'
+COMPLETE_MARKER = '.complete'
+
+
+def file_sha256(path: Path) -> str:
+    """计算文件 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_archive(browser_root: str, out_dir: Path, version: str) -> Path:
+    """打包时使用：把浏览器目录压缩为 browsers.zip 并生成 browsers.json 清单
+
+    保留可执行权限和符号链接（macOS 的 .app 框架依赖符号链接）。
+    """
+    root = Path(browser_root)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = out_dir / BROWSERS_ARCHIVE
+
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in dirnames + filenames:
+                path = Path(dirpath) / name
+                arcname = path.relative_to(root).as_posix()
+                if path.is_symlink():
+                    info = zipfile.ZipInfo(arcname)
+                    info.create_system = 3  # Unix，external_attr 高 16 位为文件模式
+                    info.external_attr = (stat.S_IFLNK | 0o777) << 16
+                    zf.writestr(info, os.readlink(path))
+                elif path.is_file():
+                    zf.write(path, arcname)
+
+    manifest = {
+        'version': version,
+        'sha256': file_sha256(archive_path),
+        'size': archive_path.stat().st_size,
+    }
+    (out_dir / BROWSERS_MANIFEST).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    return archive_path
+
+
+def _extract(archive_path: Path, target: Path):
+    """解压并还原文件权限和符号链接"""
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            mode = info.external_attr >> 16
+            dest = target / info.filename
+            if stat.S_ISLNK(mode):
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.symlink(zf.read(info).decode('utf-8'), dest)
+                continue
+            zf.extract(info, target)
+            if mode and sys.platform != 'win32':
+                os.chmod(dest, stat.S_IMODE(mode))
+
+
+def prepare_browsers(bundle_dir: Path) -> Optional[Path]:
+    """启动时使用：返回可用的浏览器缓存目录，没有随程序发布压缩包时返回 None
+
+    缓存已存在且校验和一致时直接返回；否则校验压缩包并解压一次。
+    """
+    manifest_path = bundle_dir / BROWSERS_MANIFEST
+    archive_path = bundle_dir / BROWSERS_ARCHIVE
+    if not manifest_path.exists() or not archive_path.exists():
+        return None
+
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    sha256 = manifest['sha256']
+    cache_root = app_data_dir() / 'browsers'
+    target = cache_root / f"{manifest['version']}-{sha256[:12]}"
+    marker = target / COMPLETE_MARKER
+
+    if _is_complete(marker, sha256):
+        return target
+
+    print(f"首次启动，解压浏览器到: {target}")
+    if file_sha256(archive_path) != sha256:
+        raise RuntimeError(f"浏览器压缩包校验失败: {archive_path}")
+
+    # 先解压到临时目录，完成后再改名，避免中断后留下不完整的缓存
+    tmp_dir = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    _extract(archive_path, tmp_dir)
+    (tmp_dir / COMPLETE_MARKER).write_text(sha256, encoding='utf-8')
+    try:
+        tmp_dir.rename(target)
+    except OSError:
+        if _is_complete(marker, sha256):
+            # 另一个实例已经解压完成
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return target
+        shutil.rmtree(target, ignore_errors=True)
+        tmp_dir.rename(target)
+
+    # 清理旧版本缓存（跳过其他实例正在解压的临时目录）
+    for old in cache_root.iterdir():
+        if old != target and old.is_dir() and '.tmp-' not in old.name:
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def _is_complete(marker: Path, sha256: str) -> bool:
+    """缓存目录是否已完整解压"""
+    try:
+        return marker.read_text(encoding='utf-8').strip() == sha256
+    except OSError:
+        return False
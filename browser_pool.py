@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器进程池
+常驻 Playwright 驱动和浏览器进程，每次登录只需创建独立的 BrowserContext
+"""
+
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+# Playwright 在槽位线程中才导入，创建进程池不会拖慢程序启动
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, Playwright
+
+
+# 浏览器启动参数
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-site-isolation-trials',
+    '--start-maximized'  # 启动时最大化窗口
+]
+
+
+def launch_browser(p: 'Playwright', headless: bool = False) -> 'Browser':
+    """启动浏览器：优先使用系统 Chrome，失败则使用 Chromium"""
+    try:
+        return p.chromium.launch(
+            headless=headless,
+            channel='chrome',  # 使用系统安装的 Chrome
+            args=LAUNCH_ARGS
+        )
+    except Exception:
+        # 如果没有 Chrome，使用 Chromium
+        return p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+
+
+class BrowserSlot(threading.Thread):
+    """池中的一个浏览器槽位
+
+    Playwright 同步 API 的对象只能在创建它的线程中使用，
+    因此每个槽位独占一个线程，驱动和浏览器都在该线程内创建和使用。
+    """
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"BrowserSlot-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.browser: Optional['Browser'] = None
+        self.uses = 0
+        self.launch_error: Optional[BaseException] = None
+        self.ready = False
+
+    def run(self):
+        """槽位主循环：预热浏览器，然后依次执行登录任务
+
+        Playwright 驱动启动失败（或槽位意外退出）时通知进程池，没有可用槽位时排队的任务直接失败。
+        """
+        try:
+            from playwright.sync_api import sync_playwright
+            with sync_playwright() as p:
+                self._playwright = p
+                self._ensure_browser()
+                self.pool._slot_ready(self)
+                self._serve()
+        except BaseException as e:
+            self.launch_error = e
+            print(f"[{self.name}] 槽位异常退出: {e}")
+            self.pool._slot_failed(self, e)
+
+    def _serve(self):
+        """依次执行任务，收到 None 时关闭浏览器并返回"""
+        while True:
+            try:
+                job = self.pool._jobs.get(timeout=self.pool.health_check_interval)
+            except queue.Empty:
+                # 空闲时做健康检查
+                self._health_check()
+                continue
+
+            if job is None:
+                break
+
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                browser = self._ensure_browser(raise_error=True)
+                future.set_result(fn(browser))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self.uses += 1
+                if self.uses >= self.pool.max_uses:
+                    print(f"[{self.name}] 已使用 {self.uses} 次，回收浏览器")
+                    self._close_browser()
+                    # 立即启动新浏览器，下一个任务不用等待启动
+                    self._ensure_browser()
+
+        self._close_browser()
+
+    def _ensure_browser(self, raise_error: bool = False) -> Optional['Browser']:
+        """确保浏览器可用，不可用时重新启动"""
+        if self.browser is not None and self.browser.is_connected():
+            return self.browser
+
+        self._close_browser()
+        start = time.perf_counter()
+        try:
+            self.browser = launch_browser(self._playwright, headless=self.pool.headless)
+            self.launch_error = None
+            print(f"[{self.name}] 浏览器已启动，耗时 {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.launch_error = e
+            print(f"[{self.name}] 浏览器启动失败: {e}")
+            if raise_error:
+                raise
+        return self.browser
+
+    def _health_check(self):
+        """健康检查：创建并关闭一个空上下文，失败则重启浏览器"""
+        if self.browser is None:
+            return
+        try:
+            context = self.browser.new_context()
+            context.close()
+        except Exception as e:
+            print(f"[{self.name}] 健康检查失败，重启浏览器: {e}")
+            self._close_browser()
+            self._ensure_browser()
+
+    def _close_browser(self):
+        """关闭当前浏览器"""
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """常驻浏览器进程池
+
+    启动时预热浏览器，每次登录在空闲槽位上执行，
+    由调用方在传入的浏览器上创建独立的 BrowserContext。
+    """
+
+    def __init__(self, size: int = 1, max_uses: int = 20,
+                 health_check_interval: float = 60.0, headless: bool = False):
+        self.size = size
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self.headless = headless
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._slots: List[BrowserSlot] = []
+        self._ready = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        # 所有槽位都异常退出时的错误，之后提交的任务直接失败
+        self._error: Optional[BaseException] = None
+
+    def start(self):
+        """启动并预热所有槽位（不阻塞）"""
+        with self._lock:
+            if self._slots or self._error is not None:
+                return
+            for i in range(self.size):
+                slot = BrowserSlot(self, i)
+                self._slots.append(slot)
+                slot.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待所有槽位完成预热（或异常退出），没有可用槽位时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in range(self.size):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._ready.acquire(timeout=remaining):
+                return False
+        for _ in range(self.size):
+            self._ready.release()
+        return self._error is None
+
+    def _slot_ready(self, slot: BrowserSlot):
+        """槽位预热完成回调"""
+        slot.ready = True
+        self._ready.release()
+
+    def _slot_failed(self, slot: BrowserSlot, error: BaseException):
+        """槽位异常退出回调：最后一个槽位退出时，排队中和之后提交的任务都以该错误失败"""
+        with self._lock:
+            if slot not in self._slots:
+                # 正在关闭
+                return
+            self._slots.remove(slot)
+            if not slot.ready:
+                self._ready.release()
+            if self._slots:
+                return
+            self._error = error
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[1].set_running_or_notify_cancel():
+                job[1].set_exception(error)
+
+    def submit(self, fn: Callable[['Browser'], object]) -> Future:
+        """提交任务，fn 会在某个槽位线程中以该槽位的浏览器为参数执行"""
+        self.start()
+        future: Future = Future()
+        with self._lock:
+            error = self._error
+            if error is None:
+                self._jobs.put((fn, future))
+        if error is not None:
+            future.set_running_or_notify_cancel()
+            future.set_exception(error)
+        return future
+
+    def run(self, fn: Callable[['Browser'], object], timeout: Optional[float] = None):
+        """提交任务并等待结果"""
+        return self.submit(fn).result(timeout=timeout)
+
+    def shutdown(self, timeout: float = 10.0):
+        """关闭所有槽位和浏览器"""
+        with self._lock:
+            slots = self._slots
+            self._slots = []
+        for _ in slots:
+            self._jobs.put(None)
+        for slot in slots:
+            slot.join(timeout=timeout)
@@ -2,10 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 打包脚本（包含浏览器）
+
+  python build_with_browser.py           # onefile：单文件，每次启动解压全部内容（含浏览器）
+  python build_with_browser.py --onedir  # onedir：浏览器压缩包首次启动时解压到用户缓存目录，之后直接复用
 """
 
 import os
 import sys
+import argparse
 import subprocess
 import shutil
 from pathlib import Path
@@ -88,9 +92,16 @@ def get_browser_path():
         traceback.print_exc()
         return None
 
-def build_with_browser():
+def get_browser_version(browser_path):
+    """浏览器缓存版本号：Playwright 版本 + 浏览器目录名（如 chromium-1140）"""
+    import playwright
+    revisions = sorted(d for d in os.listdir(browser_path)
+                       if os.path.isdir(os.path.join(browser_path, d)))
+    return '-'.join([playwright.__version__] + revisions)
+
+def build_with_browser(onedir=False):
     """打包（包含浏览器）"""
-    print("\n开始打包（包含浏览器）...")
+    print(f"\n开始打包（包含浏览器，{'onedir' if onedir else 'onefile'} 模式）...")
     
     # 获取浏览器路径
     browser_path = get_browser_path()
@@ -114,7 +125,19 @@ def build_with_browser():
     
     # 构建 --add-data 参数
     # 格式: 源路径;目标路径 (Windows) 或 源路径:目标路径 (macOS/Linux)
-    add_data = f'{browser_path}{os.pathsep}playwright/driver/package/.local-browsers'
+    if onedir:
+        # 浏览器压缩为带校验和的压缩包，运行时只解压一次到用户缓存目录
+        from browser_cache import create_archive, BROWSERS_MANIFEST
+        version = get_browser_version(browser_path)
+        print(f"\n压缩浏览器（版本 {version}）...")
+        archive_path = create_archive(browser_path, Path('build') / 'browsers', version)
+        print(f"压缩包大小: {archive_path.stat().st_size / (1024 * 1024):.1f} MB")
+        add_data = [
+            f'{archive_path}{os.pathsep}.',
+            f'{archive_path.with_name(BROWSERS_MANIFEST)}{os.pathsep}.',
+        ]
+    else:
+        add_data = [f'{browser_path}{os.pathsep}playwright/driver/package/.local-browsers']
     print(f"\n--add-data 参数: {add_data}")
     
     # PyInstaller 命令
@@ -122,10 +145,10 @@ def build_with_browser():
         'pyinstaller',
         '--name=OTACredentialTool',
         '--windowed',
-        '--onefile',
+        '--onedir' if onedir else '--onefile',
         '--clean',
         '--noconfirm',
-        f'--add-data={add_data}',
+        *[f'--add-data={item}' for item in add_data],
         'ota_credential_tool.py'
     ]
     
@@ -138,17 +161,26 @@ def build_with_browser():
         print("\n✅ 打包成功！")
         
         # 根据平台显示不同的文件名
-        if sys.platform == 'win32':
-            app_name = "dist/OTACredentialTool.exe"
-        elif sys.platform == 'darwin':
+        if sys.platform == 'darwin':
             app_name = "dist/OTACredentialTool.app"
+        elif onedir:
+            app_name = "dist/OTACredentialTool"
+        elif sys.platform == 'win32':
+            app_name = "dist/OTACredentialTool.exe"
         else:
             app_name = "dist/OTACredentialTool"
         
         print(f"\n应用程序位置: {app_name}")
         
         # 显示文件大小
-        if sys.platform == 'darwin':
+        if onedir and sys.platform != 'darwin':
+            # onedir 输出是目录
+            app_path = Path(app_name)
+            if app_path.exists():
+                total_size = sum(f.stat().st_size for f in app_path.rglob('*') if f.is_file())
+                size_mb = total_size / (1024 * 1024)
+                print(f"目录大小: {size_mb:.1f} MB")
+        elif sys.platform == 'darwin':
             # macOS .app 是目录
             app_path = Path("dist/OTACredentialTool.app")
             if app_path.exists():
@@ -175,6 +207,11 @@ def build_with_browser():
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="打包 OTA 凭证工具（包含浏览器）")
+    parser.add_argument('--onedir', action='store_true',
+                        help="onedir 模式：浏览器首次启动解压到用户缓存目录，之后启动无需再解压")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("OTA凭证工具 - 打包脚本（包含浏览器）")
     print("=" * 60)
@@ -203,7 +240,7 @@ def main():
         print("\n⚠️  浏览器安装失败，但继续打包...")
     
     # 打包
-    if build_with_browser():
+    if build_with_browser(onedir=args.onedir):
         print("\n" + "=" * 60)
         print("打包完成！")
         print("=" * 60)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+凭证裁剪与序列化
+登录过程中浏览器会留下大量第三方统计 Cookie 和无关域名的 localStorage，
+按平台只保留登录态需要的 Cookie 和 origin，并以紧凑格式输出
+
+输出格式:
+  pretty   缩进 JSON（便于阅读）
+  compact  无空白的 JSON（默认）
+  gzip     gzip 压缩后 base64 编码，包装为 {"encoding": "gzip+base64", "data": "..."}
+"""
+
+import re
+import gzip
+import json
+import base64
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+CREDENTIAL_FORMATS = ('pretty', 'compact', 'gzip')
+GZIP_ENCODING = 'gzip+base64'
+
+# 统计埋点 Cookie（与登录态无关）
+TRACKING_COOKIE_PATTERN = r"^(_ga|_gid|_gat|Hm_lvt_|Hm_lpvt_|_lxsdk|_bfa|_bfs|_bfi|UBT_VID|_jzqco|__utm)"
+
+# 各平台需要保留的 Cookie 域名和 localStorage 所在 origin（按域名后缀匹配）
+CREDENTIAL_PROFILES = {
+    "美团": {
+        "cookie_domains": ["meituan.com"],
+        "origin_domains": ["meituan.com"],
+    },
+    "飞猪": {
+        "cookie_domains": ["fliggy.com", "taobao.com", "alibaba.com"],
+        "origin_domains": ["fliggy.com"],
+    },
+    "携程": {
+        "cookie_domains": ["ctrip.com"],
+        "origin_domains": ["ctrip.com"],
+    },
+}
+
+
+def _domain_matches(domain: str, suffixes: List[str]) -> bool:
+    domain = domain.lstrip('.').lower()
+    return any(domain == s or domain.endswith('.' + s) for s in suffixes)
+
+
+def prune_storage_state(platform: str, state: dict) -> dict:
+    """只保留平台需要的 Cookie 和 origin，未配置的平台原样返回"""
+    profile = CREDENTIAL_PROFILES.get(platform)
+    if profile is None:
+        return state
+    tracking = re.compile(TRACKING_COOKIE_PATTERN)
+    cookies = [
+        cookie for cookie in state.get('cookies', [])
+        if _domain_matches(cookie.get('domain', ''), profile['cookie_domains'])
+        and not tracking.match(cookie.get('name', ''))
+    ]
+    origins = [
+        origin for origin in state.get('origins', [])
+        if _domain_matches(urlsplit(origin.get('origin', '')).hostname or '', profile['origin_domains'])
+        and origin.get('localStorage')
+    ]
+    return {'cookies': cookies, 'origins': origins}
+
+
+def encode_credential(state: dict, fmt: str = 'compact') -> str:
+    """把 storage_state 序列化为凭证字符串"""
+    if fmt == 'pretty':
+        return json.dumps(state, ensure_ascii=False, indent=2)
+    compact = json.dumps(state, ensure_ascii=False, separators=(',', ':'))
+    if fmt == 'compact':
+        return compact
+    if fmt == 'gzip':
+        data = base64.b64encode(gzip.compress(compact.encode('utf-8'), mtime=0)).decode('ascii')
+        return json.dumps({'encoding': GZIP_ENCODING, 'data': data}, separators=(',', ':'))
+    raise ValueError(f"不支持的凭证格式: {fmt}")
+
+
+def decode_credential(credential: str) -> dict:
+    """解析任意格式的凭证字符串为 storage_state（格式错误时抛出 ValueError）"""
+    data = json.loads(credential)
+    if isinstance(data, dict) and data.get('encoding') == GZIP_ENCODING:
+        try:
+            raw = gzip.decompress(base64.b64decode(data['data']))
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"凭证解压失败: {e}")
+        data = json.loads(raw.decode('utf-8'))
+    if not isinstance(data, dict):
+        raise ValueError("凭证不是 JSON 对象")
+    return data
+
+
+def earliest_expiry(state: dict) -> Optional[float]:
+    """所有持久 Cookie 中最早的过期时间（Unix 秒），只有会话 Cookie 时返回 None"""
+    expires = [c['expires'] for c in state.get('cookies', []) if (c.get('expires') or -1) > 0]
+    return min(expires) if expires else None
+
+
+def size_report(before: int, after: int) -> str:
+    """大小变化说明"""
+    ratio = after / before * 100 if before else 100
+    return f"{before / 1024:.1f} KB -> {after / 1024:.1f} KB ({ratio:.0f}%)"
+
+
+def build_credential(state: dict, platform: Optional[str] = None,
+                     fmt: str = 'compact') -> Tuple[str, Dict[str, int]]:
+    """裁剪（platform 为 None 时不裁剪）并序列化，返回 (凭证, 统计)"""
+    original = len(json.dumps(state, ensure_ascii=False, indent=2).encode('utf-8'))
+    pruned = prune_storage_state(platform, state) if platform else state
+    credential = encode_credential(pruned, fmt)
+    stats = {
+        'cookies_before': len(state.get('cookies', [])),
+        'cookies_after': len(pruned.get('cookies', [])),
+        'origins_before': len(state.get('origins', [])),
+        'origins_after': len(pruned.get('origins', [])),
+        'bytes_before': original,
+        'bytes_after': len(credential.encode('utf-8')),
+    }
+    return credential, stats
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+凭证历史
+按 (平台, 账号) 保存每次刷新得到的凭证：第一次保存完整快照，之后只保存与上一版本相比
+新增、修改、删除的 Cookie 和 localStorage 项；每隔 keyframe_interval 个版本再存一次完整快照，
+查询任意时间点时最多回放这么多个增量。每个账号最多保留 max_versions 个版本，
+超出后删除最早的版本（保留部分的第一个版本改存完整快照）
+
+存储: <目录>/<平台编码>/<账号>.jsonl，每行一个版本
+  {"v": 3, "ts": 1700000000.0, "full": {...storage_state...}}
+  {"v": 4, "ts": 1700003600.0, "delta": {"cookies": {"set": [...], "del": [...]},
+                                          "storage": {"set": [...], "del": [...]}}}
+
+用法:
+  python credential_history.py meituan store001                 # 最新版本
+  python credential_history.py meituan store001 --at 2024-05-01T08:00
+  python credential_history.py meituan store001 --changes
+"""
+
+import sys
+import json
+import time
+import bisect
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app_paths import app_data_dir, safe_file_name
+from credential_format import decode_credential
+
+
+def _cookie_key(cookie: dict) -> Tuple[str, str, str]:
+    return cookie.get('name', ''), cookie.get('domain', ''), cookie.get('path', '/')
+
+
+def _storage_items(state: dict) -> Dict[Tuple[str, str], str]:
+    """localStorage 展开为 {(origin, key): value}"""
+    items = {}
+    for origin in state.get('origins', []):
+        for item in origin.get('localStorage', []):
+            items[(origin['origin'], item['name'])] = item['value']
+    return items
+
+
+def state_delta(old: dict, new: dict) -> dict:
+    """计算两个 storage_state 之间的增量（没有变化时各列表为空）"""
+    old_cookies = {_cookie_key(c): c for c in old.get('cookies', [])}
+    new_cookies = {_cookie_key(c): c for c in new.get('cookies', [])}
+    old_items = _storage_items(old)
+    new_items = _storage_items(new)
+    return {
+        'cookies': {
+            'set': [c for key, c in new_cookies.items() if old_cookies.get(key) != c],
+            'del': [list(key) for key in old_cookies if key not in new_cookies],
+        },
+        'storage': {
+            'set': [[origin, name, value] for (origin, name), value in new_items.items()
+                    if old_items.get((origin, name)) != value],
+            'del': [list(key) for key in old_items if key not in new_items],
+        },
+    }
+
+
+def delta_is_empty(delta: dict) -> bool:
+    return not any(delta[part][op] for part in ('cookies', 'storage') for op in ('set', 'del'))
+
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    """在 storage_state 上应用增量，返回新的 storage_state（不修改原对象）"""
+    cookies = {_cookie_key(c): c for c in state.get('cookies', [])}
+    for key in delta['cookies']['del']:
+        cookies.pop(tuple(key), None)
+    for cookie in delta['cookies']['set']:
+        cookies[_cookie_key(cookie)] = cookie
+
+    items = _storage_items(state)
+    for key in delta['storage']['del']:
+        items.pop(tuple(key), None)
+    for origin, name, value in delta['storage']['set']:
+        items[(origin, name)] = value
+
+    origins: Dict[str, List[dict]] = {}
+    for (origin, name), value in items.items():
+        origins.setdefault(origin, []).append({'name': name, 'value': value})
+    return {
+        'cookies': list(cookies.values()),
+        'origins': [{'origin': origin, 'localStorage': entries} for origin, entries in origins.items()],
+    }
+
+
+def _dumps(entry: dict) -> str:
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+class CredentialHistory:
+    """凭证历史（追加写入，按文件缓存已解析的版本）"""
+
+    def __init__(self, root: Optional[Path] = None, keyframe_interval: int = 20, max_versions: int = 500):
+        self.root = Path(root) if root is not None else app_data_dir() / 'history'
+        self.keyframe_interval = keyframe_interval
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        # 路径 -> (文件修改时间, 版本列表)
+        self._cache: Dict[Path, Tuple[float, List[dict]]] = {}
+
+    def _path(self, platform: str, account: str) -> Path:
+        return self.root / platform / f"{safe_file_name(account)}.jsonl"
+
+    def _entries(self, path: Path) -> List[dict]:
+        """读取所有版本（文件未变化时使用缓存）"""
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return []
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        self._cache[path] = (mtime, entries)
+        return entries
+
+    def _state_at(self, entries: List[dict], index: int) -> dict:
+        """还原第 index 个版本：从之前最近的完整快照开始回放增量"""
+        start = index
+        while 'full' not in entries[start]:
+            start -= 1
+        state = entries[start]['full']
+        for entry in entries[start + 1:index + 1]:
+            state = apply_delta(state, entry['delta'])
+        return state
+
+    def record(self, platform: str, account: str, credential, ts: Optional[float] = None) -> Optional[dict]:
+        """记录一次刷新结果（凭证字符串或 storage_state），与最新版本相同时不记录
+
+        返回写入的版本（含 v、ts，以及 full 或 delta）。
+        """
+        state = decode_credential(credential) if isinstance(credential, str) else credential
+        path = self._path(platform, account)
+        with self._lock:
+            entries = self._entries(path)
+            if entries:
+                delta = state_delta(self._state_at(entries, len(entries) - 1), state)
+                if delta_is_empty(delta):
+                    return None
+            version = entries[-1]['v'] + 1 if entries else 1
+            entry = {'v': version, 'ts': time.time() if ts is None else ts}
+            if not entries or (version - 1) % self.keyframe_interval == 0:
+                entry['full'] = state
+            else:
+                entry['delta'] = delta
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(_dumps(entry) + '\n')
+            entries.append(entry)
+            # 超出上限较多时才重写文件，避免每次写入都重写
+            if len(entries) > self.max_versions + self.keyframe_interval:
+                entries = self._trim(path, entries)
+            self._cache[path] = (path.stat().st_mtime, entries)
+        return entry
+
+    def _trim(self, path: Path, entries: List[dict]) -> List[dict]:
+        """只保留最新的 max_versions 个版本，第一个版本改存完整快照"""
+        start = len(entries) - self.max_versions
+        first = entries[start]
+        kept = [{'v': first['v'], 'ts': first['ts'], 'full': self._state_at(entries, start)}] + entries[start + 1:]
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(_dumps(entry) + '\n' for entry in kept))
+        tmp_path.replace(path)
+        return kept
+
+    def latest(self, platform: str, account: str) -> Optional[dict]:
+        """最新的 storage_state"""
+        with self._lock:
+            entries = self._entries(self._path(platform, account))
+            return self._state_at(entries, len(entries) - 1) if entries else None
+
+    def as_of(self, platform: str, account: str, ts: float) -> Optional[dict]:
+        """ts 时刻有效的 storage_state（ts 早于第一个版本时返回 None）"""
+        with self._lock:
+            entries = self._entries(self._path(platform, account))
+            index = bisect.bisect_right([e['ts'] for e in entries], ts) - 1
+            return self._state_at(entries, index) if index >= 0 else None
+
+    def changes(self, platform: str, account: str, since: Optional[float] = None,
+                until: Optional[float] = None) -> List[dict]:
+        """时间范围内每个版本相对上一版本的变化 [{v, ts, delta}]（第一个版本相对空凭证）"""
+        empty = {'cookies': [], 'origins': []}
+        with self._lock:
+            entries = self._entries(self._path(platform, account))
+            result = []
+            for index, entry in enumerate(entries):
+                if since is not None and entry['ts'] < since:
+                    continue
+                if until is not None and entry['ts'] > until:
+                    break
+                if 'delta' in entry:
+                    delta = entry['delta']
+                else:
+                    previous = self._state_at(entries, index - 1) if index > 0 else empty
+                    delta = state_delta(previous, entry['full'])
+                result.append({'v': entry['v'], 'ts': entry['ts'], 'delta': delta})
+            return result
+
+
+def parse_time(value: str) -> float:
+    """解析时间参数：Unix 时间戳或 ISO 格式（本地时间）"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def run_query(platform: str, account: str, root: Optional[str] = None, at: Optional[str] = None,
+              changes: bool = False, since: Optional[str] = None) -> int:
+    """查询并输出历史，返回退出码（参数无效时抛出 ValueError）"""
+    from ota_platforms import PLATFORM_NAMES, normalize_platform
+
+    code = PLATFORM_NAMES[normalize_platform(platform)]
+    at_ts = parse_time(at) if at else None
+    since_ts = parse_time(since) if since else None
+
+    history = CredentialHistory(root)
+    if changes:
+        for change in history.changes(code, account, since=since_ts):
+            cookies, storage = change['delta']['cookies'], change['delta']['storage']
+            print(f"v{change['v']} {datetime.fromtimestamp(change['ts']):%Y-%m-%d %H:%M:%S} "
+                  f"Cookie +{len(cookies['set'])} -{len(cookies['del'])} "
+                  f"localStorage +{len(storage['set'])} -{len(storage['del'])}")
+        return 0
+
+    state = history.as_of(code, account, at_ts) if at_ts is not None else history.latest(code, account)
+    if state is None:
+        print("❌ 没有历史记录", file=sys.stderr)
+        return 2
+    print(json.dumps(state, ensure_ascii=False, indent=2))
+    return 0
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py history 子命令共用）"""
+    parser.add_argument('platform', help="平台: meituan / fliggy / ctrip")
+    parser.add_argument('account', help="账号")
+    parser.add_argument('--dir', help="历史目录（默认用户数据目录下的 history，批量刷新为 <out>/history）")
+    parser.add_argument('--at', help="查询该时刻的凭证（Unix 时间戳或 ISO 时间）")
+    parser.add_argument('--changes', action='store_true', help="列出每个版本的变化")
+    parser.add_argument('--since', help="--changes 的起始时间")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="查询凭证历史")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(run_query(args.platform, args.account, root=args.dir, at=args.at,
+                           changes=args.changes, since=args.since))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
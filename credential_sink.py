@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+凭证推送
+把刷新得到的凭证批量推送到后端账号状态接口，代替从 GUI 复制后手动保存
+
+  - 每个凭证先写入本地发件箱（outbox 目录），推送成功后才删除，后端不可用时不会丢失
+  - 后台线程把发件箱中的凭证按批（batch_size）打包，通过一条长连接 POST 到接口
+  - 同一账号有多个待推送凭证时只推送最新的一个
+  - 连接失败、408/429/5xx 时退避重试；每个凭证带 idempotencyKey，重复推送不会重复写入
+  - 其他 4xx 视为数据问题，移到 outbox/failed 目录
+
+请求体（字段与 OtaAccountState 对应，accountId 由后端按平台和账号查找）:
+  {"states": [{"platformCode": "meituan", "account": "...", "storeId": "...",
+               "contextData": "<凭证>", "loginStatus": 1, "status": 1,
+               "acquiredAt": 1700000000.0, "idempotencyKey": "<sha256>"}]}
+
+用法:
+  python credential_sink.py --endpoint http://backend/api/ota/account-states --outbox credentials/outbox
+  python credential_sink.py --bench 5000   # 对本地替身接口测量推送吞吐量
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import http.client
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional, Tuple
+
+
+# 可重试的 HTTP 状态码
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+RETRY_BASE = 1.0
+RETRY_MAX = 60.0
+
+
+class CredentialSink(ABC):
+    """凭证输出接口：BatchRefresher 每保存一个凭证调用一次 put"""
+
+    @abstractmethod
+    def put(self, platform: str, account: str, store_id: str, credential: str):
+        """输出一个凭证"""
+
+    def close(self):
+        pass
+
+
+def state_payload(platform: str, account: str, store_id: str, credential: str,
+                  acquired_at: Optional[float] = None) -> dict:
+    """构造一条账号状态（与 OtaAccountState 字段对应）"""
+    key = hashlib.sha256(f"{platform}\n{account}\n{credential}".encode('utf-8')).hexdigest()
+    return {
+        'platformCode': platform,
+        'account': account,
+        'storeId': store_id,
+        'contextData': credential,
+        'loginStatus': 1,
+        'status': 1,
+        'acquiredAt': time.time() if acquired_at is None else acquired_at,
+        'idempotencyKey': key,
+    }
+
+
+class HttpPushSink(CredentialSink):
+    """批量推送到 HTTP 接口（带本地发件箱）"""
+
+    def __init__(self, endpoint: str, outbox_dir, batch_size: int = 100, flush_interval: float = 1.0,
+                 token: Optional[str] = None, timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.outbox = Path(outbox_dir)
+        self.failed_dir = self.outbox / 'failed'
+        self.outbox.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.token = token
+        self.timeout = timeout
+        self.sent = 0
+        self.batches = 0
+        self.errors = 0
+        self._parts = urlsplit(endpoint)
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._send_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'HttpPushSink':
+        """启动后台推送线程（发件箱中上次未推送的凭证会先推送）"""
+        self._thread = threading.Thread(target=self._run, name='credential-push', daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, platform: str, account: str, store_id: str, credential: str):
+        """写入发件箱并唤醒推送线程"""
+        payload = state_payload(platform, account, store_id, credential)
+        name = f"{time.time_ns()}-{payload['idempotencyKey'][:16]}.json"
+        tmp_path = self.outbox / f".{name}.tmp"
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding='utf-8')
+        tmp_path.replace(self.outbox / name)
+        self._wake.set()
+
+    def pending(self) -> int:
+        return sum(1 for _ in self.outbox.glob('*.json'))
+
+    def flush(self) -> bool:
+        """立即推送发件箱中的全部凭证，全部成功时返回 True"""
+        with self._send_lock:
+            pending = self._pending_states()
+            for i in range(0, len(pending), self.batch_size):
+                if not self._send(pending[i:i + self.batch_size]):
+                    return False
+            return True
+
+    def close(self, timeout: float = 30.0):
+        """停止推送线程，并尽量推送剩余凭证（失败的留在发件箱，下次启动时推送）"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        delay = 0.0
+        while not self._stop.is_set():
+            self._wake.wait(delay or self.flush_interval)
+            self._wake.clear()
+            ok = self.flush()
+            delay = 0.0 if ok else min(max(delay * 2, RETRY_BASE), RETRY_MAX)
+        self.flush()
+
+    def _pending_states(self) -> List[Tuple[Path, dict]]:
+        """发件箱中的待推送凭证（按写入顺序）；同一账号只保留最新的，旧的直接删除"""
+        latest: Dict[Tuple[str, str], Tuple[Path, dict]] = {}
+        for path in sorted(self.outbox.glob('*.json')):
+            try:
+                payload = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            key = (payload['platformCode'], payload['account'])
+            if key in latest:
+                latest[key][0].unlink(missing_ok=True)
+            latest[key] = (path, payload)
+        return sorted(latest.values(), key=lambda item: item[0].name)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self._parts.scheme == 'https' else http.client.HTTPConnection
+            self._conn = cls(self._parts.netloc, timeout=self.timeout)
+        return self._conn
+
+    def _send(self, batch: List[Tuple[Path, dict]]) -> bool:
+        """推送一批，成功后删除对应文件；可重试的失败返回 False"""
+        body = json.dumps({'states': [payload for _, payload in batch]}, ensure_ascii=False).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Idempotency-Key': hashlib.sha256(
+                ''.join(p['idempotencyKey'] for _, p in batch).encode('ascii')).hexdigest(),
+        }
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        target = self._parts.path or '/'
+        if self._parts.query:
+            target += '?' + self._parts.query
+
+        status = None
+        for attempt in range(2):
+            # 长连接可能已被服务端关闭，失败时换新连接重试一次
+            try:
+                conn = self._connection()
+                conn.request('POST', target, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                break
+            except (http.client.HTTPException, OSError) as e:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                if attempt:
+                    self.errors += 1
+                    print(f"推送凭证失败（将重试）: {e}")
+                    return False
+
+        if 200 <= status < 300:
+            for path, _ in batch:
+                path.unlink(missing_ok=True)
+            self.sent += len(batch)
+            self.batches += 1
+            return True
+        self.errors += 1
+        if status in RETRY_STATUSES:
+            print(f"推送凭证失败（将重试）: HTTP {status}")
+            return False
+        # 数据问题，重试也不会成功，移出发件箱
+        print(f"推送凭证被拒绝: HTTP {status}，已移到 {self.failed_dir}")
+        self.failed_dir.mkdir(exist_ok=True)
+        for path, _ in batch:
+            path.replace(self.failed_dir / path.name)
+        return True
+
+
+def push_sink_from_env(outbox_dir, endpoint: Optional[str] = None) -> Optional[HttpPushSink]:
+    """按参数或环境变量 OTA_PUSH_ENDPOINT / OTA_PUSH_TOKEN 创建推送，未配置时返回 None"""
+    endpoint = endpoint or os.environ.get('OTA_PUSH_ENDPOINT')
+    if not endpoint:
+        return None
+    return HttpPushSink(endpoint, outbox_dir, token=os.environ.get('OTA_PUSH_TOKEN')).start()
+
+
+def run_benchmark(count: int, batch_size: int = 100) -> float:
+    """对本地替身接口推送 count 个凭证，返回每秒推送数"""
+    import tempfile
+    from mock_backend_server import MockBackendServer
+
+    credential = json.dumps({'cookies': [{'name': 'session', 'value': 'x' * 64, 'domain': '.meituan.com',
+                                          'path': '/', 'expires': -1}], 'origins': []},
+                            separators=(',', ':'))
+    with MockBackendServer() as server, tempfile.TemporaryDirectory() as outbox:
+        sink = HttpPushSink(server.endpoint, outbox, batch_size=batch_size)
+        for i in range(count):
+            sink.put('meituan', f"bench{i}", str(i), credential)
+        start = time.perf_counter()
+        sink.flush()
+        elapsed = time.perf_counter() - start
+        sink.close()
+        print(f"推送 {sink.sent} 个（{sink.batches} 批），耗时 {elapsed:.2f}s，"
+              f"{sink.sent / elapsed:.0f} 个/秒，后端收到 {len(server.states)} 个账号")
+        return sink.sent / elapsed
+
+
+def run_push(endpoint: Optional[str], outbox: str, batch_size: int = 100) -> int:
+    """推送发件箱中的全部凭证，返回退出码（未配置接口地址时抛出 ValueError）"""
+    endpoint = endpoint or os.environ.get('OTA_PUSH_ENDPOINT')
+    if not endpoint:
+        raise ValueError("请指定 --endpoint 或设置环境变量 OTA_PUSH_ENDPOINT")
+    sink = HttpPushSink(endpoint, outbox, batch_size=batch_size, token=os.environ.get('OTA_PUSH_TOKEN'))
+    ok = sink.flush()
+    sink.close()
+    print(f"已推送 {sink.sent} 个，发件箱剩余 {sink.pending()} 个")
+    return 0 if ok else 2
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py push 子命令共用）"""
+    parser.add_argument('--endpoint', help="账号状态接口地址（默认读取环境变量 OTA_PUSH_ENDPOINT）")
+    parser.add_argument('--outbox', default='credentials/outbox', help="发件箱目录")
+    parser.add_argument('--batch-size', type=int, default=100, help="每个请求包含的凭证数")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="推送发件箱中的凭证到后端")
+    add_arguments(parser)
+    parser.add_argument('--bench', type=int, metavar='N', help="对本地替身接口推送 N 个凭证并测量吞吐量")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, batch_size=args.batch_size)
+        return
+    try:
+        sys.exit(run_push(args.endpoint, args.outbox, batch_size=args.batch_size))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地凭证库
+把每个账号最新的凭证连同过期时间、获取时间、最近验证时间保存在 SQLite 中，
+按索引查询即将过期的账号或某门店的最新凭证，不需要逐个解析凭证 JSON
+
+表 credentials（每个 平台+账号 一行）:
+  platform, account, store_id, storage_state, expires_at, acquired_at, verified_at
+  expires_at 为平台 Cookie 中最早的过期时间（只有会话 Cookie 时为 NULL）
+  acquired_at 为最近一次真正登录的时间（复用会话不更新），verified_at 为最近一次确认凭证有效的时间
+
+用法:
+  python credential_store.py --expiring 24 --platform fliggy   # 24 小时内过期的飞猪账号
+  python credential_store.py --store-id 1001                     # 门店 1001 的最新凭证
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app_paths import app_data_dir, safe_file_name
+from credential_format import decode_credential, earliest_expiry
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    platform      TEXT NOT NULL,
+    account       TEXT NOT NULL,
+    store_id      TEXT NOT NULL DEFAULT '',
+    storage_state TEXT NOT NULL,
+    expires_at    REAL,
+    acquired_at   REAL NOT NULL,
+    verified_at   REAL,
+    PRIMARY KEY (platform, account)
+);
+CREATE INDEX IF NOT EXISTS idx_credentials_platform_expires ON credentials (platform, expires_at);
+CREATE INDEX IF NOT EXISTS idx_credentials_expires ON credentials (expires_at);
+CREATE INDEX IF NOT EXISTS idx_credentials_store ON credentials (store_id, acquired_at);
+"""
+
+# 查询结果中不含凭证内容的列
+META_COLUMNS = "platform, account, store_id, expires_at, acquired_at, verified_at"
+
+
+class CredentialStore:
+    """SQLite 凭证库（线程安全，多线程共用一个连接）"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else app_data_dir() / 'credentials.db'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # 与凭证文件名相同的转换，按文件名匹配账号时使用
+        self._conn.create_function('safe_file_name', 1, safe_file_name, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def put(self, platform: str, account: str, credential: str, store_id: str = '',
+            acquired_at: Optional[float] = None, verified_at: Optional[float] = None,
+            reused: bool = False):
+        """保存账号最新凭证（覆盖旧记录，store_id 为空时保留原门店ID），过期时间从 Cookie 计算
+
+        reused=True 表示凭证来自复用的旧会话：只更新凭证和过期时间，保留原获取时间和验证时间
+        （验证时间由调用方通过 mark_verified 记录）；没有旧记录时按当前时间作为获取时间。
+        """
+        acquired_at = time.time() if acquired_at is None else acquired_at
+        expires_at = earliest_expiry(decode_credential(credential))
+        # 没有传门店ID（如 GUI 单账号登录）时保留已有的门店ID
+        update = ("store_id = COALESCE(NULLIF(excluded.store_id, ''), store_id),"
+                  " storage_state = excluded.storage_state, expires_at = excluded.expires_at")
+        if not reused:
+            update += ", acquired_at = excluded.acquired_at, verified_at = excluded.verified_at"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO credentials (platform, account, store_id, storage_state, expires_at,"
+                " acquired_at, verified_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                f" ON CONFLICT (platform, account) DO UPDATE SET {update}",
+                (platform, account, store_id, credential, expires_at, acquired_at,
+                 acquired_at if verified_at is None else verified_at))
+
+    def mark_verified(self, platform: str, account: str, verified_at: Optional[float] = None):
+        """记录凭证最近一次验证有效的时间"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE credentials SET verified_at = ? WHERE platform = ? AND account = ?",
+                (time.time() if verified_at is None else verified_at, platform, account))
+
+    def mark_verified_by_name(self, platform: str, name: str, verified_at: Optional[float] = None) -> int:
+        """按凭证文件名（门店ID，没有门店ID时为账号，见 batch_refresh 的输出路径）记录验证时间，返回更新的行数
+
+        文件名中的特殊字符已被替换（app_paths.safe_file_name），库中的门店ID和账号按同样方式转换后比较。
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE credentials SET verified_at = ? WHERE platform = ?"
+                " AND safe_file_name(CASE WHEN store_id != '' THEN store_id ELSE account END) = ?",
+                (time.time() if verified_at is None else verified_at, platform, safe_file_name(name)))
+        return cursor.rowcount
+
+    def get(self, platform: str, account: str) -> Optional[Dict]:
+        """账号的最新凭证记录（含 storage_state 字符串）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM credentials WHERE platform = ? AND account = ?",
+                (platform, account)).fetchone()
+        return dict(row) if row else None
+
+    def latest_for_store(self, store_id: str) -> Optional[Dict]:
+        """门店最近获取的凭证记录"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM credentials WHERE store_id = ? ORDER BY acquired_at DESC LIMIT 1",
+                (store_id,)).fetchone()
+        return dict(row) if row else None
+
+    def expiring(self, within: float, platform: Optional[str] = None,
+                 now: Optional[float] = None) -> List[Dict]:
+        """within 秒内过期（含已过期）的账号，按过期时间排序（不含凭证内容）"""
+        deadline = (time.time() if now is None else now) + within
+        sql = f"SELECT {META_COLUMNS} FROM credentials WHERE expires_at <= ?"
+        params: list = [deadline]
+        if platform is not None:
+            sql += " AND platform = ?"
+            params.append(platform)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY expires_at", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def accounts(self, platform: Optional[str] = None) -> List[Dict]:
+        """所有账号的元数据（不含凭证内容）"""
+        sql = f"SELECT {META_COLUMNS} FROM credentials"
+        params: list = []
+        if platform is not None:
+            sql += " WHERE platform = ?"
+            params.append(platform)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY platform, account", params).fetchall()
+        return [dict(row) for row in rows]
+
+
+def format_time(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') if ts else '-'
+
+
+def run_query(db: Optional[str] = None, platform: Optional[str] = None,
+              expiring_hours: Optional[float] = None, store_id: Optional[str] = None) -> int:
+    """查询并输出凭证库，返回退出码（参数无效时抛出 ValueError）"""
+    from ota_platforms import PLATFORM_NAMES, normalize_platform
+
+    code = PLATFORM_NAMES[normalize_platform(platform)] if platform else None
+    store = CredentialStore(db)
+    try:
+        if store_id is not None:
+            row = store.latest_for_store(store_id)
+            if row is None:
+                print(f"❌ 没有门店 {store_id} 的凭证", file=sys.stderr)
+                return 2
+            print(row['storage_state'])
+            return 0
+
+        if expiring_hours is not None:
+            rows = store.expiring(expiring_hours * 3600, platform=code)
+        else:
+            rows = store.accounts(code)
+        for row in rows:
+            print(f"{row['platform']}\t{row['account']}\t{row['store_id'] or '-'}\t"
+                  f"过期 {format_time(row['expires_at'])}\t获取 {format_time(row['acquired_at'])}\t"
+                  f"验证 {format_time(row['verified_at'])}")
+        print(f"共 {len(rows)} 个账号", file=sys.stderr)
+        return 0
+    finally:
+        store.close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py db 子命令共用）"""
+    parser.add_argument('--db', help="凭证库路径（默认用户数据目录下的 credentials.db，批量刷新为 <out>/credentials.db）")
+    parser.add_argument('--platform', help="只看某个平台: meituan / fliggy / ctrip")
+    parser.add_argument('--expiring', type=float, metavar='HOURS', help="列出指定小时内过期的账号")
+    parser.add_argument('--store-id', help="输出该门店最新的凭证")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="查询本地凭证库")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(run_query(args.db, platform=args.platform, expiring_hours=args.expiring,
+                           store_id=args.store_id))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+凭证查看控件
+显示凭证摘要（Cookie、origin、localStorage 项数量、大小、最早过期时间）和可折叠的树：
+  - 解析和整理在后台线程完成，界面线程只设置模型
+  - 树只保存每个值的前 PREVIEW_CHARS 个字符，视图只渲染可见行
+  - 复制时直接使用原始凭证字符串，不从控件中取文本
+"""
+
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeView, QHeaderView
+from PyQt6.QtCore import Qt, QThread, QAbstractItemModel, QModelIndex, pyqtSignal
+
+from credential_format import decode_credential, earliest_expiry
+
+
+# 树中每个值显示的最大字符数
+PREVIEW_CHARS = 200
+
+
+def _size_text(size: int) -> str:
+    return f"{size / 1024:.1f} KB" if size >= 1024 else f"{size} B"
+
+
+def _preview(value: str) -> str:
+    value = value.replace('\n', ' ')
+    return value if len(value) <= PREVIEW_CHARS else value[:PREVIEW_CHARS] + '…'
+
+
+class _Node:
+    """树节点：名称、值预览、说明"""
+
+    __slots__ = ('name', 'value', 'note', 'children', 'parent', 'row')
+
+    def __init__(self, name: str, value: str = '', note: str = '', parent: Optional['_Node'] = None):
+        self.name = name
+        self.value = value
+        self.note = note
+        self.children: List['_Node'] = []
+        self.parent = parent
+        self.row = 0
+
+    def add(self, name: str, value: str = '', note: str = '') -> '_Node':
+        child = _Node(name, value, note, self)
+        child.row = len(self.children)
+        self.children.append(child)
+        return child
+
+
+def summarize_credential(credential: str, state: Optional[dict] = None) -> dict:
+    """凭证摘要（格式错误时抛出 ValueError），已解析的 storage_state 可通过 state 传入"""
+    if state is None:
+        state = decode_credential(credential)
+    cookies = state.get('cookies', [])
+    origins = state.get('origins', [])
+    return {
+        'cookies': len(cookies),
+        'domains': len({c.get('domain', '').lstrip('.') for c in cookies}),
+        'origins': len(origins),
+        'items': sum(len(o.get('localStorage', [])) for o in origins),
+        'bytes': len(credential.encode('utf-8')),
+        'earliest_expiry': earliest_expiry(state),
+    }
+
+
+def build_tree(state: dict) -> _Node:
+    """storage_state 转换为树（Cookie 按域名分组，localStorage 按 origin 分组）"""
+    root = _Node('')
+    cookies = state.get('cookies', [])
+    cookie_root = root.add(f"Cookie（{len(cookies)}）")
+    by_domain = {}
+    for cookie in cookies:
+        by_domain.setdefault(cookie.get('domain', ''), []).append(cookie)
+    for domain in sorted(by_domain):
+        domain_node = cookie_root.add(domain, note=f"{len(by_domain[domain])} 个")
+        for cookie in by_domain[domain]:
+            expires = cookie.get('expires') or -1
+            note = datetime.fromtimestamp(expires).strftime('%Y-%m-%d %H:%M') if expires > 0 else "会话"
+            domain_node.add(cookie.get('name', ''), _preview(str(cookie.get('value', ''))), note)
+
+    origins = state.get('origins', [])
+    storage_root = root.add(f"localStorage（{len(origins)} 个 origin）")
+    for origin in origins:
+        items = origin.get('localStorage', [])
+        origin_node = storage_root.add(origin.get('origin', ''), note=f"{len(items)} 项")
+        for item in items:
+            value = str(item.get('value', ''))
+            origin_node.add(item.get('name', ''), _preview(value), _size_text(len(value.encode('utf-8'))))
+    return root
+
+
+class CredentialModel(QAbstractItemModel):
+    """只读树模型（数据来自 build_tree）"""
+
+    HEADERS = ("名称", "值", "说明")
+
+    def __init__(self, root: Optional[_Node] = None, parent=None):
+        super().__init__(parent)
+        self._root = root or _Node('')
+
+    def _node(self, index: QModelIndex) -> _Node:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if 0 <= row < len(node.children):
+            return self.createIndex(row, column, node.children[row])
+        return QModelIndex()
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return (node.name, node.value, node.note)[index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+
+class _ParseWorker(QThread):
+    """后台解析凭证并构建树"""
+    parsed = pyqtSignal(int, object, object)  # 序号, 摘要, 树根节点
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, serial: int, credential: str):
+        super().__init__()
+        self.serial = serial
+        self.credential = credential
+
+    def run(self):
+        try:
+            state = decode_credential(self.credential)
+            summary = summarize_credential(self.credential, state)
+            root = build_tree(state)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.failed.emit(self.serial, str(e))
+            return
+        self.parsed.emit(self.serial, summary, root)
+
+
+def summary_text(summary: dict) -> str:
+    """摘要的显示文本"""
+    parts = [
+        f"Cookie {summary['cookies']} 个（{summary['domains']} 个域名）",
+        f"localStorage {summary['origins']} 个 origin / {summary['items']} 项",
+        f"大小 {_size_text(summary['bytes'])}",
+    ]
+    expiry = summary['earliest_expiry']
+    if expiry is None:
+        parts.append("只有会话 Cookie")
+    else:
+        hours = (expiry - time.time()) / 3600
+        left = f"剩余 {hours / 24:.1f} 天" if hours >= 24 else (f"剩余 {hours:.1f} 小时" if hours > 0 else "已过期")
+        parts.append(f"最早过期 {datetime.fromtimestamp(expiry):%Y-%m-%d %H:%M}（{left}）")
+    return " · ".join(parts)
+
+
+class CredentialView(QWidget):
+    """凭证摘要 + 树（set_credential 后在后台解析，credential() 返回原始字符串）"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._credential = ''
+        self._serial = 0
+        self._workers = set()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.summary_label = QLabel("凭证将在这里显示...")
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setStyleSheet("color: #555; font-size: 12px; padding: 4px 0;")
+        layout.addWidget(self.summary_label)
+
+        self.tree = QTreeView()
+        self.tree.setUniformRowHeights(True)
+        self.tree.setAlternatingRowColors(True)
+        self.tree.setModel(CredentialModel(parent=self.tree))
+        self.tree.header().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.tree.setStyleSheet("""
+            QTreeView {
+                background-color: #f6f8fa;
+                border: 2px solid #e1e4e8;
+                border-radius: 6px;
+                font-family: "Consolas", "Monaco", "Courier New", monospace;
+                font-size: 12px;
+            }
+        """)
+        layout.addWidget(self.tree)
+
+    def credential(self) -> str:
+        """原始凭证字符串"""
+        return self._credential
+
+    def clear(self):
+        self._serial += 1
+        self._credential = ''
+        self.summary_label.setText("凭证将在这里显示...")
+        self._set_root(None)
+
+    def set_credential(self, credential: str):
+        """显示凭证（解析在后台线程进行）"""
+        self._serial += 1
+        self._credential = credential
+        self.summary_label.setText(f"正在解析凭证（{_size_text(len(credential))}）...")
+        self._set_root(None)
+        worker = _ParseWorker(self._serial, credential)
+        worker.parsed.connect(self._on_parsed)
+        worker.failed.connect(self._on_failed)
+        worker.finished.connect(lambda: self._workers.discard(worker))
+        self._workers.add(worker)
+        worker.start()
+
+    def _set_root(self, root: Optional[_Node]):
+        old = self.tree.model()
+        self.tree.setModel(CredentialModel(root, self.tree))
+        if old is not None:
+            old.deleteLater()
+
+    def _on_parsed(self, serial: int, summary: dict, root: _Node):
+        if serial != self._serial:
+            return
+        self.summary_label.setText(summary_text(summary))
+        self._set_root(root)
+        # 只展开第一层（Cookie / localStorage），域名和 origin 由用户展开
+        for row in range(len(root.children)):
+            self.tree.expand(self.tree.model().index(row, 0))
+        self.tree.resizeColumnToContents(0)
+
+    def _on_failed(self, serial: int, error: str):
+        if serial == self._serial:
+            self.summary_label.setText(f"凭证无法解析: {error}")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录失败现场记录
+每次登录在内存中记录少量事件（页面跳转、控制台错误、主要请求，均有条数上限），登录成功时直接丢弃，
+失败时才把现场写入磁盘；Playwright 追踪（DOM 快照）开销较大，只在 trace=True 时开启:
+
+  <目录>/<时间>-<平台编码>-<账号>/
+    summary.json    错误、最终 URL、各阶段耗时和事件
+    trace.zip       Playwright 追踪（trace=True 时），只记录到填写密码之前（npx playwright show-trace trace.zip 查看）
+    screenshot.png  失败时的页面截图
+    page.html       失败时的页面 HTML
+    network.har     主要请求（只记录方法、URL、状态和耗时，不含请求头和请求体，避免泄露密码）
+
+追踪在填写密码前结束（之后的 DOM 快照和登录请求会包含密码），保存现场后还会检查每个文件
+（包括 zip 内的文件），含有密码的文件直接删除。
+目录总大小超过 max_bytes 或记录数超过 max_runs 时，从最早的记录开始删除。
+"""
+
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from app_paths import app_data_dir, safe_file_name
+
+
+# 每次登录保留的事件数
+MAX_EVENTS = 300
+# 记录到 HAR 的请求类型
+HAR_RESOURCE_TYPES = {'document', 'xhr', 'fetch', 'script'}
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def file_contains(path: Path, secret: bytes) -> bool:
+    """文件（zip 文件按其中每个文件）是否包含 secret"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return any(secret in archive.read(name) for name in archive.namelist())
+    return secret in path.read_bytes()
+
+
+class FlightRun:
+    """单次登录的现场记录（由 FlightRecorder.begin 创建）"""
+
+    def __init__(self, recorder: 'FlightRecorder', platform: str, account: str, secrets=()):
+        self.recorder = recorder
+        self.platform = platform
+        self.account = account
+        # 不允许出现在现场文件中的内容（密码）
+        self.secrets = [s.encode('utf-8') for s in secrets if s]
+        self.started = time.time()
+        self.events = deque(maxlen=MAX_EVENTS)
+        # 主要请求 -> [状态码, 失败原因]，最多 MAX_EVENTS 条
+        self.requests = OrderedDict()
+        self.tracing = False
+        # 填写密码前保存的追踪（登录成功时删除）
+        self.trace_path: Optional[Path] = None
+
+    def event(self, kind: str, detail: str):
+        self.events.append((round(time.time() - self.started, 3), kind, detail))
+
+    def _record(self, request, status: int = 0, failure: Optional[str] = None):
+        if request.resource_type not in HAR_RESOURCE_TYPES:
+            return
+        record = self.requests.get(request)
+        if record is None:
+            record = self.requests[request] = [0, None]
+            if len(self.requests) > MAX_EVENTS:
+                self.requests.popitem(last=False)
+        record[0] = status or record[0]
+        record[1] = failure or record[1]
+
+    def attach(self, context, page):
+        """注册事件监听（同步、异步 API 通用）"""
+        page.on('framenavigated',
+                lambda frame: self.event('navigate', frame.url) if frame.parent_frame is None else None)
+        page.on('console',
+                lambda msg: self.event('console', f"{msg.type}: {msg.text}") if msg.type == 'error' else None)
+        page.on('pageerror', lambda error: self.event('pageerror', str(error)))
+        context.on('response', lambda response: self._record(response.request, status=response.status))
+        context.on('requestfailed', lambda request: self._record(request, failure=request.failure or 'failed'))
+
+    def start_tracing(self, context):
+        """trace=True 时开启追踪（只记录 DOM 快照，不截图）"""
+        if self.recorder.trace:
+            context.tracing.start(snapshots=True, screenshots=False)
+            self.tracing = True
+
+    async def start_tracing_async(self, context):
+        if self.recorder.trace:
+            await context.tracing.start(snapshots=True, screenshots=False)
+            self.tracing = True
+
+    def stop_tracing(self, context):
+        """填写密码前结束追踪，追踪先存到临时文件，登录失败时再移入现场目录"""
+        if self.tracing:
+            self.tracing = False
+            self.trace_path = self.recorder.partial_path()
+            context.tracing.stop(path=str(self.trace_path))
+
+    async def stop_tracing_async(self, context):
+        if self.tracing:
+            self.tracing = False
+            self.trace_path = self.recorder.partial_path()
+            await context.tracing.stop(path=str(self.trace_path))
+
+    def _drop_partial(self):
+        if self.trace_path is not None:
+            self.trace_path.unlink(missing_ok=True)
+            self.trace_path = None
+
+    def discard(self, context):
+        """登录成功：停止追踪，删除临时文件"""
+        self._drop_partial()
+        if self.tracing:
+            self.tracing = False
+            try:
+                context.tracing.stop()
+            except Exception:
+                pass
+
+    async def discard_async(self, context):
+        self._drop_partial()
+        if self.tracing:
+            self.tracing = False
+            try:
+                await context.tracing.stop()
+            except Exception:
+                pass
+
+    def capture_failure(self, context, page, error: BaseException, phases=None) -> Optional[Path]:
+        """登录失败：保存现场，返回记录目录（保存失败时返回 None）"""
+        run_dir = self.recorder.new_run_dir(self.platform, self.account)
+        html = None
+        try:
+            if self.tracing:
+                self.tracing = False
+                context.tracing.stop(path=str(run_dir / 'trace.zip'))
+            self._move_partial(run_dir)
+            page.screenshot(path=str(run_dir / 'screenshot.png'), timeout=5000)
+            html = page.content()
+        except Exception as e:
+            # 浏览器已关闭时只保存内存中的记录
+            self.event('capture', f"现场保存不完整: {e}")
+        return self._finish(run_dir, page, error, phases, html)
+
+    async def capture_failure_async(self, context, page, error: BaseException, phases=None) -> Optional[Path]:
+        run_dir = self.recorder.new_run_dir(self.platform, self.account)
+        html = None
+        try:
+            if self.tracing:
+                self.tracing = False
+                await context.tracing.stop(path=str(run_dir / 'trace.zip'))
+            self._move_partial(run_dir)
+            await page.screenshot(path=str(run_dir / 'screenshot.png'), timeout=5000)
+            html = await page.content()
+        except Exception as e:
+            self.event('capture', f"现场保存不完整: {e}")
+        return self._finish(run_dir, page, error, phases, html)
+
+    def _move_partial(self, run_dir: Path):
+        if self.trace_path is not None:
+            self.trace_path.replace(run_dir / 'trace.zip')
+            self.trace_path = None
+
+    def remove_secrets(self, run_dir: Path) -> List[str]:
+        """删除含有密码的文件，返回被删除的文件名"""
+        removed = []
+        for path in sorted(run_dir.iterdir()):
+            if path.is_file() and any(file_contains(path, secret) for secret in self.secrets):
+                path.unlink()
+                removed.append(path.name)
+        return removed
+
+    def _finish(self, run_dir: Path, page, error: BaseException, phases, html: Optional[str]) -> Optional[Path]:
+        try:
+            if html is not None:
+                (run_dir / 'page.html').write_text(html, encoding='utf-8')
+            (run_dir / 'network.har').write_text(
+                json.dumps(self.har(), ensure_ascii=False), encoding='utf-8')
+            for name in self.remove_secrets(run_dir):
+                self.event('capture', f"{name} 含有密码，已删除")
+            summary = {
+                'platform': self.platform,
+                'account': self.account,
+                'started': self.started,
+                'error': str(error),
+                'error_type': type(error).__name__,
+                'url': page.url if not page.is_closed() else None,
+                'phases': phases,
+                'events': list(self.events),
+            }
+            (run_dir / 'summary.json').write_text(
+                json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+            if self.remove_secrets(run_dir):
+                print("summary.json 含有密码，已删除")
+        except OSError as e:
+            print(f"保存失败现场出错: {e}")
+            return None
+        self.recorder.evict()
+        print(f"失败现场已保存: {run_dir}")
+        return run_dir
+
+    def har(self) -> dict:
+        """主要请求转换为 HAR（不含请求头和请求体）"""
+        entries = []
+        for request, (status, failure) in self.requests.items():
+            timing = request.timing
+            start = timing.get('startTime', self.started * 1000)
+            elapsed = max(timing.get('responseEnd', 0), 0)
+            entries.append({
+                'startedDateTime': datetime.fromtimestamp(start / 1000, timezone.utc).isoformat(),
+                'time': elapsed,
+                'request': {'method': request.method, 'url': request.url, 'httpVersion': '',
+                            'headers': [], 'queryString': [], 'cookies': [],
+                            'headersSize': -1, 'bodySize': -1},
+                'response': {'status': status,
+                             'statusText': failure or '', 'httpVersion': '', 'headers': [], 'cookies': [],
+                             'content': {'size': -1, 'mimeType': ''}, 'redirectURL': '',
+                             'headersSize': -1, 'bodySize': -1},
+                'cache': {},
+                'timings': {'send': 0, 'wait': elapsed, 'receive': 0},
+                '_resourceType': request.resource_type,
+            })
+        return {'log': {'version': '1.2', 'creator': {'name': 'ota-flight-recorder', 'version': '1.0'},
+                        'entries': entries}}
+
+
+class FlightRecorder:
+    """失败现场的环形目录（按大小和数量淘汰最早的记录）"""
+
+    def __init__(self, root=None, max_bytes: int = 200 * 1024 * 1024, max_runs: int = 50,
+                 trace: bool = False):
+        self.root = Path(root) if root is not None else app_data_dir() / 'failures'
+        self.max_bytes = max_bytes
+        self.max_runs = max_runs
+        self.trace = trace
+        self._lock = threading.Lock()
+
+    def begin(self, platform: str, account: str, secrets=()) -> FlightRun:
+        """开始记录一次登录，secrets 为不允许写入现场文件的内容（密码）"""
+        return FlightRun(self, platform, account, secrets)
+
+    def partial_path(self) -> Path:
+        """临时追踪文件路径（在 .partial 下，不计入记录）"""
+        partial_dir = self.root / '.partial'
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        return partial_dir / f"{uuid.uuid4().hex}.zip"
+
+    def new_run_dir(self, platform: str, account: str) -> Path:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        run_dir = self.root / f"{stamp}-{platform}-{safe_file_name(account)[:40]}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        return run_dir
+
+    def runs(self) -> List[Path]:
+        """所有记录目录，最早的在前（目录名以时间开头）"""
+        if not self.root.is_dir():
+            return []
+        return sorted(p for p in self.root.iterdir() if p.is_dir() and not p.name.startswith('.'))
+
+    def evict(self):
+        """超出大小或数量上限时删除最早的记录（至少保留最新一条）"""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        runs = self.runs()
+        sizes = [_dir_size(p) for p in runs]
+        total = sum(sizes)
+        while len(runs) > 1 and (total > self.max_bytes or len(runs) > self.max_runs):
+            shutil.rmtree(runs[0], ignore_errors=True)
+            total -= sizes[0]
+            runs, sizes = runs[1:], sizes[1:]
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录耗时基准
+在本地模拟服务（mock_ota_server）上重复执行各平台的登录流程，
+统计总耗时和各阶段耗时的 p50/p95，以及每次登录的 Playwright 协议调用次数
+
+用法:
+  python login_benchmark.py --runs 10
+  python login_benchmark.py --platform ctrip --runs 20 --latency 30 --redirects 2 --pool
+  python login_benchmark.py --json bench.json   # 结果写入 JSON，便于比较前后两次改动
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from browser_pool import BrowserPool
+from login_metrics import percentile
+from mock_ota_server import MockOTAServer, route_to_mock
+from ota_engine import LoginEngine, PLATFORM_CODES, PLATFORM_NAMES, normalize_platform
+
+
+class ProtocolCounter:
+    """统计 Playwright 客户端发往驱动的协议消息数
+
+    通过替换 playwright 内部的 Connection._send_message_to_server 实现，
+    playwright 内部实现变化导致无法替换时 count 为 None。
+    """
+
+    def __init__(self):
+        self.count: Optional[int] = 0
+        self._lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self) -> 'ProtocolCounter':
+        try:
+            from playwright._impl._connection import Connection
+            original = Connection._send_message_to_server
+        except (ImportError, AttributeError):
+            self.count = None
+            return self
+
+        counter = self
+
+        def counting(connection, *args, **kwargs):
+            with counter._lock:
+                counter.count += 1
+            return original(connection, *args, **kwargs)
+
+        self._original = original
+        Connection._send_message_to_server = counting
+        return self
+
+    def __exit__(self, *exc):
+        if self._original is not None:
+            from playwright._impl._connection import Connection
+            Connection._send_message_to_server = self._original
+
+    def take(self) -> Optional[int]:
+        """返回当前计数并清零"""
+        if self.count is None:
+            return None
+        with self._lock:
+            value, self.count = self.count, 0
+        return value
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """p50/p95（秒）"""
+    return {'p50': round(percentile(samples, 50), 3), 'p95': round(percentile(samples, 95), 3)}
+
+
+def run_benchmark(server: MockOTAServer, platforms: List[str], runs: int = 5,
+                  use_pool: bool = False, headless: bool = True,
+                  block_resources: bool = True) -> List[dict]:
+    """对每个平台执行 runs 次登录，返回每个平台的统计结果"""
+    pool = BrowserPool(size=1, headless=headless) if use_pool else None
+    if pool is not None:
+        pool.start()
+    results = []
+    try:
+        with ProtocolCounter() as counter:
+            for platform in platforms:
+                name = normalize_platform(platform)
+                totals: List[float] = []
+                phases: Dict[str, List[float]] = {}
+                calls: List[int] = []
+                blocked: List[int] = []
+                failures = []
+                for i in range(runs):
+                    engine = LoginEngine(name, f"bench{i}", "bench-password", pool=pool, headless=headless,
+                                         context_setup=lambda ctx: route_to_mock(ctx, server.base_url),
+                                         block_resources=block_resources)
+                    counter.take()
+                    start = time.perf_counter()
+                    try:
+                        engine.login()
+                    except Exception as e:
+                        failures.append(str(e))
+                        continue
+                    totals.append(time.perf_counter() - start)
+                    count = counter.take()
+                    if count is not None:
+                        calls.append(count)
+                    for phase, seconds in engine.timer.phases:
+                        phases.setdefault(phase, []).append(seconds)
+                    if engine.resource_policy is not None:
+                        stats = engine.resource_policy.stats
+                        blocked.append(stats.blocked + stats.stubbed)
+
+                results.append({
+                    'platform': PLATFORM_NAMES[name],
+                    'runs': runs,
+                    'failures': len(failures),
+                    'errors': sorted(set(failures)),
+                    'total': summarize(totals),
+                    'phases': {phase: summarize(samples) for phase, samples in phases.items()},
+                    'ipc_calls': summarize(calls) if calls else None,
+                    'blocked_requests': summarize(blocked) if blocked else None,
+                })
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def print_results(results: List[dict]):
+    """打印可读的基准结果"""
+    for result in results:
+        ipc = result['ipc_calls']
+        print(f"\n[{result['platform']}] {result['runs']} 次，失败 {result['failures']}，"
+              f"总耗时 p50 {result['total']['p50']:.3f}s / p95 {result['total']['p95']:.3f}s"
+              + (f"，协议调用 p50 {ipc['p50']:.0f} / p95 {ipc['p95']:.0f}" if ipc else ""))
+        for phase, stats in result['phases'].items():
+            print(f"  - {phase}: p50 {stats['p50']:.3f}s / p95 {stats['p95']:.3f}s")
+        for error in result['errors']:
+            print(f"  ! {error}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="在本地模拟服务上测量登录耗时")
+    parser.add_argument('--platform', action='append', default=[],
+                        help="平台: meituan / fliggy / ctrip，可重复（默认全部）")
+    parser.add_argument('--runs', type=int, default=5, help="每个平台的登录次数")
+    parser.add_argument('--latency', type=int, default=0, help="模拟服务每个响应的延迟（毫秒）")
+    parser.add_argument('--login-delay', type=int, default=0, help="模拟服务登录接口的延迟（毫秒）")
+    parser.add_argument('--redirects', type=int, default=0, help="登录成功后的 302 跳转次数")
+    parser.add_argument('--pool', action='store_true', help="使用常驻浏览器池（默认每次登录启动浏览器）")
+    parser.add_argument('--headed', action='store_true', help="显示浏览器窗口")
+    parser.add_argument('--no-block', dest='block_resources', action='store_false',
+                        help="不拦截图片、字体和统计脚本（用于对比）")
+    parser.add_argument('--json', dest='json_out', help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    platforms = args.platform or list(PLATFORM_CODES)
+    try:
+        for platform in platforms:
+            normalize_platform(platform)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    with MockOTAServer(latency_ms=args.latency, login_delay_ms=args.login_delay,
+                       redirects=args.redirects) as server:
+        results = run_benchmark(server, platforms, runs=args.runs,
+                                use_pool=args.pool, headless=not args.headed,
+                                block_resources=args.block_resources)
+
+    print_results(results)
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if any(r['failures'] for r in results):
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
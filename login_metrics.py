@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录耗时统计
+按阶段记录一次登录各步骤的耗时，并可导出为 JSON Lines 和 Prometheus 文本格式
+
+登录引擎记录的阶段:
+  启动驱动 / 启动浏览器 / 等待空闲浏览器 / 创建上下文 / 打开登录页 / 表单就绪 /
+  填写表单 / 提交 / 等待登录跳转 / 后台加载 / 获取凭证（复用会话时为 探测旧会话 / 获取凭证）
+
+每个阶段带 platform（平台编码）和 outcome（success / reused / failed / cancelled）标签。
+登录失败或取消时，出错时所在的阶段同样记录（status 为 failed / cancelled，其余阶段为 ok）。
+
+JSON Lines（每个阶段一行）:
+  {"ts": 1700000000.0, "login_id": "...", "platform": "meituan", "outcome": "success",
+   "phase": "提交", "seconds": 0.213, "status": "ok"}
+
+Prometheus 指标:
+  ota_login_phase_seconds{platform, phase, outcome}   阶段耗时直方图
+  ota_login_duration_seconds{platform, outcome}       登录总耗时直方图
+
+用法:
+  python login_metrics.py metrics/login_spans.jsonl                    # 各平台各阶段 p50 / p95
+  python login_metrics.py metrics/login_spans.jsonl --since 2024-05-01
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 直方图分桶（秒）
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """最近秩百分位数（pct 取 0-100），空序列返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class PhaseTimer:
+    """分阶段计时器：每次 mark 记录距上一次 mark 的耗时
+
+    labels 为附加到每个阶段的标签（如 platform），outcome 由调用方在结束时设置。
+    出错时调用 fail 结束当前阶段，该阶段的 status 为 failed（或传入的状态）。
+    """
+
+    def __init__(self, label: str, start: Optional[float] = None, labels: Optional[Dict[str, str]] = None):
+        self.label = label
+        self.labels = dict(labels or {})
+        self.outcome: Optional[str] = None
+        self.phases: List[Tuple[str, float]] = []
+        self.login_id = uuid.uuid4().hex[:16]
+        self._start = time.perf_counter() if start is None else start
+        self._last = self._start
+        # 与 perf_counter 起点对应的墙钟时间
+        self._wall_start = time.time() - (time.perf_counter() - self._start)
+        self._offsets: List[float] = []
+        # 出错的阶段序号和状态
+        self._failed: Optional[Tuple[int, str]] = None
+
+    def mark(self, name: str) -> float:
+        """结束当前阶段并记录耗时（秒）"""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.phases.append((name, elapsed))
+        self._offsets.append(self._last - self._start)
+        self._last = now
+        return elapsed
+
+    def fail(self, name: str, status: str = 'failed'):
+        """以失败状态结束当前阶段（name 为空或该阶段已结束时记为“未完成阶段”），只记录第一次"""
+        if self._failed is not None:
+            return
+        if not name or any(phase == name for phase, _ in self.phases):
+            name = "未完成阶段"
+        self.mark(name)
+        self._failed = (len(self.phases) - 1, status)
+
+    def status(self, index: int) -> str:
+        """第 index 个阶段的状态（ok / failed / cancelled）"""
+        if self._failed is not None and self._failed[0] == index:
+            return self._failed[1]
+        return 'ok'
+
+    def total(self) -> float:
+        """从开始到现在的总耗时（秒）"""
+        return time.perf_counter() - self._start
+
+    def spans(self) -> List[dict]:
+        """每个阶段一条记录（含开始时间、标签和结果）"""
+        return [
+            dict(self.labels, ts=round(self._wall_start + offset, 3), login_id=self.login_id,
+                 outcome=self.outcome or '', phase=name, seconds=round(sec, 4), status=self.status(i))
+            for i, ((name, sec), offset) in enumerate(zip(self.phases, self._offsets))
+        ]
+
+    def as_dict(self) -> dict:
+        """转换为字典，便于输出或序列化"""
+        return {
+            'label': self.label,
+            'total': round(self.total(), 3),
+            'phases': [{'name': name, 'seconds': round(sec, 3), 'status': self.status(i)}
+                       for i, (name, sec) in enumerate(self.phases)],
+        }
+
+    def report(self) -> str:
+        """生成可读的耗时报告"""
+        outcome = f" ({self.outcome})" if self.outcome else ""
+        lines = [f"[{self.label}] 耗时 {self.total():.2f}s{outcome}"]
+        for i, (name, sec) in enumerate(self.phases):
+            status = self.status(i)
+            lines.append(f"  - {name}: {sec:.2f}s" + (f" ({status})" if status != 'ok' else ""))
+        return '\n'.join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Histogram:
+    """按标签分组的累计直方图"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        # 标签值 -> [各分桶计数..., sum, count]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        data = self.series.setdefault(labels, [0] * len(BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def lines(self) -> List[str]:
+        result = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, data in sorted(self.series.items()):
+            pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            for bound, count in zip(BUCKETS, data):
+                result.append(f'{self.name}_bucket{{{pairs},le="{bound}"}} {count}')
+            result.append(f'{self.name}_bucket{{{pairs},le="+Inf"}} {data[-1]}')
+            result.append(f"{self.name}_sum{{{pairs}}} {data[-2]:.4f}")
+            result.append(f"{self.name}_count{{{pairs}}} {data[-1]}")
+        return result
+
+
+class MetricsRecorder:
+    """汇总登录耗时：追加写入 JSON Lines，维护 Prometheus 直方图（线程安全）
+
+    jsonl_path: 每个阶段追加一行；prom_path: 每次记录后重写 Prometheus 文本文件
+    （可配合 node_exporter 的 textfile collector）；也可用 serve() 提供 /metrics。
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prom_path = Path(prom_path) if prom_path else None
+        self._phases = _Histogram('ota_login_phase_seconds', "登录各阶段耗时",
+                                  ('platform', 'phase', 'outcome'))
+        self._totals = _Histogram('ota_login_duration_seconds', "登录总耗时", ('platform', 'outcome'))
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def record(self, timer: PhaseTimer):
+        """记录一次登录（写文件失败只打印，不影响登录结果）"""
+        spans = timer.spans()
+        platform = timer.labels.get('platform', timer.label)
+        outcome = timer.outcome or ''
+        with self._lock:
+            for span in spans:
+                self._phases.observe((platform, span['phase'], outcome), span['seconds'])
+            self._totals.observe((platform, outcome), timer.total())
+            try:
+                if self.jsonl_path is not None and spans:
+                    self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                        f.write(''.join(json.dumps(span, ensure_ascii=False) + '\n' for span in spans))
+                if self.prom_path is not None:
+                    self._write_prometheus(self.prom_path)
+            except OSError as e:
+                print(f"写入登录耗时失败: {e}")
+
+    def prometheus_text(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            return '\n'.join(self._phases.lines() + self._totals.lines()) + '\n'
+
+    def _write_prometheus(self, path: Path):
+        text = '\n'.join(self._phases.lines() + self._totals.lines()) + '\n'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        tmp_path.replace(path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """在后台线程提供 http://host:port/metrics"""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='login-metrics', daemon=True).start()
+        print(f"登录耗时指标: http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def metrics_recorder(directory, port: Optional[int] = None) -> MetricsRecorder:
+    """在 directory 下写 login_spans.jsonl 和 login.prom，指定 port 时同时提供 /metrics"""
+    directory = Path(directory)
+    recorder = MetricsRecorder(directory / 'login_spans.jsonl', directory / 'login.prom')
+    if port:
+        recorder.serve(port)
+    return recorder
+
+
+def load_spans(path, since: Optional[float] = None) -> List[dict]:
+    """读取 JSON Lines（跳过损坏的行）"""
+    spans = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if since is None or span.get('ts', 0) >= since:
+                spans.append(span)
+    return spans
+
+
+def summarize_spans(spans: List[dict]) -> List[dict]:
+    """按 平台 / 阶段 汇总次数、p50、p95 和占总耗时的比例"""
+    groups: Dict[Tuple[str, str], List[float]] = {}
+    totals: Dict[str, float] = {}
+    for span in spans:
+        key = (span.get('platform', ''), span['phase'])
+        groups.setdefault(key, []).append(span['seconds'])
+        totals[key[0]] = totals.get(key[0], 0.0) + span['seconds']
+    return [
+        {'platform': platform, 'phase': phase, 'count': len(values),
+         'p50': percentile(values, 50), 'p95': percentile(values, 95),
+         'share': sum(values) / totals[platform] if totals[platform] else 0.0}
+        for (platform, phase), values in sorted(groups.items(), key=lambda item: (item[0][0], -sum(item[1])))
+    ]
+
+
+def run_report(path: str, since: Optional[str] = None, outcome: Optional[str] = None) -> int:
+    """打印各平台各阶段耗时，返回退出码（参数无效时抛出 OSError / ValueError）"""
+    from credential_history import parse_time
+
+    spans = load_spans(path, parse_time(since) if since else None)
+    if outcome:
+        spans = [s for s in spans if s.get('outcome') == outcome]
+    if not spans:
+        print("没有耗时记录")
+        return 2
+    current = None
+    for row in summarize_spans(spans):
+        if row['platform'] != current:
+            current = row['platform']
+            print(f"\n{current}")
+        print(f"  {row['phase']:<10}\t{row['count']:>5} 次\tp50 {row['p50']:.2f}s\t"
+              f"p95 {row['p95']:.2f}s\t占 {row['share'] * 100:.0f}%")
+    return 0
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py metrics 子命令共用）"""
+    parser.add_argument('path', help="login_spans.jsonl（batch / schedule 写在 <out>/metrics 下）")
+    parser.add_argument('--since', help="起始时间（Unix 时间戳或 ISO 时间）")
+    parser.add_argument('--outcome', choices=['success', 'reused', 'failed', 'cancelled'], help="只统计该结果的登录")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="汇总登录各阶段耗时")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(run_report(args.path, since=args.since, outcome=args.outcome))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟账号状态接口
+代替后端的 saveOrUpdateStateByAccountId，用于测试凭证推送（credential_sink）和测量吞吐量：
+  POST <任意路径>  请求体 {"states": [...]}，按 (platformCode, account) 保存最新状态
+  GET  /states     返回已保存的全部状态
+
+同一 idempotencyKey 的状态只写入一次（重复推送返回成功但不计数）。
+
+可配置:
+  latency_ms  每个请求的额外延迟
+  fail_next   接下来多少个请求返回 503（模拟后端不可用）
+
+用法:
+  python mock_backend_server.py --port 8766
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+
+class MockBackendServer(ThreadingHTTPServer):
+    """模拟账号状态接口（在后台线程运行）"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: int = 0, fail_next: int = 0):
+        super().__init__((host, port), MockBackendHandler)
+        self.latency_ms = latency_ms
+        self.fail_next = fail_next
+        self.states = {}
+        self.request_count = 0
+        self.duplicate_count = 0
+        self._seen_keys = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/ota/account-states"
+
+    def start(self) -> 'MockBackendServer':
+        """在后台线程启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-backend-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> 'MockBackendServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def save_states(self, states) -> Optional[int]:
+        """保存一批状态，返回新写入数；需要模拟故障时返回 None"""
+        with self._lock:
+            self.request_count += 1
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return None
+            saved = 0
+            for state in states:
+                key = state.get('idempotencyKey')
+                if key in self._seen_keys:
+                    self.duplicate_count += 1
+                    continue
+                self._seen_keys.add(key)
+                self.states[(state['platformCode'], state['account'])] = state
+                saved += 1
+            return saved
+
+
+class MockBackendHandler(BaseHTTPRequestHandler):
+    """处理账号状态推送"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，关闭 Nagle 避免长连接上每个请求都等待延迟 ACK
+    disable_nagle_algorithm = True
+    server: MockBackendServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/states':
+            self._send_json(404, {'message': 'not found'})
+            return
+        with self.server._lock:
+            states = list(self.server.states.values())
+        self._send_json(200, {'states': states})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        try:
+            states = json.loads(raw.decode('utf-8'))['states']
+            if not all(isinstance(s, dict) and s.get('platformCode') and s.get('account') for s in states):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'message': '请求格式错误'})
+            return
+        saved = self.server.save_states(states)
+        if saved is None:
+            self._send_json(503, {'message': '服务暂不可用'})
+            return
+        self._send_json(200, {'saved': saved, 'received': len(states)})
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟账号状态接口")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8766, help="监听端口")
+    parser.add_argument('--latency', type=int, default=0, help="每个请求的额外延迟（毫秒）")
+    args = parser.parse_args()
+
+    server = MockBackendServer(args.host, args.port, latency_ms=args.latency)
+    print(f"模拟账号状态接口: {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟 OTA 登录服务
+还原登录流程依赖的页面结构，用于离线测试和登录耗时基准：
+  美团: iframe.login-iframe 中的 input#login / input#password / button.ep-login_btn
+  飞猪: input[name='username'] + button.login-button，之后 #alibaba-login-box 中输入密码
+  携程: input[name='username-input'] / input[name='password-input'] / button#hotel-login-box-button
+
+浏览器通过 route_to_mock 把三个平台域名的请求转发到本服务（页面 URL 保持不变，
+登录成功判断与线上一致）。站点按 X-Forwarded-Host 请求头区分。
+
+可配置:
+  latency_ms      每个响应的额外延迟
+  login_delay_ms  登录接口的额外延迟
+  redirects       登录成功后跳转到后台前经过的 302 次数
+  error           None 正常登录；'password' 全部返回账号密码错误；'captcha' 停在登录页不跳转
+  密码为 'wrong' 的请求总是返回账号密码错误
+
+用法:
+  python mock_ota_server.py --port 8765 --latency 50 --redirects 2
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, quote
+from typing import Optional
+
+
+# 平台域名 -> 平台中文名
+MOCK_HOSTS = {
+    "me.meituan.com": "美团",
+    "hotel.fliggy.com": "飞猪",
+    "ebooking.ctrip.com": "携程",
+}
+
+# 登录成功后的后台页面
+BACKEND_PATHS = {"美团": "/ebooking/", "飞猪": "/ebooking/index.htm", "携程": "/ebooking/home"}
+
+ERROR_MESSAGE = "账号或密码错误"
+
+# 各页面共用的登录提交脚本：成功时让顶层页面跳转，失败时显示错误提示
+SUBMIT_SCRIPT = """
+function mockSubmit(platform, username, password, errorElem) {
+  fetch('/api/login', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({platform: platform, username: username, password: password})
+  }).then(r => r.json()).then(data => {
+    if (data.ok) {
+      top.location.href = data.next;
+    } else if (data.message) {
+      errorElem.textContent = data.message;
+      errorElem.style.display = 'block';
+    }
+  });
+}
+"""
+
+MEITUAN_LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>美团酒店商家登录</title></head>
+<body>
+  <h1>美团酒店商家</h1>
+  <iframe class="login-iframe" src="/login/frame.html" width="400" height="300"></iframe>
+</body></html>"""
+
+MEITUAN_FRAME = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><script>%s</script></head>
+<body>
+  <input id="login" type="text" placeholder="账号">
+  <input id="password" type="password" placeholder="密码">
+  <label><input id="checkbox" type="checkbox">同意协议</label>
+  <div class="tip-error" style="display:none"></div>
+  <button class="ep-login_btn" onclick="mockSubmit('美团',
+    document.querySelector('#login').value, document.querySelector('#password').value,
+    document.querySelector('.tip-error'))">登录</button>
+</body></html>""" % SUBMIT_SCRIPT
+
+FLIGGY_LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>飞猪商家登录</title></head>
+<body>
+  <input name="username" type="text" placeholder="账号">
+  <button class="login-button" onclick="
+    const box = document.createElement('iframe');
+    box.id = 'alibaba-login-box';
+    box.src = '/login/box.html?username=' + encodeURIComponent(document.querySelector('input[name=username]').value);
+    document.body.appendChild(box);">下一步</button>
+  <div class="error-message" style="display:none"></div>
+</body></html>"""
+
+FLIGGY_BOX = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><script>%s</script></head>
+<body>
+  <input id="fm-login-password" type="password" placeholder="密码">
+  <button class="fm-submit password-login" onclick="mockSubmit('飞猪',
+    new URLSearchParams(location.search).get('username'),
+    document.querySelector('#fm-login-password').value,
+    parent.document.querySelector('.error-message'))">登录</button>
+</body></html>""" % SUBMIT_SCRIPT
+
+CTRIP_LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>携程 eBooking 登录</title><script>%s</script></head>
+<body>
+  <input name="username-input" type="text" placeholder="请输入账号">
+  <input name="password-input" type="password" placeholder="请输入密码">
+  <div class="tip-error" style="display:none"></div>
+  <button id="hotel-login-box-button" type="button" onclick="mockSubmit('携程',
+    document.querySelector('input[name=username-input]').value,
+    document.querySelector('input[name=password-input]').value,
+    document.querySelector('.tip-error'))">登录</button>
+</body></html>""" % SUBMIT_SCRIPT
+
+# 后台页面写入 Cookie 和 localStorage，保证导出的 storage_state 与线上结构一致
+BACKEND_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>后台首页</title>
+<script>
+  const token = Math.random().toString(36).slice(2);
+  document.cookie = 'mock_session=' + token + '; path=/; max-age=86400';
+  localStorage.setItem('mock_token', token);
+</script></head>
+<body><h1>%s 后台</h1></body></html>"""
+
+PAGES = {
+    "美团": {"/login/index.html": MEITUAN_LOGIN_PAGE, "/login/frame.html": MEITUAN_FRAME},
+    "飞猪": {"/ebooking/login.htm": FLIGGY_LOGIN_PAGE, "/login/box.html": FLIGGY_BOX},
+    "携程": {"/login/index": CTRIP_LOGIN_PAGE},
+}
+
+
+class MockOTAServer(ThreadingHTTPServer):
+    """模拟 OTA 登录服务（在后台线程运行）"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: int = 0,
+                 login_delay_ms: int = 0, redirects: int = 0, error: Optional[str] = None,
+                 default_platform: str = "美团"):
+        super().__init__((host, port), MockHandler)
+        self.latency_ms = latency_ms
+        self.login_delay_ms = login_delay_ms
+        self.redirects = redirects
+        self.error = error
+        self.default_platform = default_platform
+        self.request_count = 0
+        self.login_count = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockOTAServer':
+        """在后台线程启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-ota-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> 'MockOTAServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_request(self, login: bool = False):
+        with self._lock:
+            self.request_count += 1
+            if login:
+                self.login_count += 1
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """按站点和路径返回模拟页面"""
+
+    protocol_version = 'HTTP/1.1'
+    server: MockOTAServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _platform(self) -> str:
+        host = self.headers.get('X-Forwarded-Host') or self.headers.get('Host', '')
+        return MOCK_HOSTS.get(host.split(':')[0], self.server.default_platform)
+
+    def _delay(self, ms: int):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def _send(self, status: int, body: str = '', content_type: str = 'text/html; charset=utf-8',
+              location: Optional[str] = None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.count_request()
+        self._delay(self.server.latency_ms)
+        platform = self._platform()
+        parts = urlsplit(self.path)
+        path = parts.path
+
+        if path == '/sso/hop':
+            # 登录后的中转跳转（Location 只带路径，保持在原域名下）
+            query = parse_qs(parts.query)
+            remaining = int(query.get('n', ['0'])[0])
+            target = query.get('to', [BACKEND_PATHS[platform]])[0]
+            if remaining > 1:
+                self._send(302, location=f"/sso/hop?n={remaining - 1}&to={quote(target)}")
+            else:
+                self._send(302, location=target)
+            return
+
+        page = PAGES[platform].get(path)
+        if page is not None:
+            self._send(200, page)
+        elif path == BACKEND_PATHS[platform] or path in ('/', '/ebooking/'):
+            self._send(200, BACKEND_PAGE % platform)
+        else:
+            self._send(404, 'not found', 'text/plain; charset=utf-8')
+
+    def do_POST(self):
+        self.server.count_request(login=True)
+        self._delay(self.server.latency_ms)
+        if urlsplit(self.path).path != '/api/login':
+            self._send(404, 'not found', 'text/plain; charset=utf-8')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = {}
+        self._delay(self.server.login_delay_ms)
+
+        platform = self._platform()
+        if self.server.error == 'captcha':
+            # 模拟需要人工验证：既不跳转也不提示错误
+            result = {'ok': False}
+        elif self.server.error == 'password' or payload.get('password') == 'wrong':
+            result = {'ok': False, 'message': ERROR_MESSAGE}
+        else:
+            target = BACKEND_PATHS[platform]
+            if self.server.redirects > 0:
+                target = f"/sso/hop?n={self.server.redirects}&to={quote(target)}"
+            result = {'ok': True, 'next': target}
+        self._send(200, json.dumps(result, ensure_ascii=False), 'application/json; charset=utf-8')
+
+
+def route_to_mock(context, base_url: str):
+    """把浏览器上下文中三个平台域名的请求转发到模拟服务（context 为 sync_api 的 BrowserContext）
+
+    页面 URL 不变，重定向交给浏览器处理。
+    """
+    def handle(route):
+        request = route.request
+        parts = urlsplit(request.url)
+        target = base_url + (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        headers = dict(request.headers, **{'x-forwarded-host': parts.hostname})
+        response = route.fetch(url=target, headers=headers, max_redirects=0)
+        route.fulfill(response=response)
+
+    for host in MOCK_HOSTS:
+        context.route(f"https://{host}/**", handle)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟 OTA 登录服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=int, default=0, help="每个响应的额外延迟（毫秒）")
+    parser.add_argument('--login-delay', type=int, default=0, help="登录接口的额外延迟（毫秒）")
+    parser.add_argument('--redirects', type=int, default=0, help="登录成功后的 302 跳转次数")
+    parser.add_argument('--error', choices=['password', 'captcha'], help="模拟登录失败")
+    args = parser.parse_args()
+
+    server = MockOTAServer(args.host, args.port, latency_ms=args.latency,
+                           login_delay_ms=args.login_delay, redirects=args.redirects,
+                           error=args.error)
+    print(f"模拟服务已启动: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 凭证命令行工具（无需图形界面）
+
+用法:
+  python ota_cred.py fetch --platform meituan --username 账号 --out state.json
+  python ota_cred.py batch accounts.csv --out credentials
+  python ota_cred.py scan credentials --report scan.csv
+  python ota_cred.py history meituan store001 --dir credentials/history --changes
+  python ota_cred.py db --db credentials/credentials.db --expiring 24 --platform fliggy
+  python ota_cred.py schedule accounts.csv --out credentials --lead 6 --jitter 2
+  python ota_cred.py metrics credentials/metrics/login_spans.jsonl --since 2024-05-01
+  python ota_cred.py push --endpoint http://backend/api/ota/account-states --outbox credentials/outbox
+
+密码可通过 --password、环境变量 OTA_PASSWORD 或交互输入提供。
+"""
+
+import os
+import sys
+import argparse
+import getpass
+
+import batch_refresh
+import credential_history
+import credential_sink
+import credential_store
+import login_metrics
+import refresh_scheduler
+import session_scanner
+from credential_format import CREDENTIAL_FORMATS
+
+
+def cmd_fetch(args) -> int:
+    """获取单个账号的凭证"""
+    from ota_engine import fetch_credential, LOGIN_DEADLINE
+
+    password = args.password or os.environ.get('OTA_PASSWORD') or getpass.getpass("密码: ")
+    previous = None
+    if args.reuse and os.path.exists(args.reuse):
+        with open(args.reuse, encoding='utf-8') as f:
+            previous = f.read()
+    try:
+        credential = fetch_credential(args.platform, args.username, password, headless=args.headless,
+                                      previous_credential=previous,
+                                      credential_format=args.credential_format, prune=args.prune,
+                                      deadline=args.deadline or LOGIN_DEADLINE)
+    except Exception as e:
+        print(f"❌ 获取凭证失败: {e}", file=sys.stderr)
+        return 1
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(credential)
+        print(f"✅ 凭证已保存: {args.out}", file=sys.stderr)
+    else:
+        print(credential)
+    return 0
+
+
+def cmd_batch(args) -> int:
+    """批量刷新清单中的账号"""
+    try:
+        accounts = batch_refresh.load_manifest(args.manifest)
+        limits = batch_refresh.parse_limits(args.limit)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    sink = credential_sink.push_sink_from_env(os.path.join(args.out, 'outbox'), args.push)
+    metrics = login_metrics.metrics_recorder(os.path.join(args.out, 'metrics'), args.metrics_port)
+    refresher = batch_refresh.BatchRefresher(args.out, workers=args.workers, platform_limits=limits,
+                                             headless=args.headless, use_async=args.use_async,
+                                             reuse=args.reuse, credential_format=args.credential_format,
+                                             history=args.history, store=args.store, sink=sink, metrics=metrics,
+                                             deadline=args.deadline, trace=args.trace)
+    try:
+        results = refresher.run(accounts)
+    finally:
+        refresher.close()
+    return 0 if all(r['status'] == 'success' for r in results) else 2
+
+
+def cmd_scan(args) -> int:
+    """检查已保存凭证是否仍然有效"""
+    try:
+        return session_scanner.run_scan(args.inputs, workers=args.workers, urls=args.url,
+                                        report=args.report, as_json=args.as_json, db=args.db)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_history(args) -> int:
+    """查询凭证历史"""
+    try:
+        return credential_history.run_query(args.platform, args.account, root=args.dir, at=args.at,
+                                            changes=args.changes, since=args.since)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_db(args) -> int:
+    """查询本地凭证库"""
+    try:
+        return credential_store.run_query(args.db, platform=args.platform, expiring_hours=args.expiring,
+                                          store_id=args.store_id)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_schedule(args) -> int:
+    """按凭证过期时间定时刷新"""
+    try:
+        return refresh_scheduler.run_scheduler(args.manifest, args.out, workers=args.workers, limits=args.limit,
+                                               lead_hours=args.lead, jitter_hours=args.jitter,
+                                               spacing=args.spacing, once=args.once, dry_run=args.dry_run,
+                                               headless=not args.headed, push=args.push,
+                                               metrics_port=args.metrics_port, deadline=args.deadline)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_metrics(args) -> int:
+    """汇总登录各阶段耗时"""
+    try:
+        return login_metrics.run_report(args.path, since=args.since, outcome=args.outcome)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_push(args) -> int:
+    """推送发件箱中积压的凭证"""
+    try:
+        return credential_sink.run_push(args.endpoint, args.outbox, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog='ota-cred', description="OTA 凭证获取工具（命令行版）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fetch = sub.add_parser('fetch', help="登录并获取单个账号的凭证")
+    fetch.add_argument('--platform', required=True, help="平台: meituan / fliggy / ctrip")
+    fetch.add_argument('--username', required=True, help="账号")
+    fetch.add_argument('--password', help="密码（默认读取环境变量 OTA_PASSWORD 或交互输入）")
+    fetch.add_argument('--out', help="凭证输出文件（默认输出到标准输出）")
+    fetch.add_argument('--headless', action='store_true', help="无头模式运行浏览器")
+    fetch.add_argument('--reuse', metavar='STATE_JSON',
+                       help="先用该文件中的旧凭证探测会话，仍有效则不重新登录")
+    fetch.add_argument('--format', dest='credential_format', choices=CREDENTIAL_FORMATS, default='compact',
+                       help="凭证输出格式（默认 compact）")
+    fetch.add_argument('--no-prune', dest='prune', action='store_false',
+                       help="保留全部 Cookie 和 localStorage，不按平台裁剪")
+    fetch.add_argument('--deadline', type=float, help="登录期限（秒，默认 180，包括处理验证码的时间）")
+    fetch.set_defaults(func=cmd_fetch)
+
+    # 以下子命令的参数由各模块的 add_arguments 定义，与单独运行该模块时一致
+    batch = sub.add_parser('batch', help="按清单批量刷新凭证")
+    batch_refresh.add_arguments(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    scan = sub.add_parser('scan', help="检查已保存凭证是否仍然有效（不启动浏览器）")
+    session_scanner.add_arguments(scan)
+    scan.set_defaults(func=cmd_scan)
+
+    history = sub.add_parser('history', help="查询凭证历史")
+    credential_history.add_arguments(history)
+    history.set_defaults(func=cmd_history)
+
+    db = sub.add_parser('db', help="查询本地凭证库（过期时间、门店最新凭证）")
+    credential_store.add_arguments(db)
+    db.set_defaults(func=cmd_db)
+
+    schedule = sub.add_parser('schedule', help="按凭证过期时间提前刷新，分散登录")
+    refresh_scheduler.add_arguments(schedule)
+    schedule.set_defaults(func=cmd_schedule)
+
+    metrics = sub.add_parser('metrics', help="汇总登录各阶段耗时（p50 / p95）")
+    login_metrics.add_arguments(metrics)
+    metrics.set_defaults(func=cmd_metrics)
+
+    push = sub.add_parser('push', help="把发件箱中积压的凭证推送到账号状态接口")
+    credential_sink.add_arguments(push)
+    push.set_defaults(func=cmd_push)
+
+    return parser
+
+
+def main():
+    """主函数"""
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
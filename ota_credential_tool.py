@@ -5,6 +5,9 @@ OTA凭证获取工具
 支持美团、飞猪、携程平台的登录凭证获取
 """
 
+import time
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点（尽量早，用于 --startup-profile）
+
 import sys
 import json
 import subprocess
@@ -17,28 +20,59 @@ import platform
 if getattr(sys, 'frozen', False):
     # 如果是打包后的程序
     bundle_dir = Path(sys._MEIPASS)
-    browser_dir = bundle_dir / 'playwright' / 'driver' / 'package' / '.local-browsers'
+    # onedir 版本：浏览器压缩包只在首次启动时解压到用户缓存目录
+    from browser_cache import prepare_browsers
+    browser_dir = prepare_browsers(bundle_dir)
+    if browser_dir is None:
+        # onefile 版本：浏览器随程序一起解压到临时目录
+        browser_dir = bundle_dir / 'playwright' / 'driver' / 'package' / '.local-browsers'
     if browser_dir.exists():
         os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(browser_dir)
         print(f"使用打包的浏览器: {browser_dir}")
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QComboBox, QTextEdit, QMessageBox,
-    QProgressDialog
+    QLabel, QLineEdit, QPushButton, QComboBox, QMessageBox,
+    QProgressDialog, QTabWidget
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, Error
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
+from app_paths import app_data_dir
+from browser_pool import BrowserPool
+from credential_view import CredentialView
+from flight_recorder import FlightRecorder
+from login_metrics import MetricsRecorder, PhaseTimer
+from queue_panel import AccountQueuePanel
 
 
 class LoginWorker(QThread):
-    """登录工作线程"""
+    """登录工作线程（登录逻辑见 ota_engine.LoginEngine）
+    
+    传入凭证库时先用库中该账号的旧凭证尝试复用会话，获取成功后写回凭证库。
+    传入 history 时获取成功后记录到凭证历史（见 credential_history）。
+    传入 sink 时获取成功后交给 sink 推送到后端（见 credential_sink）。
+    传入 metrics 时记录分阶段耗时（见 login_metrics）。
+    传入 recorder 时登录失败会保存现场，错误信息中附带保存位置（见 flight_recorder）。
+    登录页显示错误提示（如密码错误）时 rejected 为 True；cancel() 取消后 cancelled 为 True。
+    """
     finished = pyqtSignal(bool, str)  # 成功/失败, 凭证/错误信息
     
-    def __init__(self, platform: str, username: str, password: str):
+    def __init__(self, platform: str, username: str, password: str,
+                 pool: Optional[BrowserPool] = None, store=None, sink=None, metrics=None,
+                 recorder=None, store_id: str = '', history=None):
         super().__init__()
         self.platform = platform
         self.username = username
         self.password = password
+        self.store_id = store_id
+        self.pool = pool
+        self.store = store
+        self.history = history
+        self.sink = sink
+        self.metrics = metrics
+        self.recorder = recorder
+        self.engine = None
+        self.rejected = False
+        self.cancelled = False
+        self._cancel_requested = False
     
     def run(self):
         """执行登录"""
@@ -46,475 +80,72 @@ class LoginWorker(QThread):
             credential = self.login()
             self.finished.emit(True, credential)
         except Exception as e:
-            self.finished.emit(False, str(e))
+            message = str(e)
+            # 引擎已创建时 ota_engine 已经导入（登录前的错误不会是这两种）
+            if self.engine is not None:
+                from ota_engine import LoginRejectedError, LoginCancelledError
+                self.rejected = isinstance(e, LoginRejectedError)
+                self.cancelled = isinstance(e, LoginCancelledError)
+                if self.engine.failure_dir is not None:
+                    message += f"\n\n失败现场: {self.engine.failure_dir}"
+            self.finished.emit(False, message)
+    
+    def cancel(self):
+        """取消登录（在界面线程调用，登录线程在 LoginEngine.cancel 的检查点内结束）"""
+        self._cancel_requested = True
+        if self.engine is not None:
+            self.engine.cancel()
     
     def login(self) -> str:
         """执行登录并获取凭证"""
-        with sync_playwright() as p:
-            # 尝试使用系统 Chrome，失败则使用 Chromium
+        # Playwright 导入较慢，延迟到第一次登录时再导入，让窗口先显示
+        from ota_engine import LoginEngine, PLATFORM_NAMES
+        code = PLATFORM_NAMES[self.platform]
+        previous = self.store.get(code, self.username) if self.store is not None else None
+        self.engine = LoginEngine(self.platform, self.username, self.password, pool=self.pool,
+                                  previous_credential=previous['storage_state'] if previous else None,
+                                  metrics=self.metrics, recorder=self.recorder)
+        if self._cancel_requested:
+            self.engine.cancel()
+        credential = self.engine.login()
+        if self.store is not None:
             try:
-                browser = p.chromium.launch(
-                    headless=False,
-                    channel='chrome',  # 使用系统安装的 Chrome
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-dev-shm-usage',
-                        '--no-sandbox',
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-site-isolation-trials',
-                        '--start-maximized'  # 启动时最大化窗口
-                    ]
-                )
-            except Exception:
-                # 如果没有 Chrome，使用 Chromium
-                browser = p.chromium.launch(
-                    headless=False,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-dev-shm-usage',
-                        '--no-sandbox',
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-site-isolation-trials',
-                        '--start-maximized'  # 启动时最大化窗口
-                    ]
-                )
-            
-            # 创建上下文，模拟真实浏览器
-            # 不设置固定的 viewport，让浏览器使用实际窗口大小
-            context = browser.new_context(
-                no_viewport=True,  # 不限制 viewport，使用实际窗口大小
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                locale='zh-CN',
-                timezone_id='Asia/Shanghai',
-                permissions=['geolocation'],
-                has_touch=False,
-                is_mobile=False
-            )
-            
-            page = context.new_page()
-            
-            # 增强的反检测脚本
-            page.add_init_script("""
-                // 移除 webdriver 标识
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                
-                // 添加 chrome 对象
-                window.navigator.chrome = {
-                    runtime: {},
-                    loadTimes: function() {},
-                    csi: function() {},
-                    app: {}
-                };
-                
-                // 修改 plugins
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [
-                        {
-                            0: {type: "application/x-google-chrome-pdf", suffixes: "pdf", description: "Portable Document Format"},
-                            description: "Portable Document Format",
-                            filename: "internal-pdf-viewer",
-                            length: 1,
-                            name: "Chrome PDF Plugin"
-                        },
-                        {
-                            0: {type: "application/pdf", suffixes: "pdf", description: ""},
-                            description: "",
-                            filename: "mhjfbmdgcfjbbpaeojofohoefgiehjai",
-                            length: 1,
-                            name: "Chrome PDF Viewer"
-                        },
-                        {
-                            0: {type: "application/x-nacl", suffixes: "", description: "Native Client Executable"},
-                            1: {type: "application/x-pnacl", suffixes: "", description: "Portable Native Client Executable"},
-                            description: "",
-                            filename: "internal-nacl-plugin",
-                            length: 2,
-                            name: "Native Client"
-                        }
-                    ]
-                });
-                
-                // 修改 languages
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['zh-CN', 'zh', 'en-US', 'en']
-                });
-                
-                // 修改 permissions
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-                
-                // 伪装 canvas 指纹
-                const getParameter = WebGLRenderingContext.prototype.getParameter;
-                WebGLRenderingContext.prototype.getParameter = function(parameter) {
-                    if (parameter === 37445) {
-                        return 'Intel Inc.';
-                    }
-                    if (parameter === 37446) {
-                        return 'Intel Iris OpenGL Engine';
-                    }
-                    return getParameter.call(this, parameter);
-                };
-                
-                // 添加 connection 属性
-                Object.defineProperty(navigator, 'connection', {
-                    get: () => ({
-                        effectiveType: '4g',
-                        rtt: 50,
-                        downlink: 10,
-                        saveData: false
-                    })
-                });
-            """)
-            
+                self.store.put(code, self.username, credential, store_id=self.store_id,
+                               reused=self.engine.reused)
+                if self.engine.reused:
+                    self.store.mark_verified(code, self.username)
+            except Exception as e:
+                print(f"保存凭证到凭证库失败: {e}")
+        if self.history is not None:
             try:
-                if self.platform == "美团":
-                    self._login_meituan(page)
-                elif self.platform == "飞猪":
-                    self._login_fliggy(page)
-                elif self.platform == "携程":
-                    self._login_ctrip(page)
-                else:
-                    raise ValueError(f"不支持的平台: {self.platform}")
-                
-                # 最终验证登录状态
-                page.wait_for_timeout(2000)
-                current_url = page.url
-                print(f"最终验证 - 平台: {self.platform}, URL: {current_url}")
-                
-                # 根据平台验证登录状态
-                if self.platform == "美团" and "ebooking" not in current_url:
-                    raise Exception("美团登录验证失败: 未在后台页面")
-                elif self.platform == "飞猪" and "login.htm" in current_url:
-                    raise Exception("飞猪登录验证失败: 仍在登录页面")
-                elif self.platform == "携程" and "login" in current_url:
-                    raise Exception("携程登录验证失败: 未在后台页面")
-                
-                # 获取凭证
-                credential = self._get_credential(context)
-                return credential
-                
-            finally:
-                page.close()
-                context.close()
-                browser.close()
-    
-    def _login_meituan(self, page: Page):
-        """美团登录"""
-        # 访问登录页面
-        page.goto("https://me.meituan.com/login/index.html")
-        page.wait_for_load_state("networkidle")
-        
-        # 等待登录 iframe
-        page.wait_for_selector("iframe.login-iframe", timeout=15000)
-        frame = page.query_selector("iframe.login-iframe").content_frame()
-        
-        # 填写账号密码
-        frame.fill("input#login", self.username)
-        frame.fill("input#password", self.password)
-        
-        # 勾选协议
-        frame.evaluate("""() => {
-            const checkbox = document.querySelector('input#checkbox');
-            if (checkbox && !checkbox.checked) {
-                checkbox.click();
-            }
-        }""")
-        
-        # 点击登录
-        frame.click("button.ep-login_btn")
-        
-        # 等待登录成功
-        try:
-            page.wait_for_url("**/ebooking/**", timeout=120000)
-        except Exception as e:
-            # 检查是否有错误提示
-            error_msg = self._check_login_error(page, frame)
-            if error_msg:
-                raise Exception(f"美团登录失败: {error_msg}")
-            raise Exception(f"美团登录超时或失败: {str(e)}")
-        
-        # 验证是否真的登录成功
-        if "ebooking" not in page.url:
-            raise Exception("美团登录失败: 未能跳转到后台页面")
-
-    def _login_fliggy(self, page: Page):
-        """飞猪登录"""
-        # 访问登录页面
-        page.goto("https://hotel.fliggy.com/ebooking/login.htm#/")
-        page.wait_for_load_state("networkidle")
-        
-        # 检查是否已登录
-        if "hotel.fliggy.com/ebooking/login.htm" not in page.url:
-            return
-        
-        # 输入账号
-        page.wait_for_selector("input[name='username']", timeout=15000)
-        page.fill("input[name='username']", self.username)
-        page.wait_for_timeout(500)
-        
-        # 点击下一步
-        page.click("button.login-button")
-        page.wait_for_timeout(2000)
-        
-        # 等待 iframe 并输入密码
-        page.wait_for_selector("#alibaba-login-box", timeout=15000)
-        login_frame = page.frame_locator("#alibaba-login-box")
-        
-        login_frame.locator("#fm-login-password").wait_for(timeout=10000)
-        login_frame.locator("#fm-login-password").fill(self.password)
-        page.wait_for_timeout(500)
-        
-        # 点击登录
-        login_frame.locator("button.fm-submit.password-login").click()
-        
-        # 等待登录成功或需要用户干预（最多120秒）
-        max_wait = 120
-        for i in range(max_wait):
-            try:
-                page.wait_for_timeout(1000)
-                current_url = page.url
-                
-                # 打印当前 URL 用于调试（每10秒打印一次）
-                if i % 10 == 0:
-                    print(f"等待登录中... 当前URL: {current_url}")
-                
-                # 检查是否登录成功（跳转到后台页面且不在登录页）
-                # 只要包含 hotel.fliggy.com 且不包含 login.htm 就认为成功
-                if "hotel.fliggy.com" in current_url and "login.htm" not in current_url:
-                    print(f"登录成功！最终URL: {current_url}")
-                    return
-                
-                # 检查是否有错误提示
-                try:
-                    error_elem = page.query_selector(".error-message, .login-error, [class*='error']")
-                    if error_elem and error_elem.is_visible():
-                        error_text = error_elem.text_content()
-                        if error_text and error_text.strip():
-                            raise Exception(f"飞猪登录失败: {error_text}")
-                except:
-                    pass
-            except Error as e:
-                # 检测到浏览器或页面已关闭
-                if "closed" in str(e).lower() or "target" in str(e).lower():
-                    raise Exception("飞猪登录已取消: 浏览器已关闭")
-                raise
-        
-        # 超时后再次检查登录状态
-        try:
-            current_url = page.url
-            print(f"等待超时，最终URL: {current_url}")
-            if "login.htm" in current_url:
-                raise Exception("飞猪登录超时: 请检查账号密码或手动完成验证")
-        except Error:
-            raise Exception("飞猪登录已取消: 浏览器已关闭")
-    
-    def _login_ctrip(self, page: Page):
-        """携程登录"""
-        # 访问登录页面
-        page.goto("https://ebooking.ctrip.com/login/index", wait_until="domcontentloaded")
-        page.wait_for_timeout(3000)  # 给页面更多加载时间
-        
-        print(f"携程登录 - 当前URL: {page.url}")
-        
-        # 检查是否已登录
-        if "login" not in page.url:
-            print("携程已登录，跳过登录流程")
-            return
-        
-        # 尝试多个可能的选择器
-        username_selectors = [
-            "input[name='username-input']",
-            "input[placeholder*='账号']",
-            "input[placeholder*='用户名']",
-            "input[type='text']",
-            "#username",
-            ".username-input"
-        ]
-        
-        password_selectors = [
-            "input[name='password-input']",
-            "input[placeholder*='密码']",
-            "input[type='password']",
-            "#password",
-            ".password-input"
-        ]
-        
-        login_button_selectors = [
-            "button#hotel-login-box-button",
-            "button[type='submit']",
-            ".login-button",
-            "button:has-text('登录')",
-            "button:has-text('登 录')"
-        ]
-        
-        # 查找并填写账号
-        username_selector = None
-        for selector in username_selectors:
+                self.history.record(code, self.username, credential)
+            except (OSError, ValueError) as e:
+                print(f"记录凭证历史失败: {e}")
+        if self.sink is not None:
             try:
-                elem = page.wait_for_selector(selector, timeout=3000)
-                if elem:
-                    username_selector = selector
-                    print(f"找到账号输入框: {selector}")
-                    break
-            except:
-                continue
-        
-        if not username_selector:
-            # 打印页面内容用于调试
-            print("页面HTML:")
-            print(page.content()[:2000])
-            raise Exception("携程登录失败: 未找到账号输入框")
-        
-        # 查找并填写密码
-        password_selector = None
-        for selector in password_selectors:
-            try:
-                elem = page.wait_for_selector(selector, timeout=3000)
-                if elem:
-                    password_selector = selector
-                    print(f"找到密码输入框: {selector}")
-                    break
-            except:
-                continue
-        
-        if not password_selector:
-            raise Exception("携程登录失败: 未找到密码输入框")
-        
-        # 填写账号密码（模拟人工输入）
-        page.fill(username_selector, "")
-        page.wait_for_timeout(200)
-        for char in self.username:
-            page.type(username_selector, char, delay=100)
-        page.wait_for_timeout(500)
-        
-        page.fill(password_selector, "")
-        page.wait_for_timeout(200)
-        for char in self.password:
-            page.type(password_selector, char, delay=100)
-        page.wait_for_timeout(500)
-        
-        # 查找并点击登录按钮
-        login_button_selector = None
-        for selector in login_button_selectors:
-            try:
-                elem = page.wait_for_selector(selector, timeout=3000)
-                if elem and elem.is_visible():
-                    login_button_selector = selector
-                    print(f"找到登录按钮: {selector}")
-                    break
-            except:
-                continue
-        
-        if not login_button_selector:
-            raise Exception("携程登录失败: 未找到登录按钮")
-        
-        # 点击登录
-        page.click(login_button_selector)
-        page.wait_for_timeout(3000)
-        
-        # 等待登录结果（最多120秒，给用户时间处理验证码）
-        max_wait = 120
-        for i in range(max_wait):
-            try:
-                page.wait_for_timeout(1000)
-                current_url = page.url
-                
-                # 打印当前 URL 用于调试（每10秒打印一次）
-                if i % 10 == 0:
-                    print(f"等待携程登录中... 当前URL: {current_url}")
-                
-                # 检查是否登录成功
-                if "login" not in current_url and "ebooking.ctrip.com" in current_url:
-                    print(f"携程登录成功！最终URL: {current_url}")
-                    return
-                
-                # 检查是否有错误提示
-                try:
-                    error_elem = page.query_selector(".error-message, .login-error, [class*='error'], .tip-error")
-                    if error_elem and error_elem.is_visible():
-                        error_text = error_elem.text_content()
-                        if error_text and error_text.strip():
-                            raise Exception(f"携程登录失败: {error_text}")
-                except:
-                    pass
-            except Error as e:
-                # 检测到浏览器或页面已关闭
-                if "closed" in str(e).lower() or "target" in str(e).lower():
-                    raise Exception("携程登录已取消: 浏览器已关闭")
-                raise
-        
-        # 超时后再次检查
-        try:
-            current_url = page.url
-            print(f"等待超时，最终URL: {current_url}")
-            if "login" in current_url:
-                raise Exception("携程登录超时: 请检查账号密码或手动完成验证")
-        except Error:
-            raise Exception("携程登录已取消: 浏览器已关闭")
-    
-    def _check_login_error(self, page: Page, frame=None) -> str:
-        """检查登录错误信息"""
-        try:
-            # 在iframe中查找错误
-            if frame:
-                error_selectors = [
-                    ".error-message",
-                    ".login-error",
-                    "[class*='error']",
-                    ".tip-error"
-                ]
-                for selector in error_selectors:
-                    error_elem = frame.query_selector(selector)
-                    if error_elem and error_elem.is_visible():
-                        error_text = error_elem.text_content()
-                        if error_text and error_text.strip():
-                            return error_text.strip()
-            
-            # 在主页面查找错误
-            error_selectors = [
-                ".error-message",
-                ".login-error",
-                "[class*='error']"
-            ]
-            for selector in error_selectors:
-                error_elem = page.query_selector(selector)
-                if error_elem and error_elem.is_visible():
-                    error_text = error_elem.text_content()
-                    if error_text and error_text.strip():
-                        return error_text.strip()
-        except:
-            pass
-        return ""
-    
-    def _get_credential(self, context: BrowserContext) -> str:
-        """获取浏览器上下文凭证"""
-        # 获取存储状态
-        storage_state = context.storage_state()
-        
-        # 检查是否有有效的cookies
-        if not storage_state.get('cookies') or len(storage_state['cookies']) == 0:
-            raise Exception("获取凭证失败: 未找到有效的Cookie信息")
-        
-        # 转换为JSON字符串
-        credential_json = json.dumps(storage_state, ensure_ascii=False, indent=2)
-        
-        return credential_json
+                self.sink.put(code, self.username, self.store_id, credential)
+            except OSError as e:
+                print(f"写入推送发件箱失败: {e}")
+        return credential
 
 
 class OTACredentialTool(QMainWindow):
     """OTA凭证获取工具主窗口"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional[BrowserPool] = None):
         super().__init__()
         self.worker: Optional[LoginWorker] = None
+        self.logging_in = False
+        self.pool = pool
+        # 本地凭证库、凭证历史和推送（设置了 OTA_PUSH_ENDPOINT 时），第一次登录时再打开
+        self.store = None
+        self.history = None
+        self.sink = None
+        # 每次登录的分阶段耗时写到用户数据目录下的 metrics
+        self.metrics = MetricsRecorder(app_data_dir() / 'metrics' / 'login_spans.jsonl',
+                                       app_data_dir() / 'metrics' / 'login.prom')
+        # 登录失败时保存现场（用户数据目录下的 failures，最多 200MB）
+        self.recorder = FlightRecorder()
         self.init_ui()
     
     def init_ui(self):
@@ -627,6 +258,18 @@ class OTACredentialTool(QMainWindow):
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(title)
         
+        # 单个账号 / 批量队列两个标签页
+        self.tabs = QTabWidget()
+        single_tab = QWidget()
+        single_layout = QVBoxLayout(single_tab)
+        single_layout.setSpacing(15)
+        self.tabs.addTab(single_tab, "单个账号")
+        self.queue_panel = AccountQueuePanel(self.create_queue_worker)
+        self.queue_panel.add_btn.clicked.connect(self.add_to_queue)
+        self.queue_panel.credential_selected.connect(self.show_queue_credential)
+        self.tabs.addTab(self.queue_panel, "批量队列")
+        layout.addWidget(self.tabs)
+        
         # 表单区域
         form_widget = QWidget()
         form_widget.setObjectName("formWidget")
@@ -677,7 +320,7 @@ class OTACredentialTool(QMainWindow):
         password_layout.addWidget(self.password_input)
         form_layout.addLayout(password_layout)
         
-        layout.addWidget(form_widget)
+        single_layout.addWidget(form_widget)
         
         # 获取凭证按钮
         self.get_credential_btn = QPushButton("🔑 获取凭证")
@@ -710,28 +353,16 @@ class OTACredentialTool(QMainWindow):
         self.get_credential_btn.clicked.connect(self.get_credential)
         # 添加额外的事件处理,确保在 Windows 上能响应
         self.get_credential_btn.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        layout.addWidget(self.get_credential_btn)
+        single_layout.addWidget(self.get_credential_btn)
         
         # 凭证显示区域
         credential_label = QLabel("📋 凭证内容:")
         credential_label.setStyleSheet("font-weight: bold; font-size: 14px; margin-top: 10px;")
-        layout.addWidget(credential_label)
+        single_layout.addWidget(credential_label)
         
-        self.credential_text = QTextEdit()
-        self.credential_text.setReadOnly(True)
-        self.credential_text.setPlaceholderText("凭证将在这里显示...")
-        self.credential_text.setStyleSheet("""
-            QTextEdit {
-                background-color: #f6f8fa;
-                border: 2px solid #e1e4e8;
-                border-radius: 6px;
-                padding: 12px;
-                font-family: "Consolas", "Monaco", "Courier New", monospace;
-                font-size: 12px;
-                line-height: 1.5;
-            }
-        """)
-        layout.addWidget(self.credential_text)
+        # 摘要 + 可折叠的树，解析在后台线程进行（见 credential_view）
+        self.credential_view = CredentialView()
+        single_layout.addWidget(self.credential_view)
         
         # 复制按钮
         self.copy_btn = QPushButton("📄 复制凭证")
@@ -764,7 +395,7 @@ class OTACredentialTool(QMainWindow):
         self.copy_btn.clicked.connect(self.copy_credential)
         # 添加额外的事件处理,确保在 Windows 上能响应
         self.copy_btn.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        layout.addWidget(self.copy_btn)
+        single_layout.addWidget(self.copy_btn)
         
         # 版本信息
         version_label = QLabel("v1.0.0 - 内嵌浏览器版本")
@@ -774,6 +405,7 @@ class OTACredentialTool(QMainWindow):
     
     def detect_browser_path(self):
         """检测并显示浏览器路径"""
+        from playwright.sync_api import sync_playwright
         try:
             with sync_playwright() as p:
                 try:
@@ -857,7 +489,13 @@ class OTACredentialTool(QMainWindow):
             QMessageBox.critical(self, "错误", f"安装失败: {str(e)}")
     
     def get_credential(self):
-        """获取凭证"""
+        """获取凭证（登录进行中时取消登录）"""
+        if self.logging_in:
+            self.worker.cancel()
+            self.get_credential_btn.setEnabled(False)
+            self.get_credential_btn.setText("正在取消...")
+            return
+        
         # 验证输入
         platform = self.platform_combo.currentText()
         username = self.username_input.text().strip()
@@ -871,17 +509,60 @@ class OTACredentialTool(QMainWindow):
             QMessageBox.warning(self, "警告", "请输入密码")
             return
         
-        # 禁用按钮
-        self.get_credential_btn.setEnabled(False)
-        self.get_credential_btn.setText("登录中...")
-        self.credential_text.clear()
+        # 登录期间按钮用于取消
+        self.get_credential_btn.setText("⏹ 取消登录")
+        self.credential_view.clear()
         self.copy_btn.setEnabled(False)
         
         # 创建工作线程
-        self.worker = LoginWorker(platform, username, password)
+        self.open_outputs()
+        self.worker = LoginWorker(platform, username, password, pool=self.pool, store=self.store,
+                                  sink=self.sink, metrics=self.metrics, recorder=self.recorder,
+                                  history=self.history)
         self.worker.finished.connect(self.on_login_finished)
+        self.logging_in = True
         self.worker.start()
     
+    def open_outputs(self):
+        """第一次登录时打开凭证库、凭证历史和推送"""
+        if self.store is None:
+            try:
+                from credential_store import CredentialStore
+                self.store = CredentialStore()
+            except Exception as e:
+                print(f"打开凭证库失败: {e}")
+        if self.history is None:
+            from credential_history import CredentialHistory
+            self.history = CredentialHistory()
+        if self.sink is None:
+            from credential_sink import push_sink_from_env
+            self.sink = push_sink_from_env(app_data_dir() / 'outbox')
+    
+    def create_queue_worker(self, platform: str, username: str, password: str, store_id: str,
+                            pool: BrowserPool) -> LoginWorker:
+        """批量队列中每个账号的工作线程（与单个账号共用凭证库、凭证历史、推送和记录）"""
+        self.open_outputs()
+        return LoginWorker(platform, username, password, pool=pool, store=self.store, sink=self.sink,
+                           metrics=self.metrics, recorder=self.recorder, store_id=store_id,
+                           history=self.history)
+    
+    def add_to_queue(self):
+        """把表单中的账号加入批量队列"""
+        username = self.username_input.text().strip()
+        password = self.password_input.text().strip()
+        if not username or not password:
+            QMessageBox.warning(self, "警告", "请先在“单个账号”页输入账号和密码")
+            return
+        self.queue_panel.add_account(self.platform_combo.currentText(), username, password)
+        self.username_input.clear()
+        self.password_input.clear()
+    
+    def show_queue_credential(self, credential: str):
+        """在单个账号页显示队列中某一行的凭证"""
+        self.credential_view.set_credential(credential)
+        self.copy_btn.setEnabled(True)
+        self.tabs.setCurrentIndex(0)
+    
     def on_browser_missing(self):
         """浏览器缺失处理"""
         self.get_credential_btn.setEnabled(True)
@@ -890,27 +571,67 @@ class OTACredentialTool(QMainWindow):
     
     def on_login_finished(self, success: bool, result: str):
         """登录完成回调"""
+        self.logging_in = False
         self.get_credential_btn.setEnabled(True)
         self.get_credential_btn.setText("获取凭证")
         
         if success:
-            self.credential_text.setPlainText(result)
+            self.credential_view.set_credential(result)
             self.copy_btn.setEnabled(True)
             QMessageBox.information(self, "成功", "凭证获取成功！")
+        elif self.worker is not None and self.worker.cancelled:
+            self.credential_view.clear()
         else:
             QMessageBox.critical(self, "错误", f"登录失败：{result}")
     
     def copy_credential(self):
         """复制凭证到剪贴板"""
-        credential = self.credential_text.toPlainText()
+        credential = self.credential_view.credential()
         if credential:
             clipboard = QApplication.clipboard()
             clipboard.setText(credential)
             QMessageBox.information(self, "成功", "凭证已复制到剪贴板")
 
 
+# 启动耗时预算（毫秒）：从进程启动到窗口首次显示
+STARTUP_BUDGET_MS = 1500
+
+
+def pop_startup_profile_arg(argv: list) -> Optional[str]:
+    """取出 --startup-profile[=文件] 参数
+    
+    返回 None 表示未开启；返回空字符串表示只打印报告；否则为追加 JSON 记录的文件路径。
+    """
+    for i, arg in enumerate(argv):
+        if arg == '--startup-profile' or arg.startswith('--startup-profile='):
+            del argv[i]
+            return arg.partition('=')[2]
+    return None
+
+
+def report_startup_profile(timer: PhaseTimer, output: str):
+    """输出启动耗时报告，超出预算时给出警告，并可追加到文件便于追踪回归"""
+    total_ms = timer.total() * 1000
+    print(timer.report())
+    if total_ms > STARTUP_BUDGET_MS:
+        print(f"⚠️  启动耗时 {total_ms:.0f}ms 超出预算 {STARTUP_BUDGET_MS}ms")
+    if output:
+        record = timer.as_dict()
+        record.update({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'budget_ms': STARTUP_BUDGET_MS,
+            'frozen': bool(getattr(sys, 'frozen', False)),
+        })
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
 def main():
     """主函数"""
+    profile_output = pop_startup_profile_arg(sys.argv)
+    startup = PhaseTimer("启动", start=_STARTUP_T0)
+    startup.mark("导入模块")
+    
     # Windows 系统特定设置
     if platform.system() == 'Windows':
         try:
@@ -924,9 +645,24 @@ def main():
     
     # 设置应用程序属性,提高 Windows 兼容性
     app.setStyle('Fusion')  # 使用 Fusion 风格,在所有平台上表现一致
+    startup.mark("初始化 Qt")
+    
+    pool = BrowserPool(size=1)
+    app.aboutToQuit.connect(pool.shutdown)
     
-    window = OTACredentialTool()
+    window = OTACredentialTool(pool=pool)
+    app.aboutToQuit.connect(window.queue_panel.shutdown)
+    startup.mark("创建窗口")
     window.show()
+    
+    def on_first_shown():
+        startup.mark("显示窗口")
+        if profile_output is not None:
+            report_startup_profile(startup, profile_output)
+        # 窗口显示后再在后台预热浏览器池，后续每次获取凭证只需创建新的上下文
+        pool.start()
+    
+    QTimer.singleShot(0, on_first_shown)
     sys.exit(app.exec())
 
 
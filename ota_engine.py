@@ -0,0 +1,837 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 登录引擎
+自动登录美团、飞猪、携程并获取浏览器凭证，不依赖 Qt，可供 GUI、命令行和后台服务调用
+
+    from ota_engine import fetch_credential
+    credential = fetch_credential("meituan", "账号", "密码")
+"""
+
+import time
+import json
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, Error
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import BrowserPool, launch_browser
+from login_metrics import PhaseTimer
+from selector_cache import resolve_selector, any_visible
+from resource_policy import policy_for
+from credential_format import build_credential, size_report
+from ota_platforms import (
+    PLATFORM_CODES, PLATFORM_NAMES, BACKEND_URLS, SESSION_PROBE_TIMEOUT, CONTEXT_OPTIONS,
+    normalize_platform, is_login_success_url, load_storage_state
+)
+
+
+# 各平台的文本输入方式
+#   fill:       一次调用直接填入（最快，默认）
+#   sequential: 一次 press_sequentially 调用逐字触发键盘事件，适用于监听按键的输入框
+#   human:      逐字输入并带延迟，模拟人工输入
+PLATFORM_INPUT_MODES = {"美团": "fill", "飞猪": "fill", "携程": "sequential"}
+# human 模式下每个字符的间隔（毫秒）
+HUMAN_TYPING_DELAY = 100
+
+# 等待登录完成的最长时间（毫秒），留给用户处理验证码
+LOGIN_WAIT_TIMEOUT = 120000
+# 两次导航事件之间检查错误提示和取消的间隔（毫秒，错误提示由页面内监听推送，检查不产生额外请求）
+ERROR_CHECK_INTERVAL = 500
+# 等待登录表单可见的最长时间，以及期间检查是否已跳转到后台的间隔（毫秒）
+FORM_READY_TIMEOUT = 15000
+FORM_POLL_INTERVAL = 250
+
+
+# 各平台登录页
+LOGIN_URLS = {
+    "美团": "https://me.meituan.com/login/index.html",
+    "飞猪": "https://hotel.fliggy.com/ebooking/login.htm#/",
+    "携程": "https://ebooking.ctrip.com/login/index",
+}
+
+# 每次登录的总期限（秒），包括等待用户处理验证码的时间
+LOGIN_DEADLINE = 180
+# 各阶段预算（毫秒），实际使用阶段预算和剩余总期限中较小的一个，作为该阶段每个操作的超时
+PHASE_BUDGETS = {
+    "探测旧会话": SESSION_PROBE_TIMEOUT,
+    "打开登录页": 15000,
+    "表单就绪": FORM_READY_TIMEOUT,
+    "填写表单": 15000,
+    "提交": 10000,
+    "等待登录跳转": LOGIN_WAIT_TIMEOUT,
+    "后台加载": 20000,
+    "获取凭证": 10000,
+}
+DEFAULT_PHASE_BUDGET = 15000
+# 排队等待浏览器池时检查取消和期限的间隔（秒）
+POOL_CHECK_INTERVAL = 0.5
+
+# 携程登录页可能的选择器（页面改版时按顺序尝试）
+CTRIP_USERNAME_SELECTORS = [
+    "input[name='username-input']",
+    "input[placeholder*='账号']",
+    "input[placeholder*='用户名']",
+    "input[type='text']",
+    "#username",
+    ".username-input"
+]
+CTRIP_PASSWORD_SELECTORS = [
+    "input[name='password-input']",
+    "input[placeholder*='密码']",
+    "input[type='password']",
+    "#password",
+    ".password-input"
+]
+CTRIP_LOGIN_BUTTON_SELECTORS = [
+    "button#hotel-login-box-button",
+    "button[type='submit']",
+    ".login-button",
+    "button:has-text('登录')",
+    "button:has-text('登 录')"
+]
+
+# 各平台登录错误提示的选择器（只在顶层页面和登录 iframe 中查找）
+ERROR_SELECTORS = {
+    "美团": [".tip-error", ".error-message"],
+    "飞猪": [".error-message", ".login-error"],
+    "携程": [".tip-error", ".error-message", ".login-error"],
+}
+# 各平台的登录 iframe（携程的表单在顶层页面）
+LOGIN_FRAME_SELECTORS = {
+    "美团": "iframe.login-iframe",
+    "飞猪": "#alibaba-login-box",
+}
+
+# 页面内的错误提示监听：顶层页面和平台的登录 iframe 各注入一次 MutationObserver，
+# DOM 变化后检查各选择器的第一个元素，出现新的可见错误文本时通过绑定推送给引擎。
+# 验证码、统计等第三方 iframe 不监听；跨域 iframe 取不到 frameElement，由引擎按 frame 过滤
+ERROR_WATCHER_BINDING = "__otaLoginError"
+ERROR_WATCHER_SCRIPT = """
+(() => {
+    if (window.__otaErrorWatcher) return;
+    const selectors = %s;
+    const loginFrame = %s;
+    if (window !== window.top) {
+        const frame = window.frameElement;
+        if (!loginFrame || (frame && !frame.matches(loginFrame))) return;
+    }
+    window.__otaErrorWatcher = true;
+    let last = '';
+    let pending = false;
+    const visible = el => (el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+        && getComputedStyle(el).visibility !== 'hidden';
+    const check = () => {
+        pending = false;
+        const report = window.%s;
+        if (typeof report !== 'function') return;
+        for (const selector of selectors) {
+            const el = document.querySelector(selector);
+            const text = el ? (el.textContent || '').trim() : '';
+            if (text && visible(el)) {
+                if (text !== last) {
+                    last = text;
+                    report(text);
+                }
+                return;
+            }
+        }
+        last = '';
+    };
+    const schedule = () => {
+        if (!pending) {
+            pending = true;
+            setTimeout(check, 50);
+        }
+    };
+    const start = () => {
+        new MutationObserver(schedule).observe(document.documentElement, {
+            subtree: true, childList: true, characterData: true,
+            attributes: true, attributeFilter: ['style', 'class', 'hidden']
+        });
+        schedule();
+    };
+    if (document.documentElement) {
+        start();
+    } else {
+        document.addEventListener('DOMContentLoaded', start);
+    }
+})();
+"""
+
+
+def error_watcher_script(platform: str) -> str:
+    """平台的错误提示监听脚本"""
+    return ERROR_WATCHER_SCRIPT % (json.dumps(ERROR_SELECTORS[platform]),
+                                   json.dumps(LOGIN_FRAME_SELECTORS.get(platform)), ERROR_WATCHER_BINDING)
+
+
+def is_watched_frame(frame, login_frames) -> bool:
+    """错误提示是否来自顶层页面或已定位的登录 iframe"""
+    return frame is None or frame.parent_frame is None or frame in login_frames
+
+
+class LoginRejectedError(Exception):
+    """平台在登录页显示了错误提示（如账号或密码错误）
+    
+    提示也可能是验证码、频繁操作等临时问题，调用方按普通失败退避重试，不要永久放弃账号。
+    """
+
+    def __init__(self, platform: str, reason: str):
+        super().__init__(f"{platform}登录失败: {reason}")
+        self.platform = platform
+        self.reason = reason
+
+
+class LoginCancelledError(Exception):
+    """登录被调用方取消（cancel）或浏览器被关闭"""
+
+
+class LoginDeadlineError(Exception):
+    """登录超出总期限"""
+
+
+class LoginDeadline:
+    """一次登录的总期限、各阶段预算和取消标记（cancel 可在任意线程调用）"""
+
+    def __init__(self, platform: str, seconds: float = LOGIN_DEADLINE,
+                 budgets: Optional[Dict[str, int]] = None):
+        self.platform = platform
+        self.seconds = seconds
+        self.budgets = dict(PHASE_BUDGETS, **(budgets or {}))
+        self._cancelled = threading.Event()
+        self._end = time.monotonic() + seconds
+        self._phase_end = self._end
+        # 最近一次检查时所在的阶段（登录出错时记录到耗时统计）
+        self.phase = ''
+
+    def start(self):
+        """从现在开始计算总期限（不清除取消标记）"""
+        self._end = time.monotonic() + self.seconds
+        self._phase_end = self._end
+        self.phase = ''
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> float:
+        """剩余时间（秒）"""
+        return self._end - time.monotonic()
+
+    def check(self, phase: str = ''):
+        """已取消时抛出 LoginCancelledError，超出总期限时抛出 LoginDeadlineError"""
+        if phase:
+            self.phase = phase
+        if self.cancelled:
+            raise LoginCancelledError(f"{self.platform}登录已取消")
+        if self.remaining() <= 0:
+            where = f"（{phase}）" if phase else ""
+            raise LoginDeadlineError(f"{self.platform}登录超出总期限 {self.seconds:g}s{where}")
+
+    def budget(self, phase: str) -> int:
+        """阶段预算（毫秒），不超过剩余总期限"""
+        self.check(phase)
+        return max(1, min(self.budgets.get(phase, DEFAULT_PHASE_BUDGET), int(self.remaining() * 1000)))
+
+    def apply(self, context, phase: str) -> int:
+        """进入阶段：检查取消和期限，并把阶段预算设为上下文中所有操作的默认超时（毫秒）"""
+        timeout = self.budget(phase)
+        self._phase_end = time.monotonic() + timeout / 1000
+        context.set_default_timeout(timeout)
+        context.set_default_navigation_timeout(timeout)
+        return timeout
+
+    def phase_remaining(self) -> int:
+        """当前阶段（最近一次 apply）剩余的预算（毫秒），不超过剩余总期限"""
+        self.check()
+        return max(1, int((min(self._phase_end, self._end) - time.monotonic()) * 1000))
+
+
+def verify_logged_in(platform: str, url: str):
+    """最终验证登录状态，未在后台页面时抛出异常"""
+    print(f"最终验证 - 平台: {platform}, URL: {url}")
+    if platform == "美团" and "ebooking" not in url:
+        raise Exception("美团登录验证失败: 未在后台页面")
+    elif platform == "飞猪" and "login.htm" in url:
+        raise Exception("飞猪登录验证失败: 仍在登录页面")
+    elif platform == "携程" and "login" in url:
+        raise Exception("携程登录验证失败: 未在后台页面")
+
+
+def storage_state_to_credential(storage_state: dict, platform: Optional[str] = None,
+                                fmt: str = 'compact') -> str:
+    """校验 storage_state，按平台裁剪（platform 为 None 时不裁剪）并转换为凭证字符串"""
+    # 检查是否有有效的cookies
+    if not storage_state.get('cookies') or len(storage_state['cookies']) == 0:
+        raise Exception("获取凭证失败: 未找到有效的Cookie信息")
+    
+    credential, stats = build_credential(storage_state, platform, fmt)
+    if stats['cookies_after'] == 0:
+        raise Exception("获取凭证失败: 未找到平台的Cookie信息")
+    print(f"凭证 - Cookie {stats['cookies_before']} -> {stats['cookies_after']}，"
+          f"origin {stats['origins_before']} -> {stats['origins_after']}，"
+          f"大小 {size_report(stats['bytes_before'], stats['bytes_after'])}")
+    return credential
+
+
+# 增强的反检测脚本
+STEALTH_SCRIPT = """
+    // 移除 webdriver 标识
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+    
+    // 添加 chrome 对象
+    window.navigator.chrome = {
+        runtime: {},
+        loadTimes: function() {},
+        csi: function() {},
+        app: {}
+    };
+    
+    // 修改 plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [
+            {
+                0: {type: "application/x-google-chrome-pdf", suffixes: "pdf", description: "Portable Document Format"},
+                description: "Portable Document Format",
+                filename: "internal-pdf-viewer",
+                length: 1,
+                name: "Chrome PDF Plugin"
+            },
+            {
+                0: {type: "application/pdf", suffixes: "pdf", description: ""},
+                description: "",
+                filename: "mhjfbmdgcfjbbpaeojofohoefgiehjai",
+                length: 1,
+                name: "Chrome PDF Viewer"
+            },
+            {
+                0: {type: "application/x-nacl", suffixes: "", description: "Native Client Executable"},
+                1: {type: "application/x-pnacl", suffixes: "", description: "Portable Native Client Executable"},
+                description: "",
+                filename: "internal-nacl-plugin",
+                length: 2,
+                name: "Native Client"
+            }
+        ]
+    });
+    
+    // 修改 languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['zh-CN', 'zh', 'en-US', 'en']
+    });
+    
+    // 修改 permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+    
+    // 伪装 canvas 指纹
+    const getParameter = WebGLRenderingContext.prototype.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(parameter) {
+        if (parameter === 37445) {
+            return 'Intel Inc.';
+        }
+        if (parameter === 37446) {
+            return 'Intel Iris OpenGL Engine';
+        }
+        return getParameter.call(this, parameter);
+    };
+    
+    // 添加 connection 属性
+    Object.defineProperty(navigator, 'connection', {
+        get: () => ({
+            effectiveType: '4g',
+            rtt: 50,
+            downlink: 10,
+            saveData: false
+        })
+    });
+"""
+
+
+class LoginEngine:
+    """登录引擎：自动登录 OTA 平台并获取凭证（不依赖 Qt）
+    
+    传入 previous_credential 时优先复用旧会话：用旧凭证创建上下文并请求后台首页，
+    会话仍有效则直接返回刷新后的凭证，失效才走完整的账号密码登录。
+    context_setup 在每个新建的上下文上调用（如注册请求路由），用于测试和基准。
+    block_resources=True 时按 resource_policy 中的平台规则拦截图片、字体和统计脚本。
+    凭证默认按平台裁剪（prune）并以 credential_format 格式输出（见 credential_format）。
+    传入 metrics（login_metrics.MetricsRecorder）时每次登录的分阶段耗时都会记录到其中。
+    传入 recorder（flight_recorder.FlightRecorder）时登录失败会保存追踪、截图和请求记录，
+    保存位置见 failure_dir。
+    每次登录最多 deadline 秒，各阶段另有预算（PHASE_BUDGETS）；cancel() 可在任意线程调用。
+    """
+    
+    def __init__(self, platform: str, username: str, password: str,
+                 pool: Optional[BrowserPool] = None, headless: bool = False,
+                 previous_credential=None,
+                 context_setup: Optional[Callable[[BrowserContext], None]] = None,
+                 block_resources: bool = True, credential_format: str = 'compact',
+                 prune: bool = True, metrics=None, recorder=None, deadline: float = LOGIN_DEADLINE):
+        self.platform = normalize_platform(platform)
+        self.username = username
+        self.password = password
+        self.pool = pool
+        self.headless = headless
+        self.previous_state = load_storage_state(previous_credential)
+        self.reused = False
+        self.context_setup = context_setup
+        self.block_resources = block_resources
+        self.resource_policy = None
+        self.credential_format = credential_format
+        self.prune = prune
+        self.metrics = metrics
+        self.recorder = recorder
+        self.failure_dir = None
+        # 当前登录的失败现场记录（见 flight_recorder）
+        self._flight = None
+        # 页面内监听推送的最新错误提示，只接受顶层页面和 _login_frames 中的 iframe
+        self._page_error: Optional[str] = None
+        self._login_frames = []
+        self.deadline = LoginDeadline(self.platform, deadline)
+        self.timer = PhaseTimer(self.platform)
+    
+    def cancel(self):
+        """取消登录（可在任意线程调用）
+        
+        还在排队等待浏览器池时直接撤回；进行中的登录在下一个检查点（等待表单和等待登录跳转
+        每 ERROR_CHECK_INTERVAL 检查一次，其他操作最迟在该阶段预算内）结束并关闭上下文。
+        """
+        self.deadline.cancel()
+    
+    def login(self) -> str:
+        """执行登录并获取凭证"""
+        self.timer = PhaseTimer(self.platform, labels={'platform': PLATFORM_NAMES[self.platform]})
+        self.deadline.start()
+        outcome = 'failed'
+        try:
+            self.deadline.check()
+            credential = self._login()
+            outcome = 'reused' if self.reused else 'success'
+            return credential
+        except LoginCancelledError:
+            outcome = 'cancelled'
+            self.timer.fail(self.deadline.phase, 'cancelled')
+            raise
+        except Exception:
+            self.timer.fail(self.deadline.phase)
+            raise
+        finally:
+            self.timer.outcome = outcome
+            print(self.timer.report())
+            if self.metrics is not None:
+                self.metrics.record(self.timer)
+
+    def _login(self) -> str:
+        # 有浏览器池时复用常驻浏览器，只创建新的上下文
+        if self.pool is not None:
+            return self._wait_for_pool(self.pool.submit(self._login_with_browser))
+
+        with sync_playwright() as p:
+            self.timer.mark("启动驱动")
+            browser = launch_browser(p, headless=self.headless)
+            self.timer.mark("启动浏览器")
+            try:
+                return self._login_with_browser(browser)
+            finally:
+                browser.close()
+    
+    def _wait_for_pool(self, future: Future) -> str:
+        """等待池中的槽位执行登录，排队期间取消或超出期限时撤回任务"""
+        while True:
+            try:
+                return future.result(timeout=POOL_CHECK_INTERVAL)
+            except FutureTimeoutError:
+                pass
+            if future.running():
+                # 已在槽位上执行，由登录流程自己检查取消和期限
+                continue
+            try:
+                self.deadline.check("等待空闲浏览器")
+            except (LoginCancelledError, LoginDeadlineError):
+                if future.cancel():
+                    raise
+
+    def _login_with_browser(self, browser: Browser) -> str:
+        """在给定浏览器中创建独立上下文并完成登录"""
+        if self.pool is not None:
+            self.timer.mark("等待空闲浏览器")
+            self.deadline.check("等待空闲浏览器")
+        
+        # 优先复用旧会话
+        if self.previous_state is not None:
+            credential = self._try_reuse_session(browser)
+            if credential is not None:
+                self.reused = True
+                return credential
+        
+        # 创建上下文，模拟真实浏览器；之后的任何异常（包括取消和超时）都由 finally 关闭上下文
+        context = browser.new_context(**CONTEXT_OPTIONS)
+        page = None
+        run = None
+        try:
+            if self.context_setup is not None:
+                self.context_setup(context)
+            self._install_error_watcher(context)
+            # 拦截规则最后注册、最先匹配，放行的请求再交给 context_setup 注册的路由
+            self.resource_policy = policy_for(self.platform) if self.block_resources else None
+            if self.resource_policy is not None:
+                self.resource_policy.install(context)
+            
+            page = context.new_page()
+            run = (self.recorder.begin(PLATFORM_NAMES[self.platform], self.username, secrets=(self.password,))
+                   if self.recorder else None)
+            self._flight = run
+            if run is not None:
+                run.attach(context, page)
+                run.start_tracing(context)
+            self.timer.mark("创建上下文")
+            
+            # 增强的反检测脚本
+            page.add_init_script(STEALTH_SCRIPT)
+            
+            self.deadline.apply(context, "打开登录页")
+            if self.platform == "美团":
+                self._login_meituan(page)
+            elif self.platform == "飞猪":
+                self._login_fliggy(page)
+            elif self.platform == "携程":
+                self._login_ctrip(page)
+            else:
+                raise ValueError(f"不支持的平台: {self.platform}")
+            
+            # 最终验证登录状态（等待后台页面加载完成，保证 localStorage 已写入）
+            self.deadline.apply(context, "后台加载")
+            page.wait_for_load_state("load")
+            verify_logged_in(self.platform, page.url)
+            self.timer.mark("后台加载")
+            
+            # 获取凭证
+            self.deadline.apply(context, "获取凭证")
+            credential = self._get_credential(context)
+            self.timer.mark("获取凭证")
+            return credential
+            
+        except LoginCancelledError:
+            raise
+        except Exception as e:
+            # 取消或用户关闭了浏览器：操作中断引起的错误不是登录失败，不保存现场
+            if self.deadline.cancelled or (page is not None and page.is_closed()):
+                reason = "" if self.deadline.cancelled else ": 浏览器已关闭"
+                raise LoginCancelledError(f"{self.platform}登录已取消{reason}") from e
+            self.timer.fail(self.deadline.phase)
+            if run is not None:
+                self.failure_dir = run.capture_failure(context, page, e, self.timer.as_dict()['phases'])
+            raise
+        finally:
+            if self.resource_policy is not None:
+                print(f"资源拦截 - {self.resource_policy.stats.report()}")
+            # 浏览器可能已被用户关闭，清理失败不应覆盖原始错误
+            try:
+                # 成功或中断时删除追踪的临时文件（失败现场已移走，不受影响）
+                if run is not None:
+                    run.discard(context)
+                context.close()
+            except Exception:
+                pass
+    
+    def _try_reuse_session(self, browser: Browser) -> Optional[str]:
+        """用旧凭证请求后台首页，会话有效时返回刷新后的凭证，否则返回 None
+        
+        只发 HTTP 请求（与上下文共享 Cookie），不打开页面。
+        """
+        context = browser.new_context(storage_state=self.previous_state, **CONTEXT_OPTIONS)
+        try:
+            if self.context_setup is not None:
+                self.context_setup(context)
+            timeout = self.deadline.apply(context, "探测旧会话")
+            response = context.request.get(BACKEND_URLS[self.platform], timeout=timeout)
+            alive = response.ok and is_login_success_url(self.platform, response.url)
+            self.timer.mark("探测旧会话")
+            print(f"旧会话{'有效' if alive else '已失效'} - 平台: {self.platform}, URL: {response.url}")
+            if not alive:
+                return None
+            self.deadline.apply(context, "获取凭证")
+            credential = self._get_credential(context)
+            self.timer.mark("获取凭证")
+            return credential
+        except Error as e:
+            self.timer.mark("探测旧会话")
+            print(f"旧会话探测失败，改为重新登录: {e}")
+            return None
+        finally:
+            try:
+                context.close()
+            except Exception:
+                pass
+    
+    def _login_meituan(self, page: Page):
+        """美团登录"""
+        # 访问登录页面（不等待整页加载，登录 iframe 中的账号输入框可见即开始填写）
+        page.goto(LOGIN_URLS["美团"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        if not self._wait_for_form(page, page.frame_locator("iframe.login-iframe").locator("input#login").first):
+            return
+        frame = page.query_selector("iframe.login-iframe").content_frame()
+        self._login_frames.append(frame)
+        self.timer.mark("表单就绪")
+        
+        # 填写账号密码
+        self.deadline.apply(page.context, "填写表单")
+        self._enter_text(frame, "input#login", self.username)
+        self._enter_password(page, frame, "input#password")
+        
+        # 勾选协议
+        frame.evaluate("""() => {
+            const checkbox = document.querySelector('input#checkbox');
+            if (checkbox && !checkbox.checked) {
+                checkbox.click();
+            }
+        }""")
+        
+        self.timer.mark("填写表单")
+        
+        # 点击登录
+        self.deadline.apply(page.context, "提交")
+        frame.click("button.ep-login_btn")
+        self.timer.mark("提交")
+        
+        # 等待登录成功
+        try:
+            self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError as e:
+            raise Exception(f"美团登录超时或失败: {str(e)}")
+        
+        # 验证是否真的登录成功
+        if "ebooking" not in page.url:
+            raise Exception("美团登录失败: 未能跳转到后台页面")
+
+    def _login_fliggy(self, page: Page):
+        """飞猪登录"""
+        # 访问登录页面，账号输入框可见即开始填写（已登录时会直接跳转到后台）
+        page.goto(LOGIN_URLS["飞猪"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        if not self._wait_for_form(page, page.locator("input[name='username']").first):
+            return
+        self.timer.mark("表单就绪")
+        
+        # 输入账号
+        self.deadline.apply(page.context, "填写表单")
+        self._enter_text(page, "input[name='username']", self.username)
+        
+        # 点击下一步
+        page.click("button.login-button")
+        
+        # 等待 iframe 并输入密码（超时为“填写表单”阶段的预算）
+        box = page.wait_for_selector("#alibaba-login-box")
+        self._login_frames.append(box.content_frame())
+        login_frame = page.frame_locator("#alibaba-login-box")
+        
+        login_frame.locator("#fm-login-password").wait_for()
+        self._enter_password(page, login_frame, "#fm-login-password")
+        self.timer.mark("填写表单")
+        
+        # 点击登录
+        self.deadline.apply(page.context, "提交")
+        login_frame.locator("button.fm-submit.password-login").click()
+        self.timer.mark("提交")
+        
+        # 等待登录成功或需要用户干预（最多 LOGIN_WAIT_TIMEOUT，且不超过总期限）
+        try:
+            self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError:
+            raise Exception("飞猪登录超时: 请检查账号密码或手动完成验证")
+        print(f"登录成功！最终URL: {page.url}")
+    
+    def _login_ctrip(self, page: Page):
+        """携程登录"""
+        # 访问登录页面，任一账号输入框候选可见即开始填写（已登录时会直接跳转到后台）
+        page.goto(LOGIN_URLS["携程"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        try:
+            ready = self._wait_for_form(page, any_visible(page, CTRIP_USERNAME_SELECTORS))
+        except PlaywrightTimeoutError:
+            # 打印页面内容用于调试
+            print("页面HTML:")
+            print(page.content()[:2000])
+            raise Exception("携程登录失败: 未找到账号输入框")
+        
+        print(f"携程登录 - 当前URL: {page.url}")
+        
+        # 检查是否已登录
+        if not ready:
+            print("携程已登录，跳过登录流程")
+            return
+        
+        # 查找并填写账号（所有候选同时等待）
+        self.deadline.apply(page.context, "填写表单")
+        username_selector = resolve_selector(page, CTRIP_USERNAME_SELECTORS, self.platform, "username",
+                                             timeout=self.deadline.phase_remaining())
+        self.timer.mark("表单就绪")
+        
+        if not username_selector:
+            # 打印页面内容用于调试
+            print("页面HTML:")
+            print(page.content()[:2000])
+            raise Exception("携程登录失败: 未找到账号输入框")
+        print(f"找到账号输入框: {username_selector}")
+        
+        # 查找并填写密码
+        password_selector = resolve_selector(page, CTRIP_PASSWORD_SELECTORS, self.platform, "password",
+                                             timeout=self.deadline.phase_remaining())
+        if not password_selector:
+            raise Exception("携程登录失败: 未找到密码输入框")
+        print(f"找到密码输入框: {password_selector}")
+        
+        # 填写账号密码
+        self._enter_text(page, username_selector, self.username)
+        self._enter_password(page, page, password_selector)
+        self.timer.mark("填写表单")
+        
+        # 查找并点击登录按钮
+        login_button_selector = resolve_selector(page, CTRIP_LOGIN_BUTTON_SELECTORS, self.platform, "login_button",
+                                                 timeout=self.deadline.phase_remaining())
+        if not login_button_selector:
+            raise Exception("携程登录失败: 未找到登录按钮")
+        print(f"找到登录按钮: {login_button_selector}")
+        
+        # 点击登录
+        self.deadline.apply(page.context, "提交")
+        page.click(login_button_selector)
+        self.timer.mark("提交")
+        
+        # 等待登录结果（最多 LOGIN_WAIT_TIMEOUT，给用户时间处理验证码）
+        try:
+            self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError:
+            raise Exception("携程登录超时: 请检查账号密码或手动完成验证")
+        print(f"携程登录成功！最终URL: {page.url}")
+    
+    def _wait_for_form(self, page: Page, locator, timeout: Optional[int] = None) -> bool:
+        """等待登录表单元素可见（不等待整页加载和网络空闲）
+        
+        页面已跳转到后台（已登录）时返回 False，超时（默认为“表单就绪”阶段的预算）
+        抛出 PlaywrightTimeoutError，每次轮询检查取消。
+        """
+        if timeout is None:
+            timeout = self.deadline.budget("表单就绪")
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            self.deadline.check("表单就绪")
+            if is_login_success_url(self.platform, page.url):
+                return False
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                raise PlaywrightTimeoutError(f"等待登录表单超时 {timeout}ms")
+            try:
+                locator.wait_for(state="visible", timeout=min(FORM_POLL_INTERVAL, remaining))
+                return True
+            except PlaywrightTimeoutError:
+                pass
+    
+    def _enter_text(self, target, selector: str, text: str):
+        """按平台配置的输入方式填写文本（target 可以是 Page、Frame 或 FrameLocator）"""
+        mode = PLATFORM_INPUT_MODES.get(self.platform, "fill")
+        locator = target.locator(selector).first
+        if mode == "fill":
+            locator.fill(text)
+            return
+        
+        # 先清空，再一次调用逐字输入
+        locator.fill("")
+        delay = HUMAN_TYPING_DELAY if mode == "human" else 0
+        locator.press_sequentially(text, delay=delay)
+    
+    def _enter_password(self, page: Page, target, selector: str):
+        """填写密码：先结束失败现场的追踪，密码和之后的登录请求不会进入 trace.zip"""
+        if self._flight is not None:
+            self._flight.stop_tracing(page.context)
+        self._enter_text(target, selector, self.password)
+    
+    def _wait_for_login(self, page: Page, is_success: Callable[[str], bool],
+                        timeout: Optional[int] = None):
+        """等待登录完成
+        
+        通过导航事件判断是否跳转到后台页面，跳转后立即返回；
+        页面内监听推送了错误提示时抛出 LoginRejectedError，取消时抛出 LoginCancelledError。
+        超时（默认为“等待登录跳转”阶段的预算）抛出 PlaywrightTimeoutError。
+        """
+        if timeout is None:
+            timeout = self.deadline.budget("等待登录跳转")
+        deadline = time.monotonic() + timeout / 1000
+        checks = 0
+        while True:
+            self.deadline.check("等待登录跳转")
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                print(f"等待超时，最终URL: {page.url}")
+                raise PlaywrightTimeoutError(f"等待登录超时 {timeout}ms")
+            # 打印当前 URL 用于调试（每10次检查打印一次）
+            if checks % 10 == 0:
+                print(f"等待{self.platform}登录中... 当前URL: {page.url}")
+            checks += 1
+            try:
+                page.wait_for_url(is_success, timeout=min(ERROR_CHECK_INTERVAL, remaining))
+                self.timer.mark("等待登录跳转")
+                return
+            except PlaywrightTimeoutError:
+                pass
+            
+            if self._page_error:
+                raise LoginRejectedError(self.platform, self._page_error)
+    
+    def _install_error_watcher(self, context: BrowserContext):
+        """注入页面内的错误提示监听（顶层页面和登录 iframe），错误提示出现时推送到 _page_error"""
+        self._page_error = None
+        self._login_frames = []
+        
+        def on_error(source, text: str):
+            if is_watched_frame(source.get('frame'), self._login_frames):
+                self._page_error = text
+        
+        context.expose_binding(ERROR_WATCHER_BINDING, on_error)
+        context.add_init_script(error_watcher_script(self.platform))
+    
+    def _get_credential(self, context: BrowserContext) -> str:
+        """获取浏览器上下文凭证"""
+        # 获取存储状态
+        storage_state = context.storage_state()
+        return storage_state_to_credential(storage_state, self.platform if self.prune else None,
+                                           self.credential_format)
+
+
+def fetch_credential(platform: str, username: str, password: str,
+                     pool: Optional[BrowserPool] = None, headless: bool = False,
+                     previous_credential=None, credential_format: str = 'compact',
+                     prune: bool = True, metrics=None, deadline: float = LOGIN_DEADLINE) -> str:
+    """登录并返回凭证（storage_state），提供旧凭证时优先复用会话"""
+    return LoginEngine(platform, username, password, pool=pool, headless=headless,
+                       previous_credential=previous_credential,
+                       credential_format=credential_format, prune=prune, metrics=metrics,
+                       deadline=deadline).login()
+
+
+async def fetch_credential_async(platform: str, username: str, password: str,
+                                 pool: Optional[BrowserPool] = None, headless: bool = False,
+                                 previous_credential=None, credential_format: str = 'compact',
+                                 prune: bool = True, metrics=None,
+                                 deadline: float = LOGIN_DEADLINE) -> str:
+    """fetch_credential 的异步版本（在线程中执行，不阻塞事件循环）"""
+    return await asyncio.to_thread(fetch_credential, platform, username, password,
+                                   pool=pool, headless=headless,
+                                   previous_credential=previous_credential,
+                                   credential_format=credential_format, prune=prune, metrics=metrics,
+                                   deadline=deadline)
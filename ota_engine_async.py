@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OTA 异步登录引擎
+基于 playwright.async_api，在一个事件循环、一个驱动和一个浏览器上并发执行多个登录，
+每个登录使用独立的 BrowserContext，总并发和各平台并发由信号量限制
+
+    async with AsyncLoginRunner(concurrency=8) as runner:
+        credential = await runner.fetch("meituan", "账号", "密码")
+"""
+
+import time
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright, Error
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import LAUNCH_ARGS
+from login_metrics import PhaseTimer
+from ota_engine import (
+    PLATFORM_NAMES, PLATFORM_INPUT_MODES, HUMAN_TYPING_DELAY,
+    FORM_POLL_INTERVAL, LOGIN_URLS, CONTEXT_OPTIONS, STEALTH_SCRIPT, BACKEND_URLS, LOGIN_DEADLINE,
+    CTRIP_USERNAME_SELECTORS, CTRIP_PASSWORD_SELECTORS, CTRIP_LOGIN_BUTTON_SELECTORS,
+    ERROR_WATCHER_BINDING, LoginRejectedError, error_watcher_script, is_watched_frame,
+    LoginCancelledError, LoginDeadlineError, LoginDeadline,
+    normalize_platform, is_login_success_url, verify_logged_in, storage_state_to_credential,
+    load_storage_state
+)
+from selector_cache import resolve_selector_async, any_visible
+from resource_policy import policy_for
+
+
+async def launch_browser_async(p: Playwright, headless: bool = False) -> Browser:
+    """启动浏览器：优先使用系统 Chrome，失败则使用 Chromium"""
+    try:
+        return await p.chromium.launch(headless=headless, channel='chrome', args=LAUNCH_ARGS)
+    except Exception:
+        return await p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+
+
+class AsyncLoginEngine:
+    """单个账号的异步登录流程（与 ota_engine.LoginEngine 一致）
+
+    超出总期限或调用 cancel() 时直接取消登录任务，页面和上下文在 finally 中关闭。
+    """
+
+    def __init__(self, platform: str, username: str, password: str, previous_credential=None,
+                 block_resources: bool = True, credential_format: str = 'compact', prune: bool = True,
+                 metrics=None, recorder=None, deadline: float = LOGIN_DEADLINE):
+        self.platform = normalize_platform(platform)
+        self.username = username
+        self.password = password
+        self.previous_state = load_storage_state(previous_credential)
+        self.reused = False
+        self.block_resources = block_resources
+        self.resource_policy = None
+        self.credential_format = credential_format
+        self.prune = prune
+        self.metrics = metrics
+        self.recorder = recorder
+        self.failure_dir = None
+        self._flight = None
+        self._page_error: Optional[str] = None
+        self._page_error_event: Optional[asyncio.Event] = None
+        self._login_frames = []
+        self.deadline = LoginDeadline(self.platform, deadline)
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._expired = False
+        self.timer = PhaseTimer(self.platform)
+
+    def cancel(self):
+        """取消登录（可在任意线程调用），立即中断当前操作"""
+        self.deadline.cancel()
+        task, loop = self._task, self._loop
+        if task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    async def login(self, browser: Browser) -> str:
+        """在给定浏览器中创建独立上下文并完成登录，返回凭证 JSON"""
+        self.timer = PhaseTimer(self.platform, labels={'platform': PLATFORM_NAMES[self.platform]})
+        self.deadline.start()
+        self._expired = False
+        outcome = 'failed'
+        expire = None
+        try:
+            self.deadline.check()
+            # 登录在单独的任务中执行，取消和超出期限时只取消该任务
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.ensure_future(self._login(browser))
+            expire = self._loop.call_later(self.deadline.remaining(), self._expire)
+            try:
+                credential = await self._task
+            except asyncio.CancelledError:
+                if self.deadline.cancelled:
+                    raise LoginCancelledError(f"{self.platform}登录已取消")
+                if self._expired:
+                    raise LoginDeadlineError(f"{self.platform}登录超出总期限 {self.deadline.seconds:g}s")
+                # 调用方取消了外层任务时原样抛出
+                raise
+            outcome = 'reused' if self.reused else 'success'
+            return credential
+        except LoginCancelledError:
+            outcome = 'cancelled'
+            self.timer.fail(self.deadline.phase, 'cancelled')
+            raise
+        except BaseException:
+            self.timer.fail(self.deadline.phase)
+            raise
+        finally:
+            if expire is not None:
+                expire.cancel()
+            self._task = None
+            self.timer.outcome = outcome
+            print(self.timer.report())
+            if self.metrics is not None:
+                self.metrics.record(self.timer)
+
+    def _expire(self):
+        self._expired = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _login(self, browser: Browser) -> str:
+        # 优先复用旧会话
+        if self.previous_state is not None:
+            credential = await self._try_reuse_session(browser)
+            if credential is not None:
+                self.reused = True
+                return credential
+
+        # 之后的任何异常（包括取消和超时）都由 finally 关闭上下文
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        page = None
+        run = None
+        try:
+            await self._install_error_watcher(context)
+            self.resource_policy = policy_for(self.platform) if self.block_resources else None
+            if self.resource_policy is not None:
+                await self.resource_policy.install_async(context)
+            page = await context.new_page()
+            run = (self.recorder.begin(PLATFORM_NAMES[self.platform], self.username, secrets=(self.password,))
+                   if self.recorder else None)
+            self._flight = run
+            if run is not None:
+                run.attach(context, page)
+                await run.start_tracing_async(context)
+            self.timer.mark("创建上下文")
+            await page.add_init_script(STEALTH_SCRIPT)
+
+            self.deadline.apply(context, "打开登录页")
+            if self.platform == "美团":
+                await self._login_meituan(page)
+            elif self.platform == "飞猪":
+                await self._login_fliggy(page)
+            elif self.platform == "携程":
+                await self._login_ctrip(page)
+            else:
+                raise ValueError(f"不支持的平台: {self.platform}")
+
+            # 最终验证登录状态（等待后台页面加载完成，保证 localStorage 已写入）
+            self.deadline.apply(context, "后台加载")
+            await page.wait_for_load_state("load")
+            verify_logged_in(self.platform, page.url)
+            self.timer.mark("后台加载")
+
+            self.deadline.apply(context, "获取凭证")
+            credential = await self._get_credential(context)
+            self.timer.mark("获取凭证")
+            return credential
+        except LoginCancelledError:
+            raise
+        except Exception as e:
+            # 用户关闭了浏览器：不是登录失败，不保存现场
+            if page is not None and page.is_closed():
+                raise LoginCancelledError(f"{self.platform}登录已取消: 浏览器已关闭") from e
+            self.timer.fail(self.deadline.phase)
+            if run is not None:
+                self.failure_dir = await run.capture_failure_async(context, page, e,
+                                                                   self.timer.as_dict()['phases'])
+            raise
+        finally:
+            if self.resource_policy is not None:
+                print(f"资源拦截 - {self.resource_policy.stats.report()}")
+            # 浏览器可能已被用户关闭，清理失败不应覆盖原始错误
+            try:
+                # 成功或中断时删除追踪的临时文件（失败现场已移走，不受影响）
+                if run is not None:
+                    await run.discard_async(context)
+                await context.close()
+            except Exception:
+                pass
+
+    async def _try_reuse_session(self, browser: Browser) -> Optional[str]:
+        """用旧凭证请求后台首页，会话有效时返回刷新后的凭证，否则返回 None"""
+        context = await browser.new_context(storage_state=self.previous_state, **CONTEXT_OPTIONS)
+        try:
+            timeout = self.deadline.apply(context, "探测旧会话")
+            response = await context.request.get(BACKEND_URLS[self.platform], timeout=timeout)
+            alive = response.ok and is_login_success_url(self.platform, response.url)
+            self.timer.mark("探测旧会话")
+            print(f"旧会话{'有效' if alive else '已失效'} - 平台: {self.platform}, URL: {response.url}")
+            if not alive:
+                return None
+            self.deadline.apply(context, "获取凭证")
+            credential = await self._get_credential(context)
+            self.timer.mark("获取凭证")
+            return credential
+        except Error as e:
+            self.timer.mark("探测旧会话")
+            print(f"旧会话探测失败，改为重新登录: {e}")
+            return None
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def _login_meituan(self, page: Page):
+        """美团登录"""
+        await page.goto(LOGIN_URLS["美团"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        if not await self._wait_for_form(page, page.frame_locator("iframe.login-iframe").locator("input#login").first):
+            return
+        frame = await (await page.query_selector("iframe.login-iframe")).content_frame()
+        self._login_frames.append(frame)
+        self.timer.mark("表单就绪")
+
+        self.deadline.apply(page.context, "填写表单")
+        await self._enter_text(frame, "input#login", self.username)
+        await self._enter_password(page, frame, "input#password")
+
+        # 勾选协议
+        await frame.evaluate("""() => {
+            const checkbox = document.querySelector('input#checkbox');
+            if (checkbox && !checkbox.checked) {
+                checkbox.click();
+            }
+        }""")
+        self.timer.mark("填写表单")
+
+        self.deadline.apply(page.context, "提交")
+        await frame.click("button.ep-login_btn")
+        self.timer.mark("提交")
+
+        try:
+            await self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError as e:
+            raise Exception(f"美团登录超时或失败: {str(e)}")
+
+        if "ebooking" not in page.url:
+            raise Exception("美团登录失败: 未能跳转到后台页面")
+
+    async def _login_fliggy(self, page: Page):
+        """飞猪登录"""
+        await page.goto(LOGIN_URLS["飞猪"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        if not await self._wait_for_form(page, page.locator("input[name='username']").first):
+            return
+        self.timer.mark("表单就绪")
+        self.deadline.apply(page.context, "填写表单")
+        await self._enter_text(page, "input[name='username']", self.username)
+
+        # 点击下一步
+        await page.click("button.login-button")
+
+        # 等待 iframe 并输入密码（超时为“填写表单”阶段的预算）
+        box = await page.wait_for_selector("#alibaba-login-box")
+        self._login_frames.append(await box.content_frame())
+        login_frame = page.frame_locator("#alibaba-login-box")
+        await login_frame.locator("#fm-login-password").wait_for()
+        await self._enter_password(page, login_frame, "#fm-login-password")
+        self.timer.mark("填写表单")
+
+        self.deadline.apply(page.context, "提交")
+        await login_frame.locator("button.fm-submit.password-login").click()
+        self.timer.mark("提交")
+
+        try:
+            await self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError:
+            raise Exception("飞猪登录超时: 请检查账号密码或手动完成验证")
+        print(f"登录成功！最终URL: {page.url}")
+
+    async def _login_ctrip(self, page: Page):
+        """携程登录"""
+        await page.goto(LOGIN_URLS["携程"], wait_until="commit")
+        self.timer.mark("打开登录页")
+        try:
+            ready = await self._wait_for_form(page, any_visible(page, CTRIP_USERNAME_SELECTORS))
+        except PlaywrightTimeoutError:
+            raise Exception("携程登录失败: 未找到账号输入框")
+
+        # 检查是否已登录
+        if not ready:
+            print("携程已登录，跳过登录流程")
+            return
+
+        self.deadline.apply(page.context, "填写表单")
+        username_selector = await resolve_selector_async(page, CTRIP_USERNAME_SELECTORS, self.platform, "username",
+                                                         timeout=self.deadline.phase_remaining())
+        self.timer.mark("表单就绪")
+        if not username_selector:
+            raise Exception("携程登录失败: 未找到账号输入框")
+
+        password_selector = await resolve_selector_async(page, CTRIP_PASSWORD_SELECTORS, self.platform, "password",
+                                                         timeout=self.deadline.phase_remaining())
+        if not password_selector:
+            raise Exception("携程登录失败: 未找到密码输入框")
+
+        await self._enter_text(page, username_selector, self.username)
+        await self._enter_password(page, page, password_selector)
+        self.timer.mark("填写表单")
+
+        login_button_selector = await resolve_selector_async(
+            page, CTRIP_LOGIN_BUTTON_SELECTORS, self.platform, "login_button", timeout=self.deadline.phase_remaining())
+        if not login_button_selector:
+            raise Exception("携程登录失败: 未找到登录按钮")
+
+        self.deadline.apply(page.context, "提交")
+        await page.click(login_button_selector)
+        self.timer.mark("提交")
+
+        try:
+            await self._wait_for_login(page, lambda url: is_login_success_url(self.platform, url))
+        except PlaywrightTimeoutError:
+            raise Exception("携程登录超时: 请检查账号密码或手动完成验证")
+        print(f"携程登录成功！最终URL: {page.url}")
+
+    async def _wait_for_form(self, page: Page, locator, timeout: Optional[int] = None) -> bool:
+        """等待登录表单元素可见（见 LoginEngine._wait_for_form）"""
+        if timeout is None:
+            timeout = self.deadline.budget("表单就绪")
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            if is_login_success_url(self.platform, page.url):
+                return False
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                raise PlaywrightTimeoutError(f"等待登录表单超时 {timeout}ms")
+            try:
+                await locator.wait_for(state="visible", timeout=min(FORM_POLL_INTERVAL, remaining))
+                return True
+            except PlaywrightTimeoutError:
+                pass
+
+    async def _enter_text(self, target, selector: str, text: str):
+        """按平台配置的输入方式填写文本"""
+        mode = PLATFORM_INPUT_MODES.get(self.platform, "fill")
+        locator = target.locator(selector).first
+        if mode == "fill":
+            await locator.fill(text)
+            return
+
+        await locator.fill("")
+        delay = HUMAN_TYPING_DELAY if mode == "human" else 0
+        await locator.press_sequentially(text, delay=delay)
+
+    async def _enter_password(self, page: Page, target, selector: str):
+        """填写密码（见 LoginEngine._enter_password）"""
+        if self._flight is not None:
+            await self._flight.stop_tracing_async(page.context)
+        await self._enter_text(target, selector, self.password)
+
+    async def _wait_for_login(self, page: Page, is_success: Callable[[str], bool],
+                              timeout: Optional[int] = None):
+        """等待登录完成（见 LoginEngine._wait_for_login）
+
+        同时等待跳转和页面内监听推送的错误提示，任一先到即结束，不需要轮询。
+        """
+        if timeout is None:
+            timeout = self.deadline.budget("等待登录跳转")
+        navigation = asyncio.ensure_future(page.wait_for_url(is_success, timeout=timeout))
+        rejected = asyncio.ensure_future(self._page_error_event.wait())
+        try:
+            await asyncio.wait({navigation, rejected}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (navigation, rejected):
+                if not task.done():
+                    task.cancel()
+
+        if rejected.done() and not rejected.cancelled():
+            raise LoginRejectedError(self.platform, self._page_error)
+        try:
+            navigation.result()
+        except PlaywrightTimeoutError:
+            print(f"等待超时，最终URL: {page.url}")
+            raise
+        self.timer.mark("等待登录跳转")
+
+    async def _install_error_watcher(self, context: BrowserContext):
+        """注入页面内的错误提示监听（见 LoginEngine._install_error_watcher）"""
+        self._page_error = None
+        self._page_error_event = asyncio.Event()
+        self._login_frames = []
+
+        def on_error(source, text: str):
+            if is_watched_frame(source.get('frame'), self._login_frames):
+                self._page_error = text
+                self._page_error_event.set()
+
+        await context.expose_binding(ERROR_WATCHER_BINDING, on_error)
+        await context.add_init_script(error_watcher_script(self.platform))
+
+    async def _get_credential(self, context: BrowserContext) -> str:
+        """获取浏览器上下文凭证"""
+        storage_state = await context.storage_state()
+        return storage_state_to_credential(storage_state, self.platform if self.prune else None,
+                                           self.credential_format)
+
+
+class AsyncLoginRunner:
+    """共享一个驱动和一个浏览器的并发登录执行器"""
+
+    def __init__(self, concurrency: int = 8,
+                 platform_limits: Optional[Dict[str, int]] = None,
+                 headless: bool = False):
+        self.concurrency = concurrency
+        self.headless = headless
+        limits = {normalize_platform(k): v for k, v in (platform_limits or {}).items()}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._platform_semaphores = {
+            name: asyncio.Semaphore(limits.get(name, concurrency)) for name in PLATFORM_NAMES
+        }
+        self._browser_lock = asyncio.Lock()
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+
+    async def __aenter__(self) -> "AsyncLoginRunner":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """启动驱动和浏览器"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        try:
+            await self._get_browser()
+        except Exception as e:
+            # 预热失败不中断，之后每次登录会重新尝试启动并把错误报告给该账号
+            print(f"浏览器启动失败: {e}")
+
+    async def close(self):
+        """关闭浏览器和驱动"""
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _get_browser(self) -> Browser:
+        """获取共享浏览器，断开时重新启动"""
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                start = time.perf_counter()
+                self._browser = await launch_browser_async(self._playwright, headless=self.headless)
+                print(f"浏览器已启动，耗时 {time.perf_counter() - start:.2f}s")
+            return self._browser
+
+    async def fetch(self, platform: str, username: str, password: str,
+                    previous_credential=None) -> str:
+        """登录单个账号并返回凭证 JSON（受总并发和平台并发限制），提供旧凭证时优先复用会话"""
+        engine = AsyncLoginEngine(platform, username, password, previous_credential=previous_credential)
+        return await self.run(engine)
+
+    async def run(self, engine: AsyncLoginEngine) -> str:
+        """执行一个登录引擎（调用方可在结束后读取 engine.reused、engine.timer）"""
+        # 先占平台名额再占总名额，避免等待平台名额时占着总并发
+        async with self._platform_semaphores[engine.platform], self._semaphore:
+            browser = await self._get_browser()
+            return await engine.login(browser)
+
+    async def fetch_many(self, accounts: List[Dict[str, str]]) -> List[object]:
+        """并发登录多个账号（platform/account/password[/previous_credential]），按顺序返回凭证或异常"""
+        return await asyncio.gather(
+            *(self.fetch(acc['platform'], acc['account'], acc['password'],
+                         previous_credential=acc.get('previous_credential'))
+              for acc in accounts),
+            return_exceptions=True
+        )
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平台常量
+平台编码、后台地址、登录成功判断和旧凭证解析，不依赖 Playwright，
+会话健康扫描等不启动浏览器的工具直接使用；ota_engine 同样从这里导入并对外提供
+"""
+
+from typing import Optional
+
+from credential_format import decode_credential
+
+
+# 平台编码（与后端 OtaAccountState.platformCode 一致）
+PLATFORM_CODES = {"meituan": "美团", "fliggy": "飞猪", "ctrip": "携程"}
+PLATFORM_NAMES = {name: code for code, name in PLATFORM_CODES.items()}
+
+# 各平台后台首页，用于探测旧凭证是否仍然有效
+# 会话有效时直接返回后台页面，失效时会被重定向到登录页（与最终验证的判断一致）
+BACKEND_URLS = {
+    "美团": "https://me.meituan.com/ebooking/",
+    "飞猪": "https://hotel.fliggy.com/ebooking/",
+    "携程": "https://ebooking.ctrip.com/",
+}
+# 会话探测超时（毫秒）
+SESSION_PROBE_TIMEOUT = 10000
+
+# 浏览器上下文参数，模拟真实浏览器
+# 不设置固定的 viewport，让浏览器使用实际窗口大小
+CONTEXT_OPTIONS = dict(
+    no_viewport=True,  # 不限制 viewport，使用实际窗口大小
+    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    locale='zh-CN',
+    timezone_id='Asia/Shanghai',
+    permissions=['geolocation'],
+    has_touch=False,
+    is_mobile=False
+)
+
+
+def normalize_platform(platform: str) -> str:
+    """平台编码（meituan/fliggy/ctrip）或中文名统一为中文名"""
+    name = PLATFORM_CODES.get(platform.strip().lower(), platform.strip())
+    if name not in PLATFORM_NAMES:
+        raise ValueError(f"不支持的平台: {platform}")
+    return name
+
+
+def is_login_success_url(platform: str, url: str) -> bool:
+    """登录后是否已跳转到平台后台页面"""
+    if platform == "美团":
+        return "/ebooking/" in url
+    if platform == "飞猪":
+        return "hotel.fliggy.com" in url and "login.htm" not in url
+    if platform == "携程":
+        return "login" not in url and "ebooking.ctrip.com" in url
+    return False
+
+
+def load_storage_state(credential) -> Optional[dict]:
+    """把旧凭证（任意输出格式的字符串或字典）解析为 storage_state，无效时返回 None"""
+    if not credential:
+        return None
+    if isinstance(credential, dict):
+        return credential
+    try:
+        state = decode_credential(credential)
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) and state.get('cookies') else None
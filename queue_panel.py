@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量登录队列面板
+列出待刷新的账号，按设定的并发数同时登录，实时显示每行的阶段、状态和耗时:
+  - 账号可从清单导入（字段同 batch_refresh），也可从主界面的表单添加
+  - 队列使用独立的浏览器进程池（大小为并发数），不占用单账号登录的浏览器
+  - 选中行可取消（等待中的直接跳过，登录中的在引擎下一个检查点结束并释放浏览器，最迟在当前阶段预算内，见 LoginEngine.cancel）或重试
+  - 双击成功的行在主界面显示该凭证
+"""
+
+import time
+import threading
+from typing import List, Optional
+
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QFileDialog, QMessageBox
+)
+from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor
+
+from browser_pool import BrowserPool
+
+
+# 行状态
+PENDING = "等待中"
+RUNNING = "登录中"
+SUCCESS = "成功"
+FAILED = "失败"
+REJECTED = "被拒绝"
+CANCELLED = "已取消"
+
+# 刷新登录中行的阶段和耗时的间隔（毫秒）
+REFRESH_INTERVAL_MS = 500
+# 退出时等待登录线程结束和浏览器池关闭的总时长（秒）
+SHUTDOWN_TIMEOUT = 10.0
+
+COLUMNS = ("平台", "账号", "门店", "状态", "阶段", "耗时", "结果")
+STATUS_COLORS = {SUCCESS: "#52c41a", FAILED: "#ff4d4f", REJECTED: "#fa541c", CANCELLED: "#999"}
+
+
+class QueueRow:
+    """队列中的一个账号"""
+
+    def __init__(self, platform: str, account: str, password: str, store_id: str = ''):
+        self.platform = platform
+        self.account = account
+        self.password = password
+        self.store_id = store_id
+        self.status = PENDING
+        self.phase = ''
+        self.result = ''
+        self.credential = ''
+        self.worker = None
+        self.started: Optional[float] = None
+        self.duration: Optional[float] = None
+
+    def reset(self):
+        self.status = PENDING
+        self.phase = ''
+        self.result = ''
+        self.credential = ''
+        self.started = None
+        self.duration = None
+
+
+class AccountQueuePanel(QWidget):
+    """批量登录队列（worker_factory 按行创建 LoginWorker，由主窗口传入以共享凭证库、推送和记录）"""
+    credential_selected = pyqtSignal(str)
+
+    def __init__(self, worker_factory, parent=None):
+        super().__init__(parent)
+        self.worker_factory = worker_factory
+        self.rows: List[QueueRow] = []
+        self.pool: Optional[BrowserPool] = None
+        # 登录中的线程（包括已取消但尚未结束的，它们仍占用浏览器槽位）
+        self._active = set()
+        self._finishing = []
+        self._running = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        toolbar = QHBoxLayout()
+        self.import_btn = QPushButton("导入清单")
+        self.import_btn.clicked.connect(self.import_manifest)
+        self.add_btn = QPushButton("添加当前账号")
+        toolbar.addWidget(self.import_btn)
+        toolbar.addWidget(self.add_btn)
+        toolbar.addStretch()
+        toolbar.addWidget(QLabel("并发数:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, 16)
+        self.parallel_spin.setValue(3)
+        toolbar.addWidget(self.parallel_spin)
+        self.start_btn = QPushButton("▶ 开始")
+        self.start_btn.clicked.connect(self.start)
+        toolbar.addWidget(self.start_btn)
+        layout.addLayout(toolbar)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(len(COLUMNS) - 1, QHeaderView.ResizeMode.Stretch)
+        self.table.cellDoubleClicked.connect(self._on_double_clicked)
+        layout.addWidget(self.table)
+
+        actions = QHBoxLayout()
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("color: #555; font-size: 12px;")
+        actions.addWidget(self.summary_label)
+        actions.addStretch()
+        cancel_btn = QPushButton("取消选中")
+        cancel_btn.clicked.connect(self.cancel_selected)
+        retry_btn = QPushButton("重试选中")
+        retry_btn.clicked.connect(self.retry_selected)
+        remove_btn = QPushButton("移除选中")
+        remove_btn.clicked.connect(self.remove_selected)
+        for btn in (cancel_btn, retry_btn, remove_btn):
+            actions.addWidget(btn)
+        layout.addLayout(actions)
+
+        # 定时刷新登录中行的阶段和耗时（读取引擎的 PhaseTimer，不需要工作线程发信号）
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self._refresh_timer.timeout.connect(self._refresh_running)
+        self._update_summary()
+
+    def add_account(self, platform: str, account: str, password: str, store_id: str = ''):
+        """添加账号（同一平台同一账号已在队列中时忽略）"""
+        for row in self.rows:
+            if row.platform == platform and row.account == account:
+                return
+        row = QueueRow(platform, account, password, store_id)
+        self.rows.append(row)
+        self.table.insertRow(self.table.rowCount())
+        self._show_row(len(self.rows) - 1)
+        self._update_summary()
+        if self._running:
+            self._dispatch()
+
+    def import_manifest(self):
+        """从 CSV / JSON 清单导入账号"""
+        path, _ = QFileDialog.getOpenFileName(self, "导入账号清单", "", "账号清单 (*.csv *.json)")
+        if not path:
+            return
+        from batch_refresh import load_manifest
+        try:
+            accounts = load_manifest(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "导入失败", str(e))
+            return
+        for account in accounts:
+            self.add_account(account['platform'], account['account'], account['password'],
+                             account['store_id'])
+
+    def start(self):
+        """按并发数开始登录等待中的账号"""
+        if not any(row.status == PENDING for row in self.rows):
+            return
+        parallelism = self.parallel_spin.value()
+        if self.pool is None or (self.pool.size != parallelism and not self._active):
+            self._shutdown_pool()
+            self.pool = BrowserPool(size=parallelism)
+            self.pool.start()
+        self._running = True
+        self.parallel_spin.setEnabled(False)
+        self.start_btn.setEnabled(False)
+        self._refresh_timer.start()
+        self._dispatch()
+
+    def _dispatch(self):
+        """在空闲槽位上启动等待中的账号"""
+        for index, row in enumerate(self.rows):
+            if len(self._active) >= self.pool.size:
+                break
+            if row.status != PENDING or row.worker is not None:
+                continue
+            worker = self.worker_factory(row.platform, row.account, row.password, row.store_id, self.pool)
+            worker.finished.connect(self._on_finished)
+            row.worker = worker
+            row.status = RUNNING
+            row.started = time.perf_counter()
+            self._active.add(worker)
+            worker.start()
+            self._show_row(index)
+        self._check_done()
+
+    def _on_finished(self, success: bool, result: str):
+        worker = self.sender()
+        self._active.discard(worker)
+        # 发出信号时线程还未退出，保留引用直到线程结束，避免 QThread 被提前销毁
+        self._finishing = [w for w in self._finishing if not w.isFinished()] + [worker]
+        for index, row in enumerate(self.rows):
+            if row.worker is not worker:
+                continue
+            row.worker = None
+            if row.status == RUNNING:
+                row.duration = time.perf_counter() - row.started
+                row.phase = self._current_phase(worker) or row.phase
+                if success:
+                    row.status = SUCCESS
+                    row.credential = result
+                    row.result = f"{len(result)} 字符，双击查看"
+                else:
+                    row.status = REJECTED if worker.rejected else FAILED
+                    row.result = result.replace('\n', ' ')
+            self._show_row(index)
+            break
+        self._update_summary()
+        if self._running:
+            self._dispatch()
+
+    def _check_done(self):
+        if self._running and not self._active and not any(row.status == PENDING for row in self.rows):
+            self._running = False
+            self._refresh_timer.stop()
+            self.parallel_spin.setEnabled(True)
+            self.start_btn.setEnabled(True)
+        self._update_summary()
+
+    def _selected_indexes(self) -> List[int]:
+        return sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+
+    def cancel_selected(self):
+        """取消选中的行：等待中的不再登录，登录中的取消登录（在引擎的检查点内结束）"""
+        for index in self._selected_indexes():
+            row = self.rows[index]
+            if row.status in (PENDING, RUNNING):
+                if row.status == RUNNING:
+                    row.duration = time.perf_counter() - row.started
+                    row.worker.cancel()
+                row.status = CANCELLED
+                self._show_row(index)
+        self._check_done()
+
+    def retry_selected(self):
+        """重试选中的失败、被拒绝或已取消的行"""
+        for index in self._selected_indexes():
+            row = self.rows[index]
+            if row.status in (FAILED, REJECTED, CANCELLED):
+                row.reset()
+                self._show_row(index)
+        if self._running:
+            self._dispatch()
+        else:
+            self.start()
+        self._update_summary()
+
+    def remove_selected(self):
+        """移除选中的行（登录中的行需先取消）"""
+        for index in reversed(self._selected_indexes()):
+            if self.rows[index].status == RUNNING:
+                continue
+            del self.rows[index]
+            self.table.removeRow(index)
+        self._check_done()
+
+    def _on_double_clicked(self, index: int, column: int):
+        row = self.rows[index]
+        if row.credential:
+            self.credential_selected.emit(row.credential)
+
+    @staticmethod
+    def _current_phase(worker) -> str:
+        """引擎最近完成的阶段"""
+        engine = worker.engine
+        if engine is None or not engine.timer.phases:
+            return ''
+        return engine.timer.phases[-1][0]
+
+    def _refresh_running(self):
+        for index, row in enumerate(self.rows):
+            if row.status == RUNNING and row.worker is not None:
+                row.phase = self._current_phase(row.worker) or row.phase
+                self._show_row(index)
+
+    def _show_row(self, index: int):
+        row = self.rows[index]
+        if row.status == RUNNING:
+            elapsed = time.perf_counter() - row.started
+        else:
+            elapsed = row.duration
+        values = (row.platform, row.account, row.store_id, row.status, row.phase,
+                  f"{elapsed:.1f}s" if elapsed is not None else '', row.result)
+        for column, value in enumerate(values):
+            item = self.table.item(index, column)
+            if item is None:
+                item = QTableWidgetItem()
+                self.table.setItem(index, column, item)
+            if item.text() != value:
+                item.setText(value)
+        status_item = self.table.item(index, COLUMNS.index("状态"))
+        status_item.setForeground(self.palette().text() if row.status not in STATUS_COLORS
+                                  else QBrush(QColor(STATUS_COLORS[row.status])))
+        self.table.item(index, COLUMNS.index("结果")).setToolTip(row.result)
+
+    def _update_summary(self):
+        counts = {}
+        for row in self.rows:
+            counts[row.status] = counts.get(row.status, 0) + 1
+        parts = [f"共 {len(self.rows)} 个"] + [
+            f"{status} {counts[status]}" for status in (PENDING, RUNNING, SUCCESS, FAILED, REJECTED, CANCELLED)
+            if counts.get(status)
+        ]
+        self.summary_label.setText("，".join(parts))
+
+    def _shutdown_pool(self) -> Optional[threading.Thread]:
+        """在后台线程关闭旧的浏览器池，避免阻塞界面，返回该线程"""
+        if self.pool is None:
+            return None
+        thread = threading.Thread(target=self.pool.shutdown, name='queue-pool-shutdown', daemon=True)
+        thread.start()
+        self.pool = None
+        return thread
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """退出程序时取消进行中的登录并关闭浏览器池，总共最多等待 timeout 秒"""
+        self._running = False
+        self._refresh_timer.stop()
+        deadline = time.monotonic() + timeout
+        for worker in self._active:
+            worker.cancel()
+        # 登录线程在下一个检查点结束并释放浏览器，之后再关闭浏览器池
+        for worker in list(self._active) + self._finishing:
+            worker.wait(max(0, int((deadline - time.monotonic()) * 1000)))
+        thread = self._shutdown_pool()
+        if thread is not None:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时刷新
+根据凭证库中每个账号最早的 Cookie 过期时间，在过期前主动刷新，
+并把登录分散到不同时间，避免大量账号同时失效、集中重新登录
+
+  计划刷新时间 = 过期时间 - 提前量 - 随机抖动（0 ~ jitter，按账号固定，重启后计划不变）
+  只有会话 Cookie 的账号按 最近验证时间（复用会话或健康扫描确认有效的时间）+ default_ttl 估算过期时间
+  从未获取过凭证的账号立即刷新
+  同一平台两次登录之间至少间隔 spacing 秒，并受平台并发上限约束
+  失败后按 15 分钟、30 分钟 …… 最长 2 小时退避重试（登录页显示错误提示的 rejected 账号同样退避重试）
+  两次刷新至少间隔 min_interval（默认 1 小时）；刷新成功但过期时间没有推后（如复用的会话、
+  有效期短于提前量的 Cookie）按失败退避，避免同一账号反复登录
+
+用法:
+  python refresh_scheduler.py accounts.csv --out credentials            # 常驻运行
+  python refresh_scheduler.py accounts.csv --out credentials --once     # 刷新当前到期的账号后退出
+  python refresh_scheduler.py accounts.csv --out credentials --dry-run  # 只打印刷新计划
+"""
+
+import sys
+import time
+import heapq
+import random
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from browser_pool import BrowserPool
+from batch_refresh import BatchRefresher, BATCH_LOGIN_DEADLINE, load_manifest, parse_limits
+from credential_sink import push_sink_from_env
+from login_metrics import metrics_recorder
+from ota_engine import PLATFORM_NAMES
+
+
+HOUR = 3600
+RETRY_BASE = 15 * 60
+RETRY_MAX = 2 * HOUR
+# 同一账号两次刷新的最小间隔（秒）
+MIN_INTERVAL = HOUR
+# 没有到期任务时的最长等待（秒），期间可响应停止
+IDLE_WAIT = 30
+
+
+class RefreshScheduler:
+    """按过期时间调度刷新（登录由 BatchRefresher.refresh_one 执行）"""
+
+    def __init__(self, refresher: BatchRefresher, accounts: List[Dict[str, str]],
+                 lead: float = 6 * HOUR, jitter: float = 2 * HOUR, default_ttl: float = 24 * HOUR,
+                 spacing: float = 10.0, min_interval: float = MIN_INTERVAL):
+        if refresher.store is None:
+            raise ValueError("定时刷新需要凭证库（不能与 --no-db 同时使用）")
+        self.refresher = refresher
+        self.accounts = accounts
+        self.lead = lead
+        self.jitter = jitter
+        self.default_ttl = default_ttl
+        self.spacing = spacing
+        self.min_interval = min_interval
+        self._stop = threading.Event()
+        self._failures: Dict[Tuple[str, str], int] = {}
+        # 账号最近一次刷新结束的时间
+        self._last_refresh: Dict[Tuple[str, str], float] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def stop(self):
+        """停止调度并取消正在进行的登录"""
+        self._stop.set()
+        self.refresher.cancel()
+
+    def effective_expiry(self, account: Dict[str, str]) -> Optional[float]:
+        """账号凭证的有效期限，没有凭证时返回 None"""
+        row = self.refresher.store.get(PLATFORM_NAMES[account['platform']], account['account'])
+        if row is None:
+            return None
+        if row['expires_at'] is not None:
+            return row['expires_at']
+        return max(row['acquired_at'], row['verified_at'] or 0) + self.default_ttl
+
+    def due_time(self, account: Dict[str, str], now: float) -> float:
+        """计划刷新时间"""
+        key = (account['platform'], account['account'])
+        failures = self._failures.get(key, 0)
+        if failures:
+            return now + min(RETRY_BASE * 2 ** (failures - 1), RETRY_MAX)
+
+        expiry = self.effective_expiry(account)
+        if expiry is None:
+            return now
+        # 抖动按账号和过期时间固定，重启调度后计划不变
+        rng = random.Random(f"{key[0]}/{key[1]}/{expiry}")
+        due = max(now, expiry - self.lead - rng.uniform(0, self.jitter))
+        last = self._last_refresh.get(key)
+        if last is not None:
+            due = max(due, last + self.min_interval)
+        return due
+
+    def record_result(self, account: Dict[str, str], status: str, previous_expiry: Optional[float],
+                      now: float) -> bool:
+        """记录一次刷新结果，返回是否算作成功
+
+        成功但过期时间没有比刷新前推后时按失败退避（重新登录也拿不到更长的有效期）。
+        """
+        key = (account['platform'], account['account'])
+        self._last_refresh[key] = now
+        ok = status == 'success'
+        if ok and previous_expiry is not None:
+            expiry = self.effective_expiry(account)
+            ok = expiry is not None and expiry > previous_expiry
+        if ok:
+            self._failures.pop(key, None)
+        else:
+            self._failures[key] = self._failures.get(key, 0) + 1
+        return ok
+
+    def plan(self, now: Optional[float] = None) -> List[Tuple[float, Dict[str, str]]]:
+        """所有账号的刷新计划，按时间排序"""
+        now = time.time() if now is None else now
+        return sorted(((self.due_time(acc, now), acc) for acc in self.accounts), key=lambda item: item[0])
+
+    def run(self, once: bool = False):
+        """执行调度；once=True 时只刷新当前已到期的账号"""
+        now = time.time()
+        queue = [(due, i, acc) for i, (due, acc) in enumerate(self.plan(now))]
+        heapq.heapify(queue)
+        if once:
+            queue = [item for item in queue if item[0] <= now]
+            heapq.heapify(queue)
+        if not queue:
+            print("没有需要刷新的账号")
+            return
+
+        workers = self.refresher.workers
+        pool = BrowserPool(size=workers, headless=self.refresher.headless)
+        pool.start()
+        lock = threading.Lock()
+        pending = [0]
+        counter = [len(self.accounts)]
+
+        def done(account, previous_expiry, future):
+            row = future.result()
+            with lock:
+                pending[0] -= 1
+                ok = self.record_result(account, row['status'], previous_expiry, time.time())
+                if row['status'] == 'success' and not ok:
+                    row['error'] = "过期时间没有推后，按失败退避"
+                due = None
+                # 取消的账号不再调度；rejected 的错误提示可能是验证码等临时问题，按失败退避重试
+                if not once and row['status'] != 'cancelled':
+                    due = self.due_time(account, time.time())
+                    counter[0] += 1
+                    heapq.heappush(queue, (due, counter[0], account))
+            print(f"{format_time(time.time())} {row['platform']} {row['account']}: "
+                  f"{row['status']} ({row['duration']}s) {row['error']}"
+                  + (f" 下次刷新 {format_time(due)}" if due else ""))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while not self._stop.is_set():
+                    with lock:
+                        if not queue and pending[0] == 0:
+                            break
+                        now = time.time()
+                        wait = IDLE_WAIT
+                        while queue and queue[0][0] <= now:
+                            due, seq, account = heapq.heappop(queue)
+                            platform = account['platform']
+                            # 同一平台的登录之间保持间隔
+                            start_at = self._next_start.get(platform, 0)
+                            if start_at > now:
+                                heapq.heappush(queue, (start_at, seq, account))
+                                continue
+                            self._next_start[platform] = now + self.spacing
+                            pending[0] += 1
+                            previous_expiry = self.effective_expiry(account)
+                            future = executor.submit(self.refresher.refresh_one, pool, account)
+                            future.add_done_callback(
+                                lambda f, acc=account, prev=previous_expiry: done(acc, prev, f))
+                        if queue:
+                            wait = min(wait, max(0.0, queue[0][0] - now))
+                    try:
+                        self._stop.wait(wait if queue else min(wait, 1.0))
+                    except KeyboardInterrupt:
+                        # 退出线程池前取消进行中的登录，不必等它们执行完
+                        self.stop()
+                        raise
+        finally:
+            pool.shutdown()
+
+
+def format_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def run_scheduler(manifest: str, out: str, workers: int = 2, limits: Optional[List[str]] = None,
+                  lead_hours: float = 6, jitter_hours: float = 2, spacing: float = 10,
+                  once: bool = False, dry_run: bool = False, headless: bool = True,
+                  push: Optional[str] = None, metrics_port: Optional[int] = None,
+                  deadline: float = BATCH_LOGIN_DEADLINE) -> int:
+    """读取清单并调度刷新，返回退出码（参数无效时抛出 OSError / ValueError）"""
+    accounts = load_manifest(manifest)
+    limits = parse_limits(limits or [])
+    sink = None if dry_run else push_sink_from_env(Path(out) / 'outbox', push)
+    metrics = None if dry_run else metrics_recorder(Path(out) / 'metrics', metrics_port)
+    refresher = BatchRefresher(out, workers=workers, platform_limits=limits, headless=headless,
+                               sink=sink, metrics=metrics, deadline=deadline)
+    try:
+        scheduler = RefreshScheduler(refresher, accounts, lead=lead_hours * HOUR,
+                                     jitter=jitter_hours * HOUR, spacing=spacing)
+        if dry_run:
+            for due, account in scheduler.plan():
+                expiry = scheduler.effective_expiry(account)
+                print(f"{format_time(due)}  {PLATFORM_NAMES[account['platform']]}\t{account['account']}\t"
+                      f"过期 {format_time(expiry) if expiry else '-'}")
+            return 0
+        try:
+            scheduler.run(once=once)
+        except KeyboardInterrupt:
+            print("已停止")
+        return 0
+    finally:
+        refresher.close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py schedule 子命令共用）"""
+    parser.add_argument('manifest', help="账号清单（.csv 或 .json）")
+    parser.add_argument('--out', default='credentials', help="凭证输出目录（凭证库为 <out>/credentials.db）")
+    parser.add_argument('--workers', type=int, default=2, help="总并发数（浏览器数量）")
+    parser.add_argument('--limit', action='append', default=[],
+                        help="平台并发上限，如 meituan=1，可重复")
+    parser.add_argument('--lead', type=float, default=6, help="提前多少小时刷新")
+    parser.add_argument('--jitter', type=float, default=2, help="随机提前的最大小时数")
+    parser.add_argument('--spacing', type=float, default=10, help="同一平台两次登录的最小间隔（秒）")
+    parser.add_argument('--once', action='store_true', help="只刷新当前到期的账号后退出（适合 cron）")
+    parser.add_argument('--dry-run', action='store_true', help="只打印刷新计划")
+    parser.add_argument('--headed', action='store_true', help="显示浏览器窗口")
+    parser.add_argument('--push', metavar='URL',
+                        help="推送到账号状态接口（默认读取环境变量 OTA_PUSH_ENDPOINT，未设置时不推送）")
+    parser.add_argument('--metrics-port', type=int, help="在该端口提供 Prometheus /metrics")
+    parser.add_argument('--deadline', type=float, default=BATCH_LOGIN_DEADLINE,
+                        help=f"每个账号的登录期限（秒，默认 {BATCH_LOGIN_DEADLINE}）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按凭证过期时间定时刷新")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(run_scheduler(args.manifest, args.out, workers=args.workers, limits=args.limit,
+                               lead_hours=args.lead, jitter_hours=args.jitter, spacing=args.spacing,
+                               once=args.once, dry_run=args.dry_run, headless=not args.headed,
+                               push=args.push, metrics_port=args.metrics_port, deadline=args.deadline))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录时的资源拦截
+登录只需要页面脚本、表单和接口请求，图片、字体、音视频和统计埋点都不需要下载。
+按平台配置拦截规则，在浏览器上下文上注册路由：
+  - 资源类型在 block_types 中的请求直接中止
+  - URL 命中 stub_patterns 的请求（统计、广告脚本）返回空响应，避免页面脚本报错
+  - URL 命中 allow_patterns 的请求（验证码等）始终放行
+
+路由只匹配静态资源扩展名和埋点域名，其余请求不经过 Python；统计也只记录经过路由的请求，
+不监听每个响应。
+"""
+
+import re
+import threading
+from typing import List
+
+
+# 静态资源扩展名（图片、字体、音视频）
+ASSET_PATTERN = r"\.(png|jpe?g|gif|webp|avif|svg|ico|bmp|woff2?|ttf|otf|eot|mp4|webm|mp3|m4a|ogg)(\?|#|$)"
+
+# 各平台通用的统计、埋点、广告域名
+COMMON_STUB_PATTERNS = [
+    r"google-analytics\.com", r"googletagmanager\.com", r"hm\.baidu\.com",
+    r"cnzz\.com", r"growingio\.com", r"sentry\.io", r"doubleclick\.net",
+]
+
+# 验证码等登录必需的资源（优先于拦截规则）
+COMMON_ALLOW_PATTERNS = [r"captcha", r"verify", r"slide", r"nc\.js", r"nocaptcha"]
+
+RESOURCE_POLICIES = {
+    "美团": {
+        "enabled": True,
+        "block_types": ["image", "media", "font"],
+        "stub_patterns": COMMON_STUB_PATTERNS + [r"lx\.meituan\.net", r"report\.meituan\.com",
+                                                 r"catfront\.dianping\.com"],
+        "allow_patterns": COMMON_ALLOW_PATTERNS + [r"verify\.meituan\.com"],
+    },
+    "飞猪": {
+        "enabled": True,
+        "block_types": ["image", "media", "font"],
+        "stub_patterns": COMMON_STUB_PATTERNS + [r"mmstat\.com", r"arms-retcode", r"aplus"],
+        "allow_patterns": COMMON_ALLOW_PATTERNS + [r"/sd/nch5/", r"/AWSC/"],
+    },
+    "携程": {
+        "enabled": True,
+        "block_types": ["image", "media", "font"],
+        "stub_patterns": COMMON_STUB_PATTERNS + [r"ubt\.ctrip\.com", r"/ubt/", r"bfa\.js"],
+        "allow_patterns": COMMON_ALLOW_PATTERNS + [r"/captcha/"],
+    },
+}
+
+# 返回空响应时按资源类型设置的 Content-Type
+STUB_CONTENT_TYPES = {"script": "application/javascript", "stylesheet": "text/css"}
+
+
+class ResourceStats:
+    """一次登录中经过路由的请求统计（线程安全，可在同步和异步引擎中共用）"""
+
+    def __init__(self):
+        self.routed = 0
+        self.allowed = 0
+        self.blocked = 0
+        self.stubbed = 0
+        self._lock = threading.Lock()
+
+    def add(self, action: str):
+        with self._lock:
+            self.routed += 1
+            if action == 'block':
+                self.blocked += 1
+            elif action == 'stub':
+                self.stubbed += 1
+            else:
+                self.allowed += 1
+
+    def as_dict(self) -> dict:
+        return {'routed': self.routed, 'allowed': self.allowed,
+                'blocked': self.blocked, 'stubbed': self.stubbed}
+
+    def report(self) -> str:
+        return (f"经过路由 {self.routed} 个：拦截 {self.blocked} 个，空响应 {self.stubbed} 个，"
+                f"放行 {self.allowed} 个")
+
+
+class ResourcePolicy:
+    """单个平台的资源拦截规则"""
+
+    def __init__(self, block_types: List[str], stub_patterns: List[str], allow_patterns: List[str]):
+        self.block_types = set(block_types)
+        self.stub_re = re.compile('|'.join(stub_patterns)) if stub_patterns else None
+        self.allow_re = re.compile('|'.join(allow_patterns), re.IGNORECASE) if allow_patterns else None
+        # 只拦截可能需要处理的请求：静态资源扩展名 + 埋点域名
+        self.route_re = re.compile('|'.join([ASSET_PATTERN] + list(stub_patterns)), re.IGNORECASE)
+        self.stats = ResourceStats()
+
+    def decide(self, url: str, resource_type: str) -> str:
+        """返回 'allow'、'block' 或 'stub'"""
+        if self.allow_re is not None and self.allow_re.search(url):
+            return 'allow'
+        if self.stub_re is not None and self.stub_re.search(url):
+            return 'stub' if resource_type in ('script', 'stylesheet', 'xhr', 'fetch', 'ping') else 'block'
+        if resource_type in self.block_types:
+            return 'block'
+        return 'allow'
+
+    def install(self, context):
+        """注册到 sync_api 的 BrowserContext"""
+        def handle(route):
+            request = route.request
+            action = self.decide(request.url, request.resource_type)
+            self.stats.add(action)
+            if action == 'block':
+                route.abort('blockedbyclient')
+            elif action == 'stub':
+                route.fulfill(status=200, body='',
+                              content_type=STUB_CONTENT_TYPES.get(request.resource_type, 'text/plain'))
+            else:
+                # 交给之前注册的路由（如测试用的模拟服务），没有时正常请求
+                route.fallback()
+
+        context.route(self.route_re, handle)
+
+    async def install_async(self, context):
+        """注册到 async_api 的 BrowserContext"""
+        async def handle(route):
+            request = route.request
+            action = self.decide(request.url, request.resource_type)
+            self.stats.add(action)
+            if action == 'block':
+                await route.abort('blockedbyclient')
+            elif action == 'stub':
+                await route.fulfill(status=200, body='',
+                                    content_type=STUB_CONTENT_TYPES.get(request.resource_type, 'text/plain'))
+            else:
+                await route.fallback()
+
+        await context.route(self.route_re, handle)
+
+
+def policy_for(platform: str):
+    """按平台配置创建拦截规则，平台未启用时返回 None"""
+    config = RESOURCE_POLICIES.get(platform)
+    if not config or not config.get('enabled'):
+        return None
+    return ResourcePolicy(config['block_types'], config['stub_patterns'], config['allow_patterns'])
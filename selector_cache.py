@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选择器解析
+同时等待所有候选选择器，返回最先可见的一个，并记住每个平台命中的选择器
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from playwright.sync_api import Page, Error
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from app_paths import app_data_dir
+
+
+class SelectorCache:
+    """选择器命中缓存：{平台: {字段: 选择器}}，保存在用户数据目录"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._data: Optional[Dict[str, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if self._data is None:
+            if self.path is None:
+                self.path = app_data_dir() / 'selector_cache.json'
+            try:
+                self._data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def order(self, platform: str, field: str, candidates: List[str]) -> List[str]:
+        """上次命中的选择器排在最前面"""
+        with self._lock:
+            winner = self._load().get(platform, {}).get(field)
+        if winner in candidates:
+            return [winner] + [c for c in candidates if c != winner]
+        return list(candidates)
+
+    def remember(self, platform: str, field: str, selector: str):
+        """记录命中的选择器（有变化时才写盘）"""
+        with self._lock:
+            data = self._load()
+            if data.get(platform, {}).get(field) == selector:
+                return
+            data.setdefault(platform, {})[field] = selector
+            try:
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+                tmp_path.replace(self.path)
+            except OSError as e:
+                print(f"保存选择器缓存失败: {e}")
+
+
+# 全局缓存实例
+selector_cache = SelectorCache()
+
+
+def resolve_selector(page: Page, candidates: List[str], platform: str, field: str,
+                     timeout: Optional[int] = None, cache: SelectorCache = selector_cache) -> Optional[str]:
+    """同时等待所有候选选择器，返回第一个命中的选择器，都未出现时返回 None
+
+    timeout（毫秒）由调用方传入当前阶段剩余的预算，为 None 时使用上下文的默认超时。
+    返回的选择器带有 visible=true 过滤，后续 fill/click 会作用在可见元素上。
+    """
+    ordered = cache.order(platform, field, candidates)
+
+    # 合并为一个 locator，任一候选出现可见元素即返回
+    try:
+        any_visible(page, ordered).wait_for(state="visible", timeout=timeout)
+    except PlaywrightTimeoutError:
+        return None
+
+    # 按优先级确定命中的是哪一个（不再等待，只做即时检查）
+    for selector in ordered:
+        try:
+            if page.locator(_visible(selector)).count() > 0:
+                cache.remember(platform, field, selector)
+                return _visible(selector)
+        except Error:
+            continue
+    return None
+
+
+def _visible(selector: str) -> str:
+    """只匹配可见元素"""
+    return f"{selector} >> visible=true"
+
+
+def any_visible(page, candidates: List[str]):
+    """匹配任一候选选择器的第一个可见元素（同步和异步 Page 通用）"""
+    combined = page.locator(_visible(candidates[0]))
+    for selector in candidates[1:]:
+        combined = combined.or_(page.locator(_visible(selector)))
+    return combined.first
+
+
+async def resolve_selector_async(page, candidates: List[str], platform: str, field: str,
+                                 timeout: Optional[int] = None,
+                                 cache: SelectorCache = selector_cache) -> Optional[str]:
+    """resolve_selector 的异步版本（用于 playwright.async_api 的 Page）"""
+    ordered = cache.order(platform, field, candidates)
+
+    try:
+        await any_visible(page, ordered).wait_for(state="visible", timeout=timeout)
+    except PlaywrightTimeoutError:
+        return None
+
+    for selector in ordered:
+        try:
+            if await page.locator(_visible(selector)).count() > 0:
+                cache.remember(platform, field, selector)
+                return _visible(selector)
+        except Error:
+            continue
+    return None
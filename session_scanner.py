@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话健康扫描
+不启动浏览器，直接用已保存凭证（storage_state）中的 Cookie 请求各平台后台首页，
+判断凭证是否仍然有效
+
+平台按凭证所在目录名（meituan/fliggy/ctrip，与批量刷新的输出目录一致）识别，
+识别不到时按 Cookie 域名判断。
+
+用法:
+  python session_scanner.py credentials --workers 64 --report scan.csv
+  python session_scanner.py credentials --url meituan=http://127.0.0.1:8000/ebooking/   # 指向本地替身服务
+  python session_scanner.py credentials --db credentials/credentials.db   # 有效的凭证同时更新凭证库的验证时间
+"""
+
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+import http.client
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from ota_platforms import (
+    PLATFORM_CODES, PLATFORM_NAMES, BACKEND_URLS, SESSION_PROBE_TIMEOUT, CONTEXT_OPTIONS,
+    normalize_platform, is_login_success_url, load_storage_state
+)
+
+
+REPORT_FIELDS = ['platform', 'account', 'status', 'http_status', 'url', 'duration', 'file', 'error']
+
+# 按 Cookie 域名识别平台
+PLATFORM_COOKIE_DOMAINS = {
+    "美团": ("meituan.com",),
+    "飞猪": ("fliggy.com", "taobao.com", "alibaba.com"),
+    "携程": ("ctrip.com",),
+}
+
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 5
+
+# 输出目录下不是凭证的子目录（推送发件箱、失败现场、历史记录、登录指标），扫描目录时跳过
+SKIP_DIRS = {'outbox', 'failures', 'history', 'metrics'}
+
+
+def detect_platform(path: Path, state: dict) -> Optional[str]:
+    """识别凭证所属平台（中文名）"""
+    if path.parent.name in PLATFORM_CODES:
+        return PLATFORM_CODES[path.parent.name]
+    for name, domains in PLATFORM_COOKIE_DOMAINS.items():
+        for cookie in state.get('cookies', []):
+            domain = cookie.get('domain', '').lstrip('.')
+            if any(domain == d or domain.endswith('.' + d) for d in domains):
+                return name
+    return None
+
+
+def cookie_header(cookies: List[dict], url: str, now: Optional[float] = None) -> str:
+    """按域名、路径、secure 和过期时间筛选出请求 url 时浏览器会携带的 Cookie"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    path = parts.path or '/'
+    now = time.time() if now is None else now
+
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get('domain', '').lower()
+        if domain.startswith('.'):
+            if host != domain[1:] and not host.endswith(domain):
+                continue
+        elif host != domain:
+            continue
+        cookie_path = cookie.get('path') or '/'
+        if not (path == cookie_path or path.startswith(cookie_path.rstrip('/') + '/')):
+            continue
+        if cookie.get('secure') and parts.scheme != 'https':
+            continue
+        expires = cookie.get('expires', -1)
+        if expires is not None and 0 < expires < now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return '; '.join(pairs)
+
+
+class PooledHTTPClient:
+    """线程安全的 HTTP 客户端：每个线程对每个主机保持一条长连接，重复请求不再握手"""
+
+    def __init__(self, timeout: float = SESSION_PROBE_TIMEOUT / 1000):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 所有线程当前使用的连接（关闭或替换后移除），close() 时统一关闭
+        self._all: Set[http.client.HTTPConnection] = set()
+
+    def _connection(self, scheme: str, netloc: str, fresh: bool = False) -> http.client.HTTPConnection:
+        """取当前线程到该主机的连接，没有或 fresh=True 时新建"""
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        key = (scheme, netloc)
+        conn = conns.get(key)
+        if conn is None or fresh:
+            if conn is not None:
+                self._discard(key)
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = cls(netloc, timeout=self.timeout)
+            conns[key] = conn
+            with self._lock:
+                self._all.add(conn)
+        return conn
+
+    def _discard(self, key: Tuple[str, str]):
+        """关闭并移除当前线程到该主机的连接"""
+        conn = self._local.conns.pop(key, None)
+        if conn is None:
+            return
+        conn.close()
+        with self._lock:
+            self._all.discard(conn)
+
+    def get(self, url: str, headers: Dict[str, str]):
+        """发送 GET 请求，返回 (状态码, 响应头)；响应体读完后丢弃以便复用连接"""
+        parts = urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        for attempt in range(2):
+            # 长连接可能已被服务端关闭，失败时换新连接重试一次
+            conn = self._connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status, response.headers
+            except (http.client.HTTPException, ConnectionError):
+                if attempt:
+                    self._discard((parts.scheme, parts.netloc))
+                    raise
+            except OSError:
+                # 超时等错误后连接状态未知，不再复用
+                self._discard((parts.scheme, parts.netloc))
+                raise
+        raise http.client.HTTPException("unreachable")
+
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+class SessionScanner:
+    """批量检查凭证是否仍然有效（不启动浏览器）
+
+    backend_urls 可覆盖各平台的探测地址（如指向本地替身服务），
+    Cookie 仍按平台真实后台地址筛选。
+    传入 store（credential_store.CredentialStore）时，有效的凭证按文件名记录验证时间。
+    """
+
+    def __init__(self, workers: int = 32, backend_urls: Optional[Dict[str, str]] = None,
+                 timeout: float = SESSION_PROBE_TIMEOUT / 1000, store=None):
+        self.workers = workers
+        self.backend_urls = dict(BACKEND_URLS, **(backend_urls or {}))
+        self.client = PooledHTTPClient(timeout=timeout)
+        self.store = store
+
+    def scan(self, paths: List[Path]) -> List[Dict[str, str]]:
+        """扫描多个凭证文件，按输入顺序返回结果"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(self.check_file, paths))
+        finally:
+            self.client.close()
+
+    def check_file(self, path: Path) -> Dict[str, str]:
+        """检查单个凭证文件"""
+        row = {
+            'platform': '',
+            'account': path.stem,
+            'status': 'error',
+            'http_status': '',
+            'url': '',
+            'duration': '',
+            'file': str(path),
+            'error': '',
+        }
+        start = time.perf_counter()
+        try:
+            state = load_storage_state(path.read_text(encoding='utf-8'))
+            if state is None:
+                raise Exception("不是有效的凭证文件")
+            platform = detect_platform(path, state)
+            if platform is None:
+                raise Exception("无法识别平台")
+            row['platform'] = PLATFORM_NAMES[platform]
+            alive, status, url = self.check_state(platform, state)
+            row['status'] = 'alive' if alive else 'expired'
+            row['http_status'] = str(status)
+            row['url'] = url
+            if alive and self.store is not None:
+                self.store.mark_verified_by_name(row['platform'], path.stem)
+        except Exception as e:
+            row['error'] = str(e)
+        row['duration'] = f"{time.perf_counter() - start:.3f}"
+        return row
+
+    def check_state(self, platform: str, state: dict):
+        """请求后台首页并跟随重定向，返回 (是否有效, 最终状态码, 最终 URL)
+
+        与登录后的最终验证一致：停留在后台地址或被重定向到后台页面视为有效，
+        被重定向到登录页视为失效。
+        """
+        url = self.backend_urls[platform]
+        cookies = state.get('cookies', [])
+        status = 0
+        for _ in range(MAX_REDIRECTS + 1):
+            # 每一跳按该跳的地址重新筛选 Cookie，跨主机跳转不会带上原主机的 Cookie
+            headers = {
+                'User-Agent': CONTEXT_OPTIONS['user_agent'],
+                'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8',
+                'Accept-Language': 'zh-CN,zh;q=0.9',
+            }
+            cookie = cookie_header(cookies, self._cookie_url(platform, url))
+            if cookie:
+                headers['Cookie'] = cookie
+            status, response_headers = self.client.get(url, headers)
+            location = response_headers.get('Location')
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            break
+        redirected = url != self.backend_urls[platform]
+        alive = 200 <= status < 300 and (not redirected or is_login_success_url(platform, url))
+        return alive, status, url
+
+    def _cookie_url(self, platform: str, url: str) -> str:
+        """筛选 Cookie 用的地址：探测地址被覆盖时，覆盖主机上的地址换成平台真实主机上的同一路径"""
+        probe = urlsplit(self.backend_urls[platform])
+        real = urlsplit(BACKEND_URLS[platform])
+        parts = urlsplit(url)
+        if (parts.scheme, parts.netloc) == (probe.scheme, probe.netloc):
+            return urlunsplit((real.scheme, real.netloc, parts.path, parts.query, ''))
+        return url
+
+
+def find_credentials(inputs: List[str]) -> List[Path]:
+    """展开输入的文件和目录（目录下递归查找 *.json，跳过 SKIP_DIRS 和以 . 开头的目录）"""
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.rglob('*.json') if not _skipped(p.relative_to(path))))
+        else:
+            paths.append(path)
+    return paths
+
+
+def _skipped(relative: Path) -> bool:
+    return any(part in SKIP_DIRS or part.startswith('.') for part in relative.parts[:-1])
+
+
+def parse_urls(values: List[str]) -> Dict[str, str]:
+    """解析 --url meituan=http://... 形式的探测地址覆盖"""
+    urls = {}
+    for value in values:
+        code, _, url = value.partition('=')
+        if not url:
+            raise ValueError(f"无效的探测地址: {value}")
+        urls[normalize_platform(code)] = url
+    return urls
+
+
+def write_report(path: str, rows: List[Dict[str, str]]):
+    """写出扫描结果 CSV"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_scan(inputs: List[str], workers: int = 32, urls: Optional[List[str]] = None,
+             report: Optional[str] = None, as_json: bool = False, db: Optional[str] = None) -> int:
+    """扫描并输出结果，返回退出码（0 全部有效，2 存在失效或错误）"""
+    store = None
+    if db is not None:
+        from credential_store import CredentialStore
+        store = CredentialStore(db)
+    scanner = SessionScanner(workers=workers, backend_urls=parse_urls(urls or []), store=store)
+    paths = find_credentials(inputs)
+    start = time.perf_counter()
+    try:
+        rows = scanner.scan(paths)
+    finally:
+        if store is not None:
+            store.close()
+
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        for row in rows:
+            if row['status'] != 'alive':
+                print(f"{row['platform'] or '-'} {row['account']}: {row['status']} "
+                      f"{row['http_status']} {row['url']} {row['error']}")
+    if report:
+        write_report(report, rows)
+
+    alive = sum(1 for r in rows if r['status'] == 'alive')
+    expired = sum(1 for r in rows if r['status'] == 'expired')
+    print(f"扫描完成: 共 {len(rows)}，有效 {alive}，失效 {expired}，错误 {len(rows) - alive - expired}，"
+          f"耗时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0 if alive == len(rows) else 2
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """命令行参数（单独运行和 ota_cred.py scan 子命令共用）"""
+    parser.add_argument('inputs', nargs='+', help="凭证文件或目录（目录下递归查找 *.json）")
+    parser.add_argument('--workers', type=int, default=32, help="并发请求数")
+    parser.add_argument('--url', action='append', default=[],
+                        help="覆盖平台探测地址，如 meituan=http://127.0.0.1:8000/ebooking/，可重复")
+    parser.add_argument('--report', help="扫描结果 CSV 输出路径")
+    parser.add_argument('--json', dest='as_json', action='store_true', help="以 JSON 输出全部结果")
+    parser.add_argument('--db', help="凭证库路径，有效的凭证同时记录验证时间")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="检查已保存凭证是否仍然有效（不启动浏览器）")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(run_scan(args.inputs, workers=args.workers, urls=args.url,
+                          report=args.report, as_json=args.as_json, db=args.db))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
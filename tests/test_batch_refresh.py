@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""批量刷新：清单解析和平台并发上限"""
+
+import json
+
+import pytest
+
+from batch_refresh import load_manifest, parse_limits
+
+
+def test_load_csv_manifest(tmp_path):
+    path = tmp_path / 'accounts.csv'
+    # Excel 另存的 CSV 带 BOM
+    path.write_text("platform,account,password,store_id\nmeituan, user1 ,pw1,1001\n飞猪,user2,pw2,\n",
+                    encoding='utf-8-sig')
+    assert load_manifest(str(path)) == [
+        {'platform': '美团', 'account': 'user1', 'password': 'pw1', 'store_id': '1001'},
+        {'platform': '飞猪', 'account': 'user2', 'password': 'pw2', 'store_id': ''},
+    ]
+
+
+def test_load_json_manifest(tmp_path):
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps([{'platform': 'ctrip', 'account': 'user', 'password': 'pw', 'store_id': 7}]),
+                    encoding='utf-8')
+    assert load_manifest(str(path)) == [{'platform': '携程', 'account': 'user', 'password': 'pw', 'store_id': '7'}]
+
+
+@pytest.mark.parametrize('rows, message', [
+    ([{'platform': 'meituan', 'account': 'a', 'password': 'p'}, ['ctrip', 'b', 'p']], "第 2 条"),
+    ([{'platform': 'meituan', 'account': 'a', 'password': 'p'}, "ctrip,b,p"], "第 2 条"),
+    ({'platform': 'meituan', 'account': 'a', 'password': 'p'}, "数组"),
+    ([{'platform': 'qunar', 'account': 'a', 'password': 'p'}], "第 1 条: 不支持的平台"),
+    ([{'platform': 'meituan', 'account': 'a', 'password': ' '}], "第 1 条: 缺少账号或密码"),
+])
+def test_invalid_json_manifest(tmp_path, rows, message):
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps(rows), encoding='utf-8')
+    with pytest.raises(ValueError, match=message):
+        load_manifest(str(path))
+
+
+def test_parse_limits():
+    assert parse_limits([]) == {}
+    assert parse_limits(['meituan=2', '携程=1', 'FLIGGY=3']) == {'美团': 2, '携程': 1, '飞猪': 3}
+    for value in ('meituan', 'meituan=0', 'meituan=-1', 'meituan=x', 'qunar=1'):
+        with pytest.raises(ValueError):
+            parse_limits([value])
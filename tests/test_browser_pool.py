@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""浏览器进程池：驱动启动失败时任务直接失败，达到使用次数上限后立即启动新浏览器"""
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def test_driver_failure_fails_pending_and_future_jobs(monkeypatch):
+    def broken():
+        raise RuntimeError("驱动启动失败")
+
+    monkeypatch.setattr('playwright.sync_api.sync_playwright', broken)
+    pool = BrowserPool(size=2)
+    pending = pool.submit(lambda browser: 'ok')
+    assert not pool.wait_ready(timeout=5)
+    with pytest.raises(RuntimeError, match="驱动启动失败"):
+        pending.result(timeout=5)
+    with pytest.raises(RuntimeError, match="驱动启动失败"):
+        pool.run(lambda browser: 'ok', timeout=5)
+    pool.shutdown()
+
+
+def test_recycled_browser_is_relaunched(monkeypatch):
+    launched = []
+
+    def launch(p, headless=False):
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    monkeypatch.setattr('playwright.sync_api.sync_playwright', FakePlaywright)
+    monkeypatch.setattr(browser_pool, 'launch_browser', launch)
+    pool = BrowserPool(size=1, max_uses=1)
+    pool.start()
+    assert pool.wait_ready(timeout=5)
+    assert pool.run(lambda browser: browser, timeout=5) is launched[0]
+    assert pool.run(lambda browser: browser, timeout=5) is launched[1]
+    pool.shutdown()
+    assert len(launched) == 3
+    assert all(browser.closed for browser in launched)
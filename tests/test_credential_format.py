@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""凭证格式：三种输出格式都能还原，按平台裁剪无关 Cookie，损坏的压缩凭证抛出 ValueError"""
+
+import gzip
+import json
+import base64
+
+import pytest
+
+from credential_format import (
+    CREDENTIAL_FORMATS, GZIP_ENCODING, build_credential, decode_credential, earliest_expiry,
+    encode_credential, prune_storage_state
+)
+
+
+def cookie(name, domain, expires=-1):
+    return {'name': name, 'value': 'v', 'domain': domain, 'path': '/', 'expires': expires}
+
+
+STATE = {
+    'cookies': [
+        cookie('token', '.meituan.com', expires=2000.0),
+        cookie('uid', 'me.meituan.com', expires=1000.0),
+        cookie('_lxsdk_cuid', '.meituan.com'),
+        cookie('Hm_lvt_abc', '.meituan.com'),
+        cookie('token', '.notmeituan.com'),
+        cookie('_ga', '.google.com'),
+    ],
+    'origins': [
+        {'origin': 'https://me.meituan.com', 'localStorage': [{'name': '账号', 'value': '门店'}]},
+        {'origin': 'https://empty.meituan.com', 'localStorage': []},
+        {'origin': 'https://www.baidu.com', 'localStorage': [{'name': 'k', 'value': 'v'}]},
+    ],
+}
+
+
+def envelope(data) -> str:
+    return json.dumps({'encoding': GZIP_ENCODING, 'data': data})
+
+
+def test_formats_round_trip():
+    for fmt in CREDENTIAL_FORMATS:
+        assert decode_credential(encode_credential(STATE, fmt)) == STATE
+    compressed = json.loads(encode_credential(STATE, 'gzip'))
+    assert compressed['encoding'] == GZIP_ENCODING
+    # mtime 固定为 0，同样的凭证压缩结果相同
+    assert encode_credential(STATE, 'gzip') == encode_credential(STATE, 'gzip')
+    with pytest.raises(ValueError):
+        encode_credential(STATE, 'xml')
+
+
+def test_prune_keeps_platform_cookies_and_origins():
+    pruned = prune_storage_state("美团", STATE)
+    assert [(c['name'], c['domain']) for c in pruned['cookies']] == [
+        ('token', '.meituan.com'), ('uid', 'me.meituan.com')]
+    assert [o['origin'] for o in pruned['origins']] == ['https://me.meituan.com']
+    assert prune_storage_state("未知平台", STATE) is STATE
+    assert earliest_expiry(pruned) == 1000.0
+    assert earliest_expiry({'cookies': [cookie('sid', '.meituan.com')]}) is None
+
+
+def test_build_credential_reports_sizes():
+    credential, stats = build_credential(STATE, "美团", fmt='gzip')
+    assert decode_credential(credential) == prune_storage_state("美团", STATE)
+    assert (stats['cookies_before'], stats['cookies_after']) == (6, 2)
+    assert (stats['origins_before'], stats['origins_after']) == (3, 1)
+    assert stats['bytes_after'] < stats['bytes_before']
+
+
+@pytest.mark.parametrize('credential', [
+    json.dumps({'encoding': GZIP_ENCODING}),
+    envelope(123),
+    envelope('not base64 ***'),
+    envelope(base64.b64encode(b'not gzip').decode('ascii')),
+    envelope(base64.b64encode(gzip.compress(b'{broken')).decode('ascii')),
+    envelope(base64.b64encode(gzip.compress(b'[1, 2]')).decode('ascii')),
+    '[]',
+    'not json',
+])
+def test_malformed_credentials_are_rejected(credential):
+    with pytest.raises(ValueError):
+        decode_credential(credential)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""凭证历史：增量写入后按版本和时间还原的凭证与原凭证一致"""
+
+import json
+
+from credential_history import CredentialHistory, state_delta, apply_delta, delta_is_empty
+
+
+def cookie(name, value, domain='.meituan.com'):
+    return {'name': name, 'value': value, 'domain': domain, 'path': '/', 'expires': -1}
+
+
+def state(cookies, storage=None):
+    return {'cookies': cookies,
+            'origins': [{'origin': origin, 'localStorage': [{'name': k, 'value': v} for k, v in items.items()]}
+                        for origin, items in (storage or {}).items()]}
+
+
+def normalized(value):
+    """忽略 Cookie 和 localStorage 的顺序"""
+    return (sorted(json.dumps(c, sort_keys=True) for c in value['cookies']),
+            sorted((o['origin'], i['name'], i['value']) for o in value['origins'] for i in o['localStorage']))
+
+
+VERSIONS = [
+    state([cookie('token', 'a'), cookie('uid', '1')], {'https://me.meituan.com': {'t': 'x'}}),
+    state([cookie('token', 'b'), cookie('uid', '1')], {'https://me.meituan.com': {'t': 'x', 'u': 'y'}}),
+    state([cookie('token', 'b'), cookie('sid', '9')], {'https://me.meituan.com': {'u': 'z'}}),
+    state([cookie('token', 'c'), cookie('sid', '9')], {}),
+    state([cookie('token', 'd')], {'https://hotel.fliggy.com': {'k': 'v'}}),
+]
+
+
+def test_delta_round_trip():
+    for old, new in zip(VERSIONS, VERSIONS[1:]):
+        delta = state_delta(old, new)
+        assert not delta_is_empty(delta)
+        assert normalized(apply_delta(old, delta)) == normalized(new)
+    assert delta_is_empty(state_delta(VERSIONS[0], VERSIONS[0]))
+
+
+def test_history_restores_every_version(tmp_path):
+    history = CredentialHistory(tmp_path, keyframe_interval=2)
+    for index, version in enumerate(VERSIONS):
+        assert history.record('meituan', 'store001', json.dumps(version), ts=1000.0 + index) is not None
+    # 与最新版本相同时不记录
+    assert history.record('meituan', 'store001', VERSIONS[-1], ts=2000.0) is None
+
+    lines = [json.loads(line) for line in (tmp_path / 'meituan' / 'store001.jsonl').read_text().splitlines()]
+    assert ['full' in line for line in lines] == [True, False, True, False, True]
+
+    # 新实例从文件读取，不依赖写入时的缓存
+    history = CredentialHistory(tmp_path, keyframe_interval=2)
+    assert normalized(history.latest('meituan', 'store001')) == normalized(VERSIONS[-1])
+    for index, version in enumerate(VERSIONS):
+        assert normalized(history.as_of('meituan', 'store001', 1000.5 + index)) == normalized(version)
+    assert history.as_of('meituan', 'store001', 999.0) is None
+
+
+def test_changes_replay_to_latest(tmp_path):
+    history = CredentialHistory(tmp_path, keyframe_interval=3)
+    for index, version in enumerate(VERSIONS):
+        history.record('meituan', 'store001', version, ts=1000.0 + index)
+
+    replayed = {'cookies': [], 'origins': []}
+    changes = history.changes('meituan', 'store001')
+    assert [c['v'] for c in changes] == [1, 2, 3, 4, 5]
+    for change in changes:
+        replayed = apply_delta(replayed, change['delta'])
+    assert normalized(replayed) == normalized(VERSIONS[-1])
+    assert [c['v'] for c in history.changes('meituan', 'store001', since=1001.0, until=1003.0)] == [2, 3, 4]
+
+
+def test_history_keeps_latest_versions(tmp_path):
+    history = CredentialHistory(tmp_path, keyframe_interval=2, max_versions=3)
+    for index, version in enumerate(VERSIONS):
+        history.record('meituan', 'store001', version, ts=1000.0 + index)
+    history.record('meituan', 'store001', VERSIONS[0], ts=1005.0)
+
+    lines = [json.loads(line) for line in (tmp_path / 'meituan' / 'store001.jsonl').read_text().splitlines()]
+    assert [line['v'] for line in lines] == [4, 5, 6]
+    assert 'full' in lines[0]
+
+    history = CredentialHistory(tmp_path, keyframe_interval=2, max_versions=3)
+    assert normalized(history.as_of('meituan', 'store001', 1003.5)) == normalized(VERSIONS[3])
+    assert normalized(history.latest('meituan', 'store001')) == normalized(VERSIONS[0])
+    assert history.as_of('meituan', 'store001', 1002.5) is None
+    assert history.record('meituan', 'store001', VERSIONS[1], ts=1006.0)['v'] == 7
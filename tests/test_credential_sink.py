@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""凭证推送：可重试的失败留在发件箱，被拒绝的移到 failed，成功的删除"""
+
+import json
+import socket
+
+import pytest
+
+from credential_sink import CredentialSink, HttpPushSink
+from mock_backend_server import MockBackendServer
+
+
+def credential(value: str) -> str:
+    return json.dumps({'cookies': [{'name': 'token', 'value': value, 'domain': '.meituan.com',
+                                    'path': '/', 'expires': -1}], 'origins': []})
+
+
+def test_retryable_failure_keeps_outbox(tmp_path):
+    with MockBackendServer(fail_next=1) as server:
+        sink = HttpPushSink(server.endpoint, tmp_path / 'outbox')
+        sink.put('meituan', 'user', '1001', credential('a'))
+
+        assert not sink.flush()
+        assert sink.pending() == 1
+        assert sink.errors == 1
+        assert not server.states
+
+        assert sink.flush()
+        assert sink.pending() == 0
+        assert sink.sent == 1
+        assert server.states[('meituan', 'user')]['storeId'] == '1001'
+        sink.close()
+
+
+def test_unreachable_endpoint_keeps_outbox(tmp_path):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    sink = HttpPushSink(f"http://127.0.0.1:{port}/api", tmp_path / 'outbox', timeout=1.0)
+    sink.put('meituan', 'user', '1001', credential('a'))
+    assert not sink.flush()
+    assert sink.pending() == 1
+    sink.close()
+
+
+def test_rejected_batch_moves_to_failed(tmp_path):
+    with MockBackendServer() as server:
+        sink = HttpPushSink(server.endpoint, tmp_path / 'outbox')
+        # 账号为空的状态被接口拒绝（400），重试也不会成功
+        sink.put('meituan', '', '1001', credential('a'))
+
+        assert sink.flush()
+        assert sink.pending() == 0
+        assert len(list((tmp_path / 'outbox' / 'failed').glob('*.json'))) == 1
+        assert not server.states
+        sink.close()
+
+
+def test_only_latest_credential_per_account_is_sent(tmp_path):
+    with MockBackendServer() as server:
+        sink = HttpPushSink(server.endpoint, tmp_path / 'outbox', batch_size=2)
+        sink.put('meituan', 'user', '1001', credential('old'))
+        sink.put('meituan', 'user', '1001', credential('new'))
+        for i in range(3):
+            sink.put('fliggy', f"user{i}", '', credential(str(i)))
+
+        assert sink.flush()
+        assert sink.sent == 4
+        assert sink.batches == 2
+        assert json.loads(server.states[('meituan', 'user')]['contextData'])['cookies'][0]['value'] == 'new'
+        sink.close()
+
+
+def test_background_thread_pushes_on_put(tmp_path):
+    with MockBackendServer() as server:
+        sink = HttpPushSink(server.endpoint, tmp_path / 'outbox', flush_interval=0.05).start()
+        sink.put('ctrip', 'user', '', credential('a'))
+        sink.close()
+        assert ('ctrip', 'user') in server.states
+        assert sink.pending() == 0
+
+
+def test_sink_interface_requires_put():
+    with pytest.raises(TypeError):
+        CredentialSink()
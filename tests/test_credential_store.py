@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""本地凭证库：获取时间只在真正登录后更新，复用会话和健康扫描只记录验证时间"""
+
+import json
+
+from credential_store import CredentialStore
+
+
+def credential(value: str, expires: float = -1) -> str:
+    return json.dumps({'cookies': [{'name': 'token', 'value': value, 'domain': '.meituan.com',
+                                    'path': '/', 'expires': expires}], 'origins': []})
+
+
+def test_reused_session_keeps_acquired_at(tmp_path):
+    store = CredentialStore(tmp_path / 'credentials.db')
+    store.put('meituan', 'user', credential('a'), store_id='1001', acquired_at=100.0)
+    store.put('meituan', 'user', credential('b', expires=5000.0), store_id='1001', reused=True)
+    store.mark_verified('meituan', 'user', verified_at=200.0)
+
+    row = store.get('meituan', 'user')
+    assert row['acquired_at'] == 100.0
+    assert row['verified_at'] == 200.0
+    assert row['expires_at'] == 5000.0
+    assert json.loads(row['storage_state'])['cookies'][0]['value'] == 'b'
+
+    store.put('meituan', 'user', credential('c'), store_id='1001', acquired_at=300.0)
+    row = store.get('meituan', 'user')
+    assert row['acquired_at'] == row['verified_at'] == 300.0
+    store.close()
+
+
+def test_mark_verified_by_file_name(tmp_path):
+    store = CredentialStore(tmp_path / 'credentials.db')
+    store.put('meituan', 'with-store', credential('a'), store_id='1001', acquired_at=100.0)
+    store.put('meituan', 'no-store', credential('b'), acquired_at=100.0)
+
+    assert store.mark_verified_by_name('meituan', '1001', verified_at=200.0) == 1
+    assert store.mark_verified_by_name('meituan', 'no-store', verified_at=200.0) == 1
+    assert store.mark_verified_by_name('meituan', 'with-store', verified_at=200.0) == 0
+    assert store.mark_verified_by_name('fliggy', '1001', verified_at=200.0) == 0
+    assert store.get('meituan', 'with-store')['verified_at'] == 200.0
+
+    # 文件名中的特殊字符已替换为 _（见 batch_refresh 的输出路径）
+    store.put('meituan', 'hotel/a b', credential('c'), acquired_at=100.0)
+    store.put('ctrip', 'user', credential('d'), store_id='门店:01', acquired_at=100.0)
+    assert store.mark_verified_by_name('meituan', 'hotel_a_b', verified_at=300.0) == 1
+    assert store.mark_verified_by_name('ctrip', '门店_01', verified_at=300.0) == 1
+    assert store.get('meituan', 'hotel/a b')['verified_at'] == 300.0
+    assert store.get('ctrip', 'user')['verified_at'] == 300.0
+    store.close()
+
+
+def test_empty_store_id_keeps_existing(tmp_path):
+    store = CredentialStore(tmp_path / 'credentials.db')
+    store.put('meituan', 'user', credential('a'), store_id='1001', acquired_at=100.0)
+    # GUI 单账号登录不带门店ID
+    store.put('meituan', 'user', credential('b'), acquired_at=200.0)
+    assert store.get('meituan', 'user')['store_id'] == '1001'
+    assert store.latest_for_store('1001')['acquired_at'] == 200.0
+
+    store.put('meituan', 'user', credential('c'), store_id='2002', acquired_at=300.0)
+    assert store.get('meituan', 'user')['store_id'] == '2002'
+    store.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""失败现场记录：追踪在填写密码前结束，保存的文件中不含密码"""
+
+import json
+import zipfile
+
+from flight_recorder import FlightRecorder, file_contains
+
+PASSWORD = "s3cret-Passw0rd"
+
+
+class FakeTracing:
+    """写出一个 zip，内容为追踪期间“记录”的文本"""
+
+    def __init__(self):
+        self.recorded = []
+
+    def start(self, **kwargs):
+        pass
+
+    def stop(self, path=None):
+        if path:
+            with zipfile.ZipFile(path, 'w') as archive:
+                archive.writestr('trace.trace', '\n'.join(self.recorded))
+
+
+class FakeContext:
+    def __init__(self):
+        self.tracing = FakeTracing()
+
+
+class FakePage:
+    url = "https://example.com/login"
+
+    def __init__(self, html):
+        self.html = html
+
+    def is_closed(self):
+        return False
+
+    def screenshot(self, path, timeout=None):
+        with open(path, 'wb') as f:
+            f.write(b'png')
+
+    def content(self):
+        return self.html
+
+
+def test_trace_stops_before_password(tmp_path):
+    recorder = FlightRecorder(tmp_path, trace=True)
+    run = recorder.begin("meituan", "store001", secrets=(PASSWORD,))
+    context = FakeContext()
+    run.start_tracing(context)
+    context.tracing.recorded.append("fill input#login store001")
+    run.stop_tracing(context)
+    # 追踪结束后填写密码，不应进入 trace.zip
+    context.tracing.recorded.append(f"fill input#password {PASSWORD}")
+
+    run_dir = run.capture_failure(context, FakePage("<html></html>"), Exception("登录超时"))
+
+    trace = run_dir / 'trace.zip'
+    assert trace.exists()
+    assert not file_contains(trace, PASSWORD.encode())
+    for path in run_dir.iterdir():
+        assert not file_contains(path, PASSWORD.encode()), path.name
+    assert recorder.runs() == [run_dir]
+    assert not list((tmp_path / '.partial').iterdir())
+
+
+def test_files_with_password_are_removed(tmp_path):
+    recorder = FlightRecorder(tmp_path, trace=True)
+    run = recorder.begin("meituan", "store001", secrets=(PASSWORD,))
+    context = FakeContext()
+    run.start_tracing(context)
+    context.tracing.recorded.append(f"fill input#password {PASSWORD}")
+
+    run_dir = run.capture_failure(context, FakePage(f'<input value="{PASSWORD}">'), Exception("失败"))
+
+    names = {p.name for p in run_dir.iterdir()}
+    assert 'trace.zip' not in names
+    assert 'page.html' not in names
+    assert {'summary.json', 'network.har', 'screenshot.png'} <= names
+    summary = json.loads((run_dir / 'summary.json').read_text(encoding='utf-8'))
+    assert any('含有密码' in event[2] for event in summary['events'])
+
+
+def test_discard_removes_partial_trace(tmp_path):
+    recorder = FlightRecorder(tmp_path, trace=True)
+    run = recorder.begin("fliggy", "store002", secrets=(PASSWORD,))
+    context = FakeContext()
+    run.start_tracing(context)
+    run.stop_tracing(context)
+    assert run.trace_path.exists()
+    run.discard(context)
+    assert not list((tmp_path / '.partial').iterdir())
+    assert recorder.runs() == []
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type='document'):
+        self.url = url
+        self.method = 'GET'
+        self.resource_type = resource_type
+        self.timing = {'startTime': 1.7e12, 'responseEnd': 12.0}
+        self.failure = 'net::ERR_TIMED_OUT'
+
+
+class FakeResponse:
+    def __init__(self, request, status):
+        self.request = request
+        self.status = status
+
+
+class ListeningContext(FakeContext):
+    def __init__(self):
+        super().__init__()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+
+class ListeningPage(FakePage):
+    def on(self, event, handler):
+        pass
+
+
+def test_requests_are_bounded_and_tracing_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr('flight_recorder.MAX_EVENTS', 3)
+    recorder = FlightRecorder(tmp_path)
+    run = recorder.begin("meituan", "store001")
+    context = ListeningContext()
+    run.attach(context, ListeningPage(""))
+    assert set(context.handlers) == {'response', 'requestfailed'}
+
+    run.start_tracing(context)
+    assert not run.tracing
+
+    requests = [FakeRequest(f"https://me.meituan.com/{i}") for i in range(5)]
+    for request in requests:
+        context.handlers['response'](FakeResponse(request, 200))
+    context.handlers['response'](FakeResponse(FakeRequest("https://me.meituan.com/a.png", 'image'), 200))
+    context.handlers['requestfailed'](requests[4])
+
+    entries = run.har()['log']['entries']
+    assert [e['request']['url'] for e in entries] == [r.url for r in requests[2:]]
+    assert entries[-1]['response']['status'] == 200
+    assert entries[-1]['response']['statusText'] == 'net::ERR_TIMED_OUT'
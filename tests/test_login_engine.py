@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""登录引擎：上下文创建后的任何异常都会关闭上下文；错误提示只来自顶层页面和登录 iframe"""
+
+import asyncio
+
+import pytest
+
+from ota_engine import LoginEngine, LoginDeadline, LoginCancelledError, error_watcher_script, is_watched_frame
+from ota_engine_async import AsyncLoginEngine
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def expose_binding(self, *args, **kwargs):
+        raise RuntimeError("注入失败")
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    def new_context(self, **kwargs):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+
+class FakeAsyncContext(FakeContext):
+    async def close(self):
+        self.closed = True
+
+    async def expose_binding(self, *args, **kwargs):
+        raise RuntimeError("注入失败")
+
+
+class FakeAsyncBrowser(FakeBrowser):
+    async def new_context(self, **kwargs):
+        context = FakeAsyncContext()
+        self.contexts.append(context)
+        return context
+
+
+def test_context_closed_when_setup_fails():
+    def setup(context):
+        raise RuntimeError("路由注册失败")
+
+    browser = FakeBrowser()
+    engine = LoginEngine("meituan", "user", "pw", context_setup=setup, block_resources=False)
+    with pytest.raises(RuntimeError):
+        engine._login_with_browser(browser)
+    assert [c.closed for c in browser.contexts] == [True]
+
+
+def test_context_closed_when_watcher_fails():
+    browser = FakeBrowser()
+    engine = LoginEngine("fliggy", "user", "pw", block_resources=False)
+    with pytest.raises(RuntimeError):
+        engine._login_with_browser(browser)
+    assert [c.closed for c in browser.contexts] == [True]
+
+
+def test_async_context_closed_when_watcher_fails():
+    browser = FakeAsyncBrowser()
+    engine = AsyncLoginEngine("ctrip", "user", "pw", block_resources=False)
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine._login(browser))
+    assert [c.closed for c in browser.contexts] == [True]
+
+
+class FakeFrame:
+    def __init__(self, parent=None):
+        self.parent_frame = parent
+
+
+def test_only_top_frame_and_login_frames_are_watched():
+    top = FakeFrame()
+    login = FakeFrame(top)
+    captcha = FakeFrame(top)
+    nested = FakeFrame(login)
+    assert is_watched_frame(top, [login])
+    assert is_watched_frame(login, [login])
+    assert not is_watched_frame(captcha, [login])
+    assert not is_watched_frame(nested, [login])
+
+
+def test_watcher_script_uses_platform_selectors():
+    for platform in ("美团", "飞猪", "携程"):
+        assert "[class*='error']" not in error_watcher_script(platform)
+    assert '"iframe.login-iframe"' in error_watcher_script("美团")
+    assert "const loginFrame = null;" in error_watcher_script("携程")
+
+
+class FakeTimeouts:
+    def set_default_timeout(self, timeout):
+        self.timeout = timeout
+
+    def set_default_navigation_timeout(self, timeout):
+        pass
+
+
+def test_phase_remaining_is_bounded_by_phase_budget_and_deadline():
+    deadline = LoginDeadline("携程", seconds=60, budgets={"填写表单": 2000})
+    deadline.apply(FakeTimeouts(), "填写表单")
+    assert 0 < deadline.phase_remaining() <= 2000
+
+    short = LoginDeadline("携程", seconds=0.5, budgets={"填写表单": 10000})
+    short.apply(FakeTimeouts(), "填写表单")
+    assert short.phase_remaining() <= 500
+
+    short.cancel()
+    with pytest.raises(LoginCancelledError):
+        short.phase_remaining()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""登录耗时统计：直方图按分桶累计，阶段逐行导出为 JSON Lines，出错的阶段带失败状态"""
+
+import json
+
+from login_metrics import MetricsRecorder, PhaseTimer, load_spans
+
+
+def timer(phases, outcome='success', failed=None):
+    """按给定耗时构造计时器（不实际等待）"""
+    t = PhaseTimer('meituan', labels={'platform': 'meituan'})
+    offset = 0.0
+    for name, seconds in phases:
+        t.phases.append((name, seconds))
+        t._offsets.append(offset)
+        offset += seconds
+    if failed is not None:
+        t._failed = (failed, 'failed')
+    t.outcome = outcome
+    return t
+
+
+def test_histogram_buckets(tmp_path):
+    recorder = MetricsRecorder(prom_path=tmp_path / 'login.prom')
+    recorder.record(timer([('打开登录页', 0.3), ('提交', 3.0)]))
+    recorder.record(timer([('打开登录页', 0.05)]))
+
+    lines = (tmp_path / 'login.prom').read_text(encoding='utf-8').splitlines()
+    prefix = 'ota_login_phase_seconds_bucket{platform="meituan",phase="打开登录页",outcome="success",'
+    buckets = {line[len(prefix):].split('"')[1]: int(line.rsplit(' ', 1)[1])
+               for line in lines if line.startswith(prefix)}
+    assert buckets['0.05'] == 1
+    assert buckets['0.25'] == 1
+    assert buckets['0.5'] == 2
+    assert buckets['+Inf'] == 2
+    assert ('ota_login_phase_seconds_count{platform="meituan",phase="提交",outcome="success"} 1') in lines
+    assert ('ota_login_phase_seconds_sum{platform="meituan",phase="打开登录页",outcome="success"} 0.3500') in lines
+
+
+def test_spans_export_as_jsonl(tmp_path):
+    path = tmp_path / 'login_spans.jsonl'
+    recorder = MetricsRecorder(jsonl_path=path)
+    t = timer([('打开登录页', 0.5), ('提交', 1.25)], outcome='failed', failed=1)
+    recorder.record(t)
+
+    rows = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [(r['phase'], r['seconds'], r['status']) for r in rows] == [('打开登录页', 0.5, 'ok'), ('提交', 1.25, 'failed')]
+    assert {r['login_id'] for r in rows} == {t.login_id}
+    assert all(r['platform'] == 'meituan' and r['outcome'] == 'failed' for r in rows)
+    assert abs(rows[1]['ts'] - rows[0]['ts'] - 0.5) < 0.01
+    assert load_spans(path, since=rows[1]['ts']) == rows[1:]
+
+
+def test_fail_closes_current_phase():
+    t = PhaseTimer('meituan')
+    t.mark('创建上下文')
+    t.fail('打开登录页')
+    t.fail('提交')
+    assert [name for name, _ in t.phases] == ['创建上下文', '打开登录页']
+    assert [p['status'] for p in t.as_dict()['phases']] == ['ok', 'failed']
+
+    # 阶段名已结束（或为空）时不重复记录同名阶段
+    t = PhaseTimer('meituan')
+    t.mark('创建上下文')
+    t.fail('创建上下文', 'cancelled')
+    assert t.phases[-1][0] == '未完成阶段'
+    assert t.spans()[-1]['status'] == 'cancelled'
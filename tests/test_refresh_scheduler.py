@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""定时刷新：刷新时间不会早于最小间隔，过期时间不推后时按失败退避"""
+
+import json
+
+from credential_store import CredentialStore
+from refresh_scheduler import RefreshScheduler, HOUR, RETRY_BASE
+
+ACCOUNT = {'platform': '美团', 'account': 'user', 'password': 'pw', 'store_id': ''}
+
+
+class FakeRefresher:
+    def __init__(self, store):
+        self.store = store
+
+
+def credential(expires: float) -> str:
+    return json.dumps({'cookies': [{'name': 'token', 'value': str(expires), 'domain': '.meituan.com',
+                                    'path': '/', 'expires': expires}], 'origins': []})
+
+
+def scheduler(tmp_path, **kwargs):
+    store = CredentialStore(tmp_path / 'credentials.db')
+    return store, RefreshScheduler(FakeRefresher(store), [ACCOUNT], lead=6 * HOUR, jitter=2 * HOUR, **kwargs)
+
+
+def test_short_lived_cookie_waits_min_interval(tmp_path):
+    now = 1_000_000.0
+    store, sched = scheduler(tmp_path, min_interval=HOUR)
+    # 最早的 Cookie 在提前量之内过期：原来每次刷新后都立即到期
+    previous = now + HOUR
+    store.put('meituan', 'user', credential(previous), acquired_at=now - 10)
+    store.put('meituan', 'user', credential(now + 2 * HOUR), acquired_at=now)
+    assert sched.record_result(ACCOUNT, 'success', previous, now)
+    assert sched.due_time(ACCOUNT, now) == now + HOUR
+    store.close()
+
+
+def test_non_advancing_expiry_backs_off(tmp_path):
+    now = 1_000_000.0
+    store, sched = scheduler(tmp_path, min_interval=60)
+    expiry = now + HOUR
+    store.put('meituan', 'user', credential(expiry), acquired_at=now - 10)
+    # 复用的会话：凭证没变，过期时间没有推后
+    store.put('meituan', 'user', credential(expiry), reused=True)
+    assert not sched.record_result(ACCOUNT, 'success', expiry, now)
+    assert sched.due_time(ACCOUNT, now) == now + RETRY_BASE
+    assert not sched.record_result(ACCOUNT, 'success', expiry, now)
+    assert sched.due_time(ACCOUNT, now) == now + 2 * RETRY_BASE
+
+    # 过期时间推后后恢复按过期时间计划
+    store.put('meituan', 'user', credential(now + 30 * HOUR), acquired_at=now)
+    assert sched.record_result(ACCOUNT, 'success', expiry, now)
+    assert now + 22 * HOUR <= sched.due_time(ACCOUNT, now) <= now + 24 * HOUR
+    store.close()
+
+
+def test_new_account_is_due_now(tmp_path):
+    store, sched = scheduler(tmp_path)
+    assert sched.due_time(ACCOUNT, 5.0) == 5.0
+    store.close()
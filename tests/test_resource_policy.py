@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""资源拦截：按规则决定放行、拦截或空响应，并统计经过路由的请求"""
+
+from resource_policy import ResourcePolicy, ResourceStats, policy_for
+
+
+def test_decide():
+    policy = policy_for("美团")
+    assert policy.decide("https://me.meituan.com/logo.png", "image") == 'block'
+    assert policy.decide("https://me.meituan.com/app.js", "script") == 'allow'
+    assert policy.decide("https://lx.meituan.net/lx.js", "script") == 'stub'
+    assert policy.decide("https://lx.meituan.net/pixel.gif", "image") == 'block'
+    assert policy.decide("https://hm.baidu.com/hm.js", "script") == 'stub'
+    assert policy.decide("https://report.meituan.com/collect", "fetch") == 'stub'
+    # 验证码资源优先放行
+    assert policy.decide("https://verify.meituan.com/captcha.png", "image") == 'allow'
+    assert policy.decide("https://me.meituan.com/font.woff2", "font") == 'block'
+
+
+def test_route_pattern_only_matches_assets_and_trackers():
+    policy = policy_for("携程")
+    assert policy.route_re.search("https://ebooking.ctrip.com/a/b.PNG?v=1")
+    assert policy.route_re.search("https://ubt.ctrip.com/bfa.js")
+    assert not policy.route_re.search("https://ebooking.ctrip.com/api/login")
+    assert not policy.route_re.search("https://ebooking.ctrip.com/static/app.js")
+
+
+def test_stats_count_routed_requests():
+    policy = ResourcePolicy(["image"], [r"track\.example"], [r"captcha"])
+    stats = ResourceStats()
+    for url, kind in [("https://a/x.png", "image"), ("https://track.example/t.js", "script"),
+                      ("https://a/captcha.png", "image"), ("https://track.example/p", "image")]:
+        stats.add(policy.decide(url, kind))
+    assert stats.as_dict() == {'routed': 4, 'allowed': 1, 'blocked': 2, 'stubbed': 1}
+    assert "经过路由 4 个" in stats.report()
+
+
+def test_disabled_platform_has_no_policy():
+    assert policy_for("未知") is None
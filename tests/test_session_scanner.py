@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""会话健康扫描"""
+
+import sys
+import json
+import socket
+import threading
+import subprocess
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from credential_store import CredentialStore
+from mock_ota_server import MockOTAServer
+from session_scanner import PooledHTTPClient, SessionScanner, find_credentials, run_scan
+
+
+def write_credential(path, cookies):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'cookies': cookies, 'origins': []}), encoding='utf-8')
+
+
+def meituan_cookie(name='token', value='abc'):
+    return {'name': name, 'value': value, 'domain': '.meituan.com', 'path': '/', 'expires': -1}
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """记录每个请求的 Cookie，按 server.redirect 返回 302 或 200"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.cookies.append(self.headers.get('Cookie'))
+        if self.server.redirect:
+            self.send_response(302)
+            self.send_header('Location', self.server.redirect)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def recording_server(host='127.0.0.1', redirect=None):
+    server = ThreadingHTTPServer((host, 0), RecordingHandler)
+    server.daemon_threads = True
+    server.cookies = []
+    server.redirect = redirect
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_find_credentials_skips_non_credential_dirs(tmp_path):
+    (tmp_path / 'meituan').mkdir()
+    (tmp_path / 'meituan' / '1001.json').write_text(json.dumps({'cookies': []}))
+    for name in ('outbox', 'failures', 'history', 'metrics', '.partial'):
+        (tmp_path / name / 'meituan').mkdir(parents=True)
+        (tmp_path / name / 'meituan' / 'x.json').write_text('{}')
+
+    assert find_credentials([str(tmp_path)]) == [tmp_path / 'meituan' / '1001.json']
+
+
+def test_alive_credential_marks_store_verified(tmp_path):
+    write_credential(tmp_path / 'meituan' / '1001.json', [meituan_cookie()])
+    store_path = tmp_path / 'credentials.db'
+    store = CredentialStore(store_path)
+    store.put('meituan', 'user', (tmp_path / 'meituan' / '1001.json').read_text(), store_id='1001',
+              acquired_at=100.0)
+    store.close()
+
+    with MockOTAServer() as server:
+        code = run_scan([str(tmp_path)], workers=2, urls=[f"meituan={server.base_url}/ebooking/"],
+                        db=str(store_path))
+    assert code == 0
+    store = CredentialStore(store_path)
+    row = store.get('meituan', 'user')
+    store.close()
+    assert row['acquired_at'] == 100.0
+    assert row['verified_at'] > 100.0
+
+
+def test_cookies_are_filtered_per_redirect_hop(tmp_path):
+    login = recording_server(host='localhost')
+    login_url = f"http://localhost:{login.server_address[1]}/login"
+    backend = recording_server(redirect=login_url)
+    path = tmp_path / 'meituan' / 'user.json'
+    write_credential(path, [meituan_cookie(),
+                            {'name': 'sso', 'value': 'x', 'domain': 'localhost', 'path': '/', 'expires': -1}])
+    scanner = SessionScanner(workers=1, backend_urls={
+        "美团": f"http://127.0.0.1:{backend.server_address[1]}/ebooking/"})
+    try:
+        row = scanner.scan([path])[0]
+    finally:
+        backend.shutdown()
+        login.shutdown()
+
+    assert row['status'] == 'expired'
+    assert row['url'] == login_url
+    assert backend.cookies == ['token=abc']
+    assert login.cookies == ['sso=x']
+
+
+def test_scanner_does_not_import_playwright():
+    code = ("import sys, session_scanner; "
+            "sys.exit(1 if any(m.startswith('playwright') for m in sys.modules) else 0)")
+    assert subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).resolve().parent.parent).returncode == 0
+
+
+def test_pooled_client_forgets_replaced_and_failed_connections():
+    server = recording_server()
+    netloc = f"127.0.0.1:{server.server_address[1]}"
+    client = PooledHTTPClient(timeout=2)
+    try:
+        for _ in range(3):
+            assert client.get(f"http://{netloc}/", {})[0] == 200
+            client._connection('http', netloc, fresh=True)
+        assert len(client._all) == 1
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            closed_port = s.getsockname()[1]
+        with pytest.raises(OSError):
+            client.get(f"http://127.0.0.1:{closed_port}/", {})
+        assert len(client._all) == 1
+    finally:
+        client.close()
+        server.shutdown()
+    assert not client._all